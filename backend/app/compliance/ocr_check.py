@@ -1,16 +1,26 @@
 from __future__ import annotations
 
-from PIL import Image, ImageOps
 import io
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def ocr_available() -> bool:
+    """Whether pytesseract is importable. Probed once: a failed import searches sys.path every time."""
+    try:
+        import pytesseract  # type: ignore  # noqa: F401
+    except Exception:
+        return False
+    return True
 
 
 def ocr_text_from_bytes(image_bytes: bytes) -> str:
     """Extracts text (lowercased) from image bytes with light preprocessing."""
+    if not ocr_available():
+        return ""
     try:
-        try:
-            import pytesseract  # type: ignore
-        except Exception:
-            return ""
+        import pytesseract  # type: ignore
+        from PIL import Image, ImageOps
 
         img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
         gray = ImageOps.grayscale(img)
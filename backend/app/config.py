@@ -5,13 +5,16 @@ import os
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / "data"
+DATA_DIR = Path(os.getenv("AIRC_DATA_DIR") or BASE_DIR / "data")
 ASSETS_DIR = DATA_DIR / "assets"
-STATIC_DIR = BASE_DIR / "static"
+STATIC_DIR = Path(os.getenv("AIRC_STATIC_DIR") or BASE_DIR / "static")
 EXPORTS_DIR = STATIC_DIR / "exports"
 
-ASSETS_DIR.mkdir(parents=True, exist_ok=True)
-EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
+
+def ensure_dirs() -> None:
+    """Creates the served directories; called at app startup, not on import."""
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
 SAFE_ZONES = {
     # margins in pixels for each format: top, right, bottom, left
@@ -47,3 +50,15 @@ MIN_FONT_SIZES = {
     "value": 36,
     "drinkaware": 18,
 }
+
+# Seconds the streaming layout endpoint waits for the LLM candidate
+# after the algorithmic candidates have been sent.
+LLM_LAYOUT_DEADLINE_S = float(os.getenv("AIRC_LLM_LAYOUT_DEADLINE", "8"))
+
+# Background removal defaults: backdrop colour tolerance and edge feather (px)
+BG_REMOVAL_TOLERANCE = 24
+BG_REMOVAL_FEATHER = 1.5
+
+# Upload limits: bytes per file and decoded pixels (decompression-bomb guard)
+MAX_UPLOAD_BYTES = int(float(os.getenv("AIRC_MAX_UPLOAD_MB", "25")) * 1024 * 1024)
+MAX_UPLOAD_PIXELS = int(os.getenv("AIRC_MAX_UPLOAD_PIXELS", str(8192 * 8192)))
@@ -1,8 +1,17 @@
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-import time
-from .config import ASSETS_DIR, STATIC_DIR
+from fastapi.middleware.gzip import GZipMiddleware
+import os
+from .config import ASSETS_DIR, STATIC_DIR, ensure_dirs
+from .utils.serialization import FastJSONResponse
+from .utils.static_files import TrackedStaticFiles
+from .services import metrics, profiling, startup
+from .services.admission import Overloaded, PRIORITY_HEADER, priority_from_header, workload_priority
 
 from .routes.health import router as health_router
 from .routes.uploads import router as uploads_router
@@ -12,24 +21,74 @@ from .routes.export import router as export_router
 from .routes.projects import router as projects_router
 from .routes.image_tools import router as image_tools_router
 from .routes.copy import router as copy_router
+from .routes.jobs import router as jobs_router
+from .routes.metrics import router as metrics_router
+from .routes.profiles import router as profiles_router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ensure_dirs()
+    # AIRC_WARMUP decides whether fonts, rules, caches and pools are prepared now or on first use
+    await startup.start()
+    yield
+    await startup.stop()
 
-app = FastAPI(title="AIRC – AI Retail Creative System", version="0.1.0")
+app = FastAPI(
+    title="AIRC – AI Retail Creative System",
+    version="0.1.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
 
 @app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
+async def request_metrics(request: Request, call_next):
+    # Latency per route template (not per raw path, which would explode label cardinality)
+    start_time = time.perf_counter()
+    status = 500
+    with metrics.REQUESTS_IN_FLIGHT.track():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            process_time = time.perf_counter() - start_time
+            route = request.scope.get("route")
+            metrics.REQUEST_SECONDS.observe(
+                process_time, request.method, getattr(route, "path", "unmatched"), str(status)
+            )
     response.headers["X-Process-Time"] = str(process_time)
-    print(f"[{request.method}] {request.url.path} - took {process_time:.4f}s")
     return response
 
+@app.middleware("http")
+async def request_priority(request: Request, call_next):
+    # Editor traffic is interactive unless the client marks it as batch
+    with workload_priority(priority_from_header(request.headers.get(PRIORITY_HEADER))):
+        return await call_next(request)
+
+# Only installed when AIRC_PROFILING / AIRC_PROFILE_SAMPLE_RATE ask for it
+profiling.install(app)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"error": "overloaded", "workload": exc.workload, "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Large canvases and candidate sets are repetitive JSON; images and SSE streams are skipped
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=int(os.getenv("AIRC_GZIP_MIN_BYTES", "1024")),
+    compresslevel=int(os.getenv("AIRC_GZIP_LEVEL", "6")),
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Project-Version"],
 )
 
 app.include_router(health_router, prefix="/api")
@@ -40,9 +99,27 @@ app.include_router(export_router, prefix="/api")
 app.include_router(projects_router, prefix="/api")
 app.include_router(image_tools_router, prefix="/api")
 app.include_router(copy_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
+app.include_router(profiles_router, prefix="/api")
+# Scrapers expect /metrics at the root
+app.include_router(metrics_router)
 
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+# Uploaded assets live under data/, outside STATIC_DIR; mount them before the catch-all.
+# The directories are created by the lifespan, not at import. Reads of generated
+# files (exports, background-removal outputs) feed the storage manager's LRU.
+app.mount(
+    "/static/assets",
+    TrackedStaticFiles(directory=str(ASSETS_DIR), check_dir=False, tracked={"bgremoved_": "bgremoved"}),
+    name="assets",
+)
+app.mount(
+    "/static",
+    TrackedStaticFiles(directory=str(STATIC_DIR), check_dir=False, tracked={"exports/": "export"}),
+    name="static",
+)
 
 @app.get("/")
 def root():
     return {"status": "ok", "service": "AIRC API"}
+
+startup.record("import", time.perf_counter() - _import_started)
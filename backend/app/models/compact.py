@@ -0,0 +1,100 @@
+"""
+Compact, engine-side view of a Canvas.
+
+The API validates canvases into pydantic models; rule engines then walk
+the elements several times per request. CompactCanvas is built once per
+request: plain __slots__ records (cheap attribute access, no validation
+on assignment), elements pre-split by kind, and the bounds of every
+element in one NumPy array so geometric rules run vectorised.
+
+It is a read-only snapshot; changes still go through the pydantic model
+(see services.autofix).
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from .schemas import Canvas, ImageElement, TextElement
+
+if TYPE_CHECKING:
+    import numpy as np
+
+RGB = Tuple[int, int, int]
+
+
+class ElementRecord:
+    __slots__ = ("index", "id", "type", "x", "y", "width", "height", "z")
+
+    def __init__(self, index: int, el) -> None:
+        b = el.bounds
+        self.index = index
+        self.id = el.id
+        self.type = el.type
+        self.x, self.y, self.width, self.height = b.x, b.y, b.width, b.height
+        self.z = el.z
+
+
+class TextRecord(ElementRecord):
+    __slots__ = ("text", "font_size", "font_family", "align", "color", "background")
+
+    def __init__(self, index: int, el: TextElement) -> None:
+        super().__init__(index, el)
+        self.text = el.text
+        self.font_size = el.font_size
+        self.font_family = el.font_family
+        self.align = el.align
+        self.color: RGB = (el.color.r, el.color.g, el.color.b)
+        self.background: Optional[RGB] = (el.background.r, el.background.g, el.background.b) if el.background is not None else None
+
+
+class ImageRecord(ElementRecord):
+    __slots__ = ("src",)
+
+    def __init__(self, index: int, el: ImageElement) -> None:
+        super().__init__(index, el)
+        self.src = el.src
+
+
+class CompactCanvas:
+    """
+    elements  all records in canvas order
+    texts     text / value_tile records
+    images    image / logo / packshot records
+    boxes     int64 array (n, 4) of x, y, width, height, in canvas order
+    """
+
+    __slots__ = ("format", "width", "height", "background", "elements", "texts", "images", "boxes")
+
+    def __init__(self, canvas: Canvas) -> None:
+        import numpy as np
+
+        self.format = canvas.format
+        self.width = canvas.width
+        self.height = canvas.height
+        bg = canvas.background_color
+        self.background: Optional[RGB] = (bg.r, bg.g, bg.b) if bg is not None else None
+        self.elements: List[ElementRecord] = []
+        self.texts: List[TextRecord] = []
+        self.images: List[ImageRecord] = []
+        for i, el in enumerate(canvas.elements):
+            if isinstance(el, TextElement):
+                rec = TextRecord(i, el)
+                self.texts.append(rec)
+            else:
+                rec = ImageRecord(i, el)
+                self.images.append(rec)
+            self.elements.append(rec)
+        self.boxes = np.array(
+            [(r.x, r.y, r.width, r.height) for r in self.elements], dtype=np.int64
+        ).reshape(-1, 4)
+
+    def outside(self, left: int, top: int, right: int, bottom: int) -> np.ndarray:
+        """Indices of elements not fully inside the rectangle [left, right) x [top, bottom)."""
+        import numpy as np
+
+        x, y, w, h = self.boxes.T
+        return np.flatnonzero((x < left) | (y < top) | (x + w > right) | (y + h > bottom))
+
+
+def to_compact(canvas: Canvas) -> CompactCanvas:
+    return CompactCanvas(canvas)
@@ -1,6 +1,7 @@
 from enum import Enum
-from typing import List, Optional, Literal
+from typing import Annotated, Dict, List, Optional, Literal, Union
 from pydantic import BaseModel, Field
+from ..config import BG_REMOVAL_FEATHER, BG_REMOVAL_TOLERANCE
 
 class Format(str, Enum):
     FB_STORY = "FB_STORY"
@@ -41,6 +42,18 @@ class ImageElement(BaseElement):
     type: Literal["image", "logo", "packshot"]
     src: str  # path or URL
     keep_aspect: bool = True
+    # How the (trimmed) image fills its bounds; keep_aspect=False means "stretch"
+    fit: Literal["contain", "cover", "stretch"] = "contain"
+    anchor: Literal[
+        "center", "top", "bottom", "left", "right",
+        "top_left", "top_right", "bottom_left", "bottom_right",
+    ] = "center"
+    # Crop transparent / backdrop padding before fitting
+    trim: bool = True
+
+# Element union tagged by `type`: each element is validated against exactly
+# one model, and unknown types are rejected instead of degrading to BaseElement
+CanvasElement = Annotated[Union[TextElement, ImageElement], Field(discriminator="type")]
 
 class Canvas(BaseModel):
     format: Format
@@ -48,7 +61,7 @@ class Canvas(BaseModel):
     height: int
     background_color: Optional[RGBA] = RGBA(r=255, g=255, b=255, a=1)
     background_image: Optional[str] = None
-    elements: List[BaseElement | TextElement | ImageElement]
+    elements: List[CanvasElement]
     metadata: Optional[dict] = Field(default_factory=dict)
 
 class UploadResponse(BaseModel):
@@ -61,6 +74,8 @@ class LayoutSuggestRequest(BaseModel):
     value_text: Optional[str] = None
     logo: Optional[str] = None
     packshots: List[str] = []
+    # Run compliance (no OCR) + autofix on every candidate and rank them
+    validate_candidates: bool = False
 
 class LayoutSuggestResponse(BaseModel):
     candidates: List[Canvas]
@@ -87,3 +102,41 @@ class ExportResponse(BaseModel):
     file_path: str
     url: str
     file_size_bytes: int
+
+class RemoveBgBatchRequest(BaseModel):
+    urls: List[str]
+    tolerance: int = BG_REMOVAL_TOLERANCE
+    feather: float = BG_REMOVAL_FEATHER
+
+class CampaignProduct(BaseModel):
+    # One row of a campaign file; `id` defaults to the row number
+    id: Optional[str] = None
+    headline: Optional[str] = None
+    subhead: Optional[str] = None
+    value_text: Optional[str] = None
+    logo: Optional[str] = None
+    packshots: List[str] = []
+    # Overrides the campaign's formats for this product
+    formats: Optional[List[Format]] = None
+
+class CampaignRequest(BaseModel):
+    # The products file itself: CSV with a header row, or one JSON object per line
+    content: str
+    input_format: Literal["csv", "jsonl"] = "csv"
+    formats: List[Format] = list(Format)
+    output_format: Literal["PNG", "JPG"] = "PNG"
+    # Add the LLM candidate to the algorithmic layouts (one LLM call per product and format)
+    use_llm: bool = False
+    # Same id = resume that run; default derived from the content and options
+    run_id: Optional[str] = None
+    # Worker threads per stage: layout, compliance, autofix, render (capped at AIRC_CAMPAIGN_MAX_WORKERS)
+    workers: Dict[str, Annotated[int, Field(ge=1, le=64)]] = {}
+
+class JobSubmitRequest(BaseModel):
+    kind: str
+    payload: dict = Field(default_factory=dict)
+
+class ProjectPatchRequest(BaseModel):
+    base_version: int
+    # RFC 6902 operations against the canvas at base_version
+    ops: List[dict]
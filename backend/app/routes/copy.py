@@ -1,6 +1,16 @@
-from fastapi import APIRouter
+from typing import Literal, Optional
+from fastapi import APIRouter, File, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from ..services.llm_service import generate_ad_copy
+from ..services.bulk_copy import (
+    BULK_COPY_BATCH_SIZE,
+    BULK_COPY_CONCURRENCY,
+    detect_format,
+    generate_bulk_ndjson,
+    read_products,
+    text_stream,
+)
 
 router = APIRouter(prefix="/copy", tags=["copy"])
 
@@ -11,3 +21,24 @@ class CopyRequest(BaseModel):
 @router.post("/generate")
 def generate_copy_endpoint(req: CopyRequest):
     return generate_ad_copy(req.product_name, req.topic)
+
+@router.post("/bulk")
+def generate_copy_bulk(
+    file: UploadFile = File(..., description="CSV (product_name,topic) or JSONL of products"),
+    format: Optional[Literal["csv", "jsonl"]] = Query(None, description="Defaults to the file extension"),
+    start: int = Query(0, ge=0, description="Resume: skip products before this index"),
+    batch_size: int = Query(BULK_COPY_BATCH_SIZE, ge=1, le=50),
+    concurrency: int = Query(BULK_COPY_CONCURRENCY, ge=1, le=32),
+):
+    """
+    Streams one NDJSON line per product, in input order:
+    {"index", "product_name", "topic", "headline", "subhead", "value_text", "rewritten", "still_banned"},
+    or {"index", "error"} for a row that could not be read. Fields under
+    "still_banned" match the banned-copy rules even after the rewrite.
+    After a dropped connection, call again with start = last index + 1.
+    """
+    products = read_products(text_stream(file.file), format or detect_format(file.filename or ""))
+    return StreamingResponse(
+        generate_bulk_ndjson(products, start=start, batch_size=batch_size, concurrency=concurrency),
+        media_type="application/x-ndjson",
+    )
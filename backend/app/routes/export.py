@@ -1,36 +1,14 @@
 from fastapi import APIRouter
-import os
-from ..models.schemas import ExportRequest, ExportResponse, LayoutSuggestRequest, LayoutSuggestResponse, Format
-from ..services.exporter import render_canvas
-from ..services.layout_engine import suggest_layouts
-from ..services.compliance_engine import check_compliance
-from ..services.autofix import apply_autofixes
-from ..config import FORMATS
+from ..models.schemas import ExportRequest, ExportResponse, LayoutSuggestRequest
+from ..services.exporter import export_all_formats, export_info, render_canvas
 
 router = APIRouter(prefix="/export", tags=["export"])
 
 @router.post("/image", response_model=ExportResponse)
 def export_image(payload: ExportRequest):
-    out_path = render_canvas(payload.canvas, payload.output_format)
-    url = f"/static/exports/{out_path.name}"
-    size = os.path.getsize(out_path)
-    return ExportResponse(file_path=str(out_path), url=url, file_size_bytes=size)
+    # The file itself is revalidated by StaticFiles' own ETag
+    return ExportResponse(**export_info(render_canvas(payload.canvas, payload.output_format)))
 
 @router.post("/batch")
 def export_batch(payload: LayoutSuggestRequest):
-    results = {}
-    for fmt in FORMATS.keys():
-        candidates = suggest_layouts(fmt, payload.headline, payload.subhead, payload.value_text, payload.logo, payload.packshots)
-        if not candidates:
-            continue
-        c = candidates[0]
-        issues = check_compliance(c)
-        if issues:
-            c = apply_autofixes(c, issues)
-        out_path = render_canvas(c, "PNG")
-        results[fmt] = {
-            "url": f"/static/exports/{out_path.name}",
-            "file_path": str(out_path),
-            "file_size_bytes": os.path.getsize(out_path),
-        }
-    return results
+    return export_all_formats(payload)
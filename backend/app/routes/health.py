@@ -1,7 +1,34 @@
 from fastapi import APIRouter
+from ..services import admission, startup
+from ..services.llm_gateway import get_gateway
 
 router = APIRouter(tags=["health"])
 
 @router.get("/health")
 def health():
     return {"status": "ok"}
+
+@router.get("/health/llm")
+def health_llm():
+    gw = get_gateway()
+    return {"available": gw.available(), **gw.stats()}
+
+@router.get("/health/startup")
+def health_startup():
+    return startup.status()
+
+@router.get("/health/cache")
+def health_cache():
+    from ..services.shared_cache import get_shared_cache
+
+    return get_shared_cache().stats()
+
+@router.get("/health/storage")
+def health_storage():
+    from ..services.storage_manager import get_manager
+
+    return get_manager().stats()
+
+@router.get("/health/admission")
+def health_admission():
+    return admission.stats()
@@ -1,22 +1,28 @@
 from __future__ import annotations
 
-from pathlib import Path
 from fastapi import APIRouter, Query
-from ..config import ASSETS_DIR
-from ..utils.image_ops import remove_simple_bg
+from ..config import BG_REMOVAL_FEATHER, BG_REMOVAL_TOLERANCE
+from ..models.schemas import RemoveBgBatchRequest
 
 router = APIRouter(prefix="/uploads", tags=["uploads"])
 
 @router.post("/remove_bg")
-def remove_bg(url: str = Query(..., description="/static/assets/<name> url")):
+def remove_bg(
+    url: str = Query(..., description="/static/assets/<name> url"),
+    tolerance: int = Query(BG_REMOVAL_TOLERANCE, ge=0, le=255),
+    feather: float = Query(BG_REMOVAL_FEATHER, ge=0, le=20),
+):
+    # NumPy is only loaded once background removal is actually used
+    from ..services.bg_removal import remove_background_assets
+
     # Expect a url like /static/assets/filename.png
-    name = Path(url).name
-    src = ASSETS_DIR / name
-    if not src.exists():
-        return {"error": "not_found"}
-    out = ASSETS_DIR / f"bgremoved_{name}"
-    try:
-        remove_simple_bg(src, out)
-    except Exception as e:
-        return {"error": "processing_failed", "detail": str(e)}
-    return {"url": f"/static/assets/{out.name}", "file_path": str(out)}
+    result = remove_background_assets([url], tolerance=tolerance, feather=feather)[0]
+    result.pop("source", None)
+    return result
+
+@router.post("/remove_bg/batch")
+def remove_bg_batch(payload: RemoveBgBatchRequest):
+    """Background removal for many assets on a worker pool; one result per url, in order."""
+    from ..services.bg_removal import remove_background_assets
+
+    return {"results": remove_background_assets(payload.urls, tolerance=payload.tolerance, feather=payload.feather)}
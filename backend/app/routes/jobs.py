@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from ..models.schemas import JobSubmitRequest
+from ..services.jobs import DONE, FINISHED, JOB_KINDS, get_queue
+from ..utils.sse import sse_event, SSE_HEADERS
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# How often the event stream re-reads a job's row
+EVENT_POLL_S = 0.25
+
+@router.get("/kinds")
+def job_kinds():
+    return {"kinds": sorted(JOB_KINDS)}
+
+@router.post("")
+def submit_job(payload: JobSubmitRequest):
+    try:
+        job_id = get_queue().submit(payload.kind, payload.payload)
+    except KeyError:
+        return {"error": "unknown_kind", "kinds": sorted(JOB_KINDS)}
+    except ValidationError as e:
+        return {"error": "invalid_payload", "detail": e.errors(include_url=False, include_context=False)}
+    return {"id": job_id, "status": "queued", "status_url": f"/api/jobs/{job_id}"}
+
+@router.get("")
+def list_jobs(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    return {"jobs": get_queue().store.list(status, limit)}
+
+@router.get("/{job_id}")
+def job_status(job_id: str):
+    job = get_queue().store.get(job_id)
+    if job is None:
+        return {"error": "not_found"}
+    return job
+
+@router.get("/{job_id}/result")
+def job_result(job_id: str):
+    job = get_queue().store.get(job_id, with_result=True)
+    if job is None:
+        return {"error": "not_found"}
+    if job["status"] == DONE:
+        return {"id": job_id, "status": DONE, "result": job["result"]}
+    if job["status"] in FINISHED:
+        return {"error": "job_failed", "detail": job["error"]}
+    return {"error": "not_ready", "status": job["status"], "progress": job["progress"]}
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """SSE: a `progress` event whenever status/progress changes, then one `done` event with the final status."""
+    store = get_queue().store
+
+    async def events():
+        last = None
+        while True:
+            job = await asyncio.to_thread(store.get, job_id)
+            if job is None:
+                yield sse_event("error", {"error": "not_found"})
+                return
+            if job["status"] in FINISHED:
+                yield sse_event("done", job)
+                return
+            state = (job["status"], job["progress"], job["message"])
+            if state != last:
+                last = state
+                yield sse_event("progress", job)
+            if await request.is_disconnected():
+                # The job itself keeps running; only the stream stops
+                return
+            await asyncio.sleep(EVENT_POLL_S)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,11 +1,16 @@
-from fastapi import APIRouter
-from ..models.schemas import LayoutSuggestRequest, LayoutSuggestResponse
-from ..services.layout_engine import suggest_layouts
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from ..models.schemas import Format, LayoutSuggestRequest, LayoutSuggestResponse
+from ..services.layout_engine import suggest_layouts, stream_layouts, validate_candidate
+from ..config import LLM_LAYOUT_DEADLINE_S
+from ..utils.serialization import conditional_json
+from ..utils.sse import sse_event, SSE_HEADERS
 
 router = APIRouter(prefix="/layout", tags=["layout"])
 
-@router.post("/suggest", response_model=LayoutSuggestResponse)
-def layout_suggest(payload: LayoutSuggestRequest):
+def _suggest(payload: LayoutSuggestRequest) -> LayoutSuggestResponse:
     candidates = suggest_layouts(
         payload.format,
         payload.headline,
@@ -13,5 +18,71 @@ def layout_suggest(payload: LayoutSuggestRequest):
         payload.value_text,
         payload.logo,
         payload.packshots,
+        validate=payload.validate_candidates,
     )
     return LayoutSuggestResponse(candidates=candidates)
+
+@router.post("/suggest", response_model=LayoutSuggestResponse)
+def layout_suggest(payload: LayoutSuggestRequest):
+    return _suggest(payload)
+
+@router.get("/suggest", response_model=LayoutSuggestResponse)
+def layout_suggest_cached(
+    request: Request,
+    format: Format,
+    headline: Optional[str] = None,
+    subhead: Optional[str] = None,
+    value_text: Optional[str] = None,
+    logo: Optional[str] = None,
+    packshots: List[str] = Query([]),
+    validate_candidates: bool = False,
+):
+    """
+    Same as POST /layout/suggest with the fields as query parameters, so it
+    can be revalidated: the response has an ETag, and sending it back in
+    If-None-Match gets 304 with no body when the candidates come out
+    identical (the algorithmic layouts are deterministic for the same
+    request).
+    """
+    payload = LayoutSuggestRequest(
+        format=format, headline=headline, subhead=subhead, value_text=value_text,
+        logo=logo, packshots=packshots, validate_candidates=validate_candidates,
+    )
+    return conditional_json(request, _suggest(payload))
+
+@router.post("/suggest/stream")
+async def layout_suggest_stream(
+    payload: LayoutSuggestRequest,
+    deadline: Optional[float] = Query(None, ge=0, description="Seconds to wait for the LLM candidate"),
+):
+    """
+    Server-Sent Events variant of /layout/suggest.
+    Emits one `candidate` event per layout (algorithmic first, LLM when it
+    arrives) and a final `done` event with the LLM outcome. With
+    `validate_candidates` each candidate is autofixed before it is sent,
+    but the stream is in arrival order rather than ranked.
+    """
+    wait = LLM_LAYOUT_DEADLINE_S if deadline is None else deadline
+
+    async def events():
+        index = 0
+        llm_status = "ok"
+        async for source, canvas in stream_layouts(
+            payload.format,
+            payload.headline,
+            payload.subhead,
+            payload.value_text,
+            payload.logo,
+            payload.packshots,
+            deadline=wait,
+        ):
+            if canvas is None:
+                llm_status = source.replace("llm_", "")
+                continue
+            if payload.validate_candidates:
+                canvas = await asyncio.to_thread(validate_candidate, canvas)
+            yield sse_event("candidate", {"index": index, "source": source, "canvas": canvas.model_dump(mode="json")})
+            index += 1
+        yield sse_event("done", {"count": index, "llm": llm_status})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
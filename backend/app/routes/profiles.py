@@ -0,0 +1,46 @@
+from typing import Optional
+from fastapi import APIRouter, Header
+from fastapi.responses import FileResponse, JSONResponse
+from ..services import profiling
+
+router = APIRouter(prefix="/admin/profiles", tags=["admin"])
+
+def _denied(token: Optional[str]) -> Optional[JSONResponse]:
+    if profiling.admin_token() is None:
+        # Header profiling is only allowed with a token, and so are its results
+        if profiling.header_enabled():
+            return JSONResponse(status_code=403, content={"error": "admin_token_required"})
+        return None
+    if not profiling.token_matches(token):
+        return JSONResponse(status_code=403, content={"error": "forbidden"})
+    return None
+
+@router.get("")
+def list_profiles(x_airc_admin_token: Optional[str] = Header(None)):
+    """Stored request profiles, newest first."""
+    denied = _denied(x_airc_admin_token)
+    if denied:
+        return denied
+    return {"enabled": profiling.enabled(), "profiles": profiling.list_profiles()}
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, x_airc_admin_token: Optional[str] = Header(None)):
+    """Request details plus the functions with the most samples."""
+    denied = _denied(x_airc_admin_token)
+    if denied:
+        return denied
+    path = profiling.profile_path(profile_id, ".json")
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "not_found"})
+    return FileResponse(path, media_type="application/json")
+
+@router.get("/{profile_id}/folded")
+def get_profile_stacks(profile_id: str, x_airc_admin_token: Optional[str] = Header(None)):
+    """Collapsed stacks for flamegraph.pl / speedscope."""
+    denied = _denied(x_airc_admin_token)
+    if denied:
+        return denied
+    path = profiling.profile_path(profile_id, ".folded")
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "not_found"})
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
@@ -1,75 +1,142 @@
 from __future__ import annotations
 
-from pathlib import Path
-from typing import List
-from fastapi import APIRouter
-from ..models.schemas import Canvas
-from ..config import DATA_DIR
-import json
-
-PROJECTS_DIR = DATA_DIR / "projects"
-PROJECTS_DIR.mkdir(parents=True, exist_ok=True)
+from typing import List, Optional
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import ValidationError
+from ..models.schemas import Canvas, ProjectPatchRequest
+from ..services.project_store import MAX_PAGE_SIZE, ProjectExists, ProjectNotFound, VersionConflict, get_store
+from ..services.metrics import cache_lookup
+from ..services.storage_manager import touch
+from ..services.thumbnails import CACHE_CONTROL, render_thumbnail, schedule_thumbnail, thumbnail_path, thumbnail_url
+from ..utils.json_patch import JsonPatchError
+from ..utils.serialization import conditional_json
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
+VERSION_HEADER = "X-Project-Version"
+
+def _conflict(e: VersionConflict) -> JSONResponse:
+    return JSONResponse(
+        status_code=409,
+        content={"error": "version_conflict", "current_version": e.current_version},
+        headers={VERSION_HEADER: str(e.current_version)},
+    )
+
+def _saved(result: dict) -> dict:
+    # Render the new version's thumbnail in the background
+    schedule_thumbnail(get_store().get(result["id"]))
+    return result
+
 @router.get("")
-def list_projects():
-    items = []
-    for p in PROJECTS_DIR.glob("*.json"):
-        items.append({
-            "id": p.stem, 
-            "file": str(p),
-            "updated_at": p.stat().st_mtime
-        })
-    items.sort(key=lambda x: x["updated_at"], reverse=True)
-    return {"projects": items}
+def list_projects(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Optional[str] = None,
+    q: Optional[str] = Query(None, description="Project id prefix"),
+    meta: List[str] = Query([], description="Metadata filters as key=value"),
+):
+    filters = dict(m.split("=", 1) for m in meta if "=" in m)
+    try:
+        page = get_store().list(limit=limit, cursor=cursor, format=format, q=q, meta=filters)
+    except ValueError:
+        return {"error": "invalid_cursor"}
+    for row in page["projects"]:
+        row["thumbnail_url"] = thumbnail_url(row.pop("canvas_hash"))
+    return conditional_json(request, page)
 
-@router.get("/{project_id}")
-def get_project(project_id: str):
-    path = PROJECTS_DIR / f"{project_id}.json"
+@router.get("/thumbnails/{name}")
+def project_thumbnail(name: str):
+    """Thumbnail by content hash; rendered on the spot if the background render has not run yet."""
+    content_hash = name.rsplit(".", 1)[0]
+    path = thumbnail_path(content_hash)
+    cache_lookup("thumbnail", path.exists())
     if not path.exists():
+        canvas = get_store().find_by_hash(content_hash) if content_hash.isalnum() else None
+        if canvas is None:
+            return JSONResponse(status_code=404, content={"error": "not_found"})
+        try:
+            path = render_thumbnail(canvas)
+        except OSError as e:
+            return JSONResponse(status_code=404, content={"error": "thumbnail_unavailable", "detail": str(e)})
+    touch("thumbnail", path.name)
+    return FileResponse(path, media_type="image/jpeg", headers={"Cache-Control": CACHE_CONTROL})
+
+@router.get("/{project_id}")
+def get_project(project_id: str, request: Request):
+    """Current version, with an ETag; If-None-Match with it returns 304 while the project is unchanged."""
+    found = get_store().get_with_version(project_id)
+    if found is None:
         return {"error": "not_found"}
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    version, data = found
+    return conditional_json(request, data, headers={VERSION_HEADER: str(version)})
 
 @router.post("/{project_id}")
-def save_project(project_id: str, canvas: Canvas):
-    path = PROJECTS_DIR / f"{project_id}.json"
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(canvas.model_dump(), f, ensure_ascii=False, indent=2)
-    return {"id": project_id, "file": str(path)}
+def save_project(project_id: str, canvas: Canvas, base_version: Optional[int] = None):
+    """Full save. With `base_version`, fails with 409 if the project has moved on since."""
+    try:
+        return _saved(get_store().save(project_id, canvas, base_version=base_version))
+    except VersionConflict as e:
+        return _conflict(e)
+
+@router.patch("/{project_id}")
+def patch_project(project_id: str, payload: ProjectPatchRequest):
+    """Delta save: JSON Patch ops against `base_version` (409 if that is not the current version)."""
+    try:
+        return _saved(get_store().patch(project_id, payload.base_version, payload.ops))
+    except ProjectNotFound:
+        return {"error": "not_found"}
+    except VersionConflict as e:
+        return _conflict(e)
+    except JsonPatchError as e:
+        return {"error": "invalid_patch", "detail": str(e)}
+    except ValidationError as e:
+        return {"error": "invalid_canvas", "detail": e.errors(include_url=False, include_context=False)}
+
+@router.get("/{project_id}/versions")
+def project_versions(project_id: str, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), before: Optional[int] = None):
+    return {"id": project_id, "versions": get_store().versions(project_id, limit=limit, before=before)}
+
+@router.get("/{project_id}/versions/{version}")
+def project_version(project_id: str, version: int, request: Request):
+    data = get_store().get_version(project_id, version)
+    if data is None:
+        return {"error": "not_found"}
+    return conditional_json(request, data, headers={VERSION_HEADER: str(version)})
+
+@router.post("/{project_id}/revert")
+def revert_project(project_id: str, version: int, base_version: Optional[int] = None):
+    """Undo: stores the canvas of `version` as a new version."""
+    try:
+        return _saved(get_store().revert(project_id, version, base_version=base_version))
+    except ProjectNotFound:
+        return {"error": "not_found"}
+    except VersionConflict as e:
+        return _conflict(e)
 
 @router.delete("/{project_id}")
 def delete_project(project_id: str):
-    path = PROJECTS_DIR / f"{project_id}.json"
-    if not path.exists():
+    if not get_store().delete(project_id):
         return {"error": "not_found", "success": False}
-    path.unlink()
     return {"id": project_id, "success": True}
 
 @router.post("/{project_id}/duplicate")
 def duplicate_project(project_id: str, new_id: str):
-    src = PROJECTS_DIR / f"{project_id}.json"
-    dst = PROJECTS_DIR / f"{new_id}.json"
-    
-    if not src.exists():
+    try:
+        get_store().duplicate(project_id, new_id)
+    except ProjectNotFound:
         return {"error": "source_not_found"}
-    if dst.exists():
+    except ProjectExists:
         return {"error": "destination_exists"}
-        
-    dst.write_text(src.read_text(encoding="utf-8"), encoding="utf-8")
-    return {"id": new_id, "file": str(dst)}
+    return _saved({"id": new_id})
 
 @router.post("/{project_id}/rename")
 def rename_project(project_id: str, new_id: str):
-    src = PROJECTS_DIR / f"{project_id}.json"
-    dst = PROJECTS_DIR / f"{new_id}.json"
-    
-    if not src.exists():
+    try:
+        get_store().rename(project_id, new_id)
+    except ProjectNotFound:
         return {"error": "source_not_found"}
-    if dst.exists():
+    except ProjectExists:
         return {"error": "destination_exists"}
-        
-    src.rename(dst)
-    return {"id": new_id, "file": str(dst)}
+    return {"id": new_id}
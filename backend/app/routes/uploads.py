@@ -1,24 +1,33 @@
 from typing import List
-from fastapi import APIRouter, UploadFile, File
-from ..config import ASSETS_DIR
+from fastapi import APIRouter, UploadFile, File, HTTPException
 from ..models.schemas import UploadResponse
+from ..config import ASSETS_DIR
+from ..services.asset_store import store_stream, UploadRejected
+from ..services.ingest import submit_ingest, ensure_record
 
 router = APIRouter(prefix="/uploads", tags=["uploads"])
 
 @router.post("/assets", response_model=UploadResponse)
-async def upload_assets(files: List[UploadFile] = File(...)):
+def upload_assets(files: List[UploadFile] = File(...)):
+    # Sync route: the chunked copy and hashing run on the threadpool, not the event loop
     saved: List[str] = []
-    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
     for f in files:
-        target = ASSETS_DIR / f.filename
-        # Ensure unique by appending a number if exists
-        stem = target.stem
-        suffix = target.suffix
-        i = 1
-        while target.exists():
-            target = ASSETS_DIR / f"{stem}_{i}{suffix}"
-            i += 1
-        with open(target, "wb") as out:
-            out.write(await f.read())
-        saved.append(f"/static/assets/{target.name}")
+        try:
+            asset = store_stream(f.file, original_name=f.filename)
+        except UploadRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=f"{f.filename}: {e.detail}")
+        # Decode once in the background: master, mip pyramid, thumbnail, metadata
+        submit_ingest(asset.path, asset.sha256)
+        saved.append(asset.url)
     return UploadResponse(files=saved)
+
+@router.get("/assets/{name}/meta")
+def asset_meta(name: str):
+    """Sidecar record produced by ingestion (waits for it if still running)."""
+    src = ASSETS_DIR / name
+    if src.parent != ASSETS_DIR or not src.exists():
+        return {"error": "not_found"}
+    record = ensure_record(src, wait=True)
+    if record is None:
+        return {"error": "processing_failed"}
+    return record
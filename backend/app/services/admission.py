@@ -0,0 +1,184 @@
+"""
+Admission control for CPU/memory-heavy workloads (rendering, OCR).
+
+Each workload class has a concurrency budget, a bounded wait queue and a
+queue-time deadline. A caller that cannot start within the deadline, or
+finds the queue full, gets Overloaded, which the API turns into a 503 with
+Retry-After instead of piling more work onto a saturated worker.
+
+Waiters are admitted by priority, then arrival: interactive editor
+requests (the default) go ahead of batch work. The priority is carried in
+a context variable, set per request from the X-AIRC-Priority header and by
+batch code paths (batch export, jobs) with workload_priority(BATCH).
+
+Queued callers hold an API threadpool thread while they wait, so the
+default budgets plus queues stay well below AnyIO's 40 threads and light
+endpoints always find a free thread.
+
+    AIRC_RENDER_CONCURRENCY   renders running at once
+    AIRC_OCR_CONCURRENCY      OCR scans running at once
+    AIRC_ADMISSION_QUEUE      waiters per class before rejecting
+    AIRC_ADMISSION_DEADLINE   seconds a caller may wait for a slot
+"""
+from __future__ import annotations
+
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .metrics import register_collector
+
+INTERACTIVE, BATCH = 0, 1
+PRIORITY_NAMES = {"interactive": INTERACTIVE, "batch": BATCH}
+PRIORITY_HEADER = "X-AIRC-Priority"
+
+ADMISSION_QUEUE = int(os.getenv("AIRC_ADMISSION_QUEUE", "16"))
+ADMISSION_DEADLINE_S = float(os.getenv("AIRC_ADMISSION_DEADLINE", "10"))
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("airc_priority", default=INTERACTIVE)
+
+
+class Overloaded(Exception):
+    def __init__(self, workload: str, reason: str, retry_after: int):
+        super().__init__(f"{workload} overloaded ({reason})")
+        self.workload = workload
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class WorkloadGate:
+    """Concurrency budget + priority wait queue for one workload class."""
+
+    def __init__(self, name: str, budget: int, max_queue: int = ADMISSION_QUEUE, deadline_s: float = ADMISSION_DEADLINE_S):
+        self.name = name
+        self.budget = max(1, budget)
+        self.max_queue = max(0, max_queue)
+        self.deadline_s = deadline_s
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._waiters: list = []
+        self._seq = itertools.count()
+        # Moving average of how long an admitted caller holds its slot
+        self._service_s = 0.5
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_deadline = 0
+        self.wait_seconds_total = 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has probably drained."""
+        return max(1, math.ceil(self._service_s * (len(self._waiters) + 1) / self.budget))
+
+    @contextmanager
+    def acquire(self, priority: int = INTERACTIVE, deadline_s: Optional[float] = None) -> Iterator[None]:
+        started = time.monotonic()
+        with self._cond:
+            if self._in_use < self.budget and not self._waiters:
+                self._in_use += 1
+            else:
+                if len(self._waiters) >= self.max_queue:
+                    self.rejected_queue_full += 1
+                    raise Overloaded(self.name, "queue_full", self.retry_after())
+                entry = (priority, next(self._seq))
+                heapq.heappush(self._waiters, entry)
+                deadline = started + (self.deadline_s if deadline_s is None else deadline_s)
+                while not (self._waiters[0] == entry and self._in_use < self.budget):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._waiters.remove(entry)
+                        heapq.heapify(self._waiters)
+                        self.rejected_deadline += 1
+                        # The head may have changed; let the others re-check
+                        self._cond.notify_all()
+                        raise Overloaded(self.name, "deadline", self.retry_after())
+                    self._cond.wait(remaining)
+                heapq.heappop(self._waiters)
+                self._in_use += 1
+            self.admitted += 1
+            self.wait_seconds_total += time.monotonic() - started
+        admitted_at = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_use -= 1
+                self._service_s = 0.8 * self._service_s + 0.2 * (time.monotonic() - admitted_at)
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "budget": self.budget,
+                "in_use": self._in_use,
+                "queued": len(self._waiters),
+                "max_queue": self.max_queue,
+                "deadline_s": self.deadline_s,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_deadline": self.rejected_deadline,
+                "wait_seconds_total": round(self.wait_seconds_total, 4),
+                "service_seconds_avg": round(self._service_s, 4),
+            }
+
+
+_gates: Dict[str, WorkloadGate] = {
+    "render": WorkloadGate("render", int(os.getenv("AIRC_RENDER_CONCURRENCY", str(min(4, os.cpu_count() or 1))))),
+    "ocr": WorkloadGate("ocr", int(os.getenv("AIRC_OCR_CONCURRENCY", "2"))),
+}
+
+
+def get_gate(workload: str) -> WorkloadGate:
+    return _gates[workload]
+
+
+def set_gate(gate: WorkloadGate) -> None:
+    """Replaces a class's gate (tests, tuning at startup)."""
+    _gates[gate.name] = gate
+
+
+def admit(workload: str):
+    """Context manager holding one `workload` slot at the caller's current priority."""
+    return _gates[workload].acquire(_priority.get())
+
+
+@contextmanager
+def workload_priority(priority: int) -> Iterator[None]:
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def priority_from_header(value: Optional[str]) -> int:
+    return PRIORITY_NAMES.get((value or "").strip().lower(), INTERACTIVE)
+
+
+def stats() -> dict:
+    return {name: gate.stats() for name, gate in _gates.items()}
+
+
+def _gate_samples(name: str, fields: Dict[str, str]):
+    for workload, gate in stats().items():
+        for field, label in fields.items():
+            yield name, {"workload": workload, **({"reason": label} if label else {})}, gate[field]
+
+
+register_collector(
+    "airc_admission_in_use", "gauge", "Slots in use per admission-controlled workload",
+    lambda: _gate_samples("airc_admission_in_use", {"in_use": ""}),
+)
+register_collector(
+    "airc_admission_queued", "gauge", "Callers waiting for a slot",
+    lambda: _gate_samples("airc_admission_queued", {"queued": ""}),
+)
+register_collector(
+    "airc_admission_rejected_total", "counter", "Callers turned away with 503",
+    lambda: _gate_samples("airc_admission_rejected_total", {"rejected_queue_full": "queue_full", "rejected_deadline": "deadline"}),
+)
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from ..config import ASSETS_DIR, DATA_DIR, MAX_UPLOAD_BYTES, MAX_UPLOAD_PIXELS
+from ..utils.sqlite import connect
+
+ASSET_INDEX_PATH = DATA_DIR / "assets.sqlite3"
+# Uploads are staged here, outside the served ASSETS_DIR but on the same
+# filesystem, so the final rename is atomic and partial files are never public
+INCOMING_DIR = DATA_DIR / "incoming"
+ASSET_URL_PREFIX = "/static/assets/"
+
+CHUNK_SIZE = 1 << 20
+# Enough bytes for PIL to parse the header of every accepted format
+SNIFF_BYTES = 64 * 1024
+
+_EXTENSIONS = {
+    "PNG": ".png",
+    "JPEG": ".jpg",
+    "WEBP": ".webp",
+    "GIF": ".gif",
+    "BMP": ".bmp",
+    "TIFF": ".tiff",
+}
+
+
+class UploadRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class StoredAsset:
+    sha256: str
+    name: str
+    size: int
+    format: str
+    width: int
+    height: int
+    deduplicated: bool
+
+    @property
+    def url(self) -> str:
+        return f"{ASSET_URL_PREFIX}{self.name}"
+
+    @property
+    def path(self) -> Path:
+        return ASSETS_DIR / self.name
+
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file, memoised on (path, mtime, size) so unchanged assets are hashed once."""
+    st = path.stat()
+    memo_key = (str(path), st.st_mtime_ns, st.st_size)
+    with _digests_lock:
+        digest = _digests.get(memo_key)
+    if digest:
+        return digest
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _digests_lock:
+        if len(_digests) > 4096:
+            _digests.clear()
+        _digests[memo_key] = digest
+    return digest
+
+
+def asset_path(src: str) -> Path:
+    """Maps an asset reference (/static/assets/<name> URL or filesystem path) to a path."""
+    if src.startswith(ASSET_URL_PREFIX):
+        return ASSETS_DIR / src[len(ASSET_URL_PREFIX):]
+    if ASSET_URL_PREFIX in src:
+        return ASSETS_DIR / src.split(ASSET_URL_PREFIX)[-1]
+    return Path(src)
+
+
+class AssetIndex:
+    """sha256 -> stored file index used to deduplicate uploads."""
+
+    def __init__(self, path: Path = ASSET_INDEX_PATH):
+        self._path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect(self._path)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS assets (
+                    sha256 TEXT PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE,
+                    size INTEGER NOT NULL,
+                    format TEXT NOT NULL,
+                    width INTEGER NOT NULL,
+                    height INTEGER NOT NULL,
+                    original_name TEXT,
+                    created_at REAL NOT NULL
+                );
+                """
+            )
+        return self._conn
+
+    def get(self, sha256: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM assets WHERE sha256 = ?", (sha256,)).fetchone()
+        return dict(row) if row else None
+
+    def by_name(self, name: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM assets WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def recent(self, limit: int) -> list:
+        """Newest uploads first."""
+        with self._lock:
+            rows = self._db().execute("SELECT * FROM assets ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def add(self, asset: StoredAsset, original_name: Optional[str]) -> None:
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO assets (sha256, name, size, format, width, height, original_name, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (asset.sha256, asset.name, asset.size, asset.format, asset.width, asset.height, original_name, time.time()),
+            )
+
+
+_index: Optional[AssetIndex] = None
+
+
+def get_index() -> AssetIndex:
+    global _index
+    if _index is None:
+        _index = AssetIndex()
+    return _index
+
+
+def _sniff(head: bytes) -> tuple:
+    """Parses the image header only; returns (format, width, height) or raises UploadRejected."""
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(head)) as img:
+            fmt, (w, h) = img.format, img.size
+    except Exception:
+        raise UploadRejected(415, "File is not a decodable image")
+    if fmt not in _EXTENSIONS:
+        raise UploadRejected(415, f"Unsupported image format: {fmt}")
+    if w * h > MAX_UPLOAD_PIXELS:
+        raise UploadRejected(413, f"Image is {w}x{h}; limit is {MAX_UPLOAD_PIXELS} pixels")
+    return fmt, w, h
+
+
+def _verify(path: Path, fmt: str) -> None:
+    """
+    Checks the staged file's image data, not just its header; raises
+    UploadRejected for a truncated or corrupt body. PNG and WebP are checked
+    by verify(); JPEG has no verify, so it is decoded at 1/8 scale (draft),
+    which still reads the whole entropy-coded stream.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            img.verify()
+        if fmt == "JPEG":
+            with Image.open(path) as img:
+                img.draft("RGB", (max(1, img.width // 8), max(1, img.height // 8)))
+                img.load()
+    except Exception:
+        raise UploadRejected(415, "Image data is truncated or corrupt")
+
+
+def store_stream(stream: BinaryIO, original_name: Optional[str] = None, max_bytes: int = MAX_UPLOAD_BYTES) -> StoredAsset:
+    """
+    Streams an upload into content-addressed storage.
+
+    Chunks are hashed while being written to a temp file in INCOMING_DIR.
+    The header is sniffed from the first chunk(s), so undecodable or
+    oversized images are rejected before the rest is written, and the byte
+    limit is enforced as data arrives. New content is then verified in full
+    (a valid header on a truncated body is rejected), and the temp file is
+    atomically renamed to <sha256 prefix><ext>; if the same content is already stored,
+    the temp file is dropped and the existing asset is returned.
+    """
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    head = b""
+    sniffed = None
+    fd, tmp_name = tempfile.mkstemp(prefix="upload-", dir=INCOMING_DIR)
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(413, f"File exceeds {max_bytes} bytes")
+                if sniffed is None:
+                    head += chunk
+                    if len(head) >= SNIFF_BYTES:
+                        sniffed = _sniff(head)
+                        head = b""
+                h.update(chunk)
+                out.write(chunk)
+        if sniffed is None:
+            sniffed = _sniff(head)
+
+        fmt, width, height = sniffed
+        digest = h.hexdigest()
+        index = get_index()
+        existing = index.get(digest)
+        if existing and (ASSETS_DIR / existing["name"]).exists():
+            return StoredAsset(digest, existing["name"], existing["size"], existing["format"],
+                               existing["width"], existing["height"], deduplicated=True)
+
+        _verify(tmp, fmt)
+        asset = StoredAsset(digest, f"{digest[:32]}{_EXTENSIONS[fmt]}", size, fmt, width, height, deduplicated=False)
+        os.replace(tmp, asset.path)
+        index.add(asset, original_name)
+        return asset
+    finally:
+        if tmp.exists():
+            tmp.unlink()
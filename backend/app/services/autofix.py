@@ -1,23 +1,33 @@
 from __future__ import annotations
 
 from typing import List
-from ..models.schemas import Canvas, ComplianceIssue, TextElement
+from ..models.schemas import Canvas, ComplianceIssue, TextElement, RGBA
+from .metrics import stage
 
 
 def apply_autofixes(canvas: Canvas, issues: List[ComplianceIssue]) -> Canvas:
+    with stage("autofix"):
+        return _apply(canvas, issues)
+
+
+def _apply(canvas: Canvas, issues: List[ComplianceIssue]) -> Canvas:
     updated = canvas.model_copy(deep=True)
+    # First element per id, looked up once instead of scanning per issue
+    by_id = {}
+    for e in updated.elements:
+        by_id.setdefault(e.id, e)
     for issue in issues:
         fx = issue.autofix or {}
         action = fx.get("action")
         if action == "replace_text":
-            el = next((e for e in updated.elements if e.id == fx.get("id")), None)
+            el = by_id.get(fx.get("id"))
             if not el or not isinstance(el, TextElement):
                 continue
             new_text = fx.get("new_text")
             if isinstance(new_text, str) and new_text.strip():
                 el.text = new_text
         elif action == "nudge_inside":
-            el = next((e for e in updated.elements if e.id == fx.get("id")), None)
+            el = by_id.get(fx.get("id"))
             if not el:
                 continue
             min_x = fx.get("min_x", el.bounds.x)
@@ -27,14 +37,14 @@ def apply_autofixes(canvas: Canvas, issues: List[ComplianceIssue]) -> Canvas:
             el.bounds.x = int(max(min_x, min(el.bounds.x, max_x)))
             el.bounds.y = int(max(min_y, min(el.bounds.y, max_y)))
         elif action == "set_font_size":
-            el = next((e for e in updated.elements if e.id == fx.get("id")), None)
+            el = by_id.get(fx.get("id"))
             if not el or not isinstance(el, TextElement):
                 continue
             size = fx.get("size")
             if size:
                 el.font_size = int(size)
         elif action == "move_to":
-            el = next((e for e in updated.elements if e.id == fx.get("id")), None)
+            el = by_id.get(fx.get("id"))
             if not el:
                 continue
             if "x" in fx:
@@ -54,17 +64,11 @@ def apply_autofixes(canvas: Canvas, issues: List[ComplianceIssue]) -> Canvas:
                     new_elements.append(e)
             updated.elements = new_elements
         elif action == "increase_contrast":
-            el = next((e for e in updated.elements if e.id == fx.get("id")), None)
+            el = by_id.get(fx.get("id"))
             if not el or not isinstance(el, TextElement):
                 continue
-            el.background = type(el).model_fields['background'].annotation(r=0, g=0, b=0, a=1) if hasattr(type(el), 'model_fields') else None
-            # If RGBA class available, set explicit values
-            try:
-                from ..models.schemas import RGBA
-                el.background = RGBA(r=0, g=0, b=0, a=1)
-                el.color = RGBA(r=255, g=255, b=255, a=1)
-            except Exception:
-                pass
+            el.background = RGBA(r=0, g=0, b=0, a=1)
+            el.color = RGBA(r=255, g=255, b=255, a=1)
         else:
             continue
     return updated
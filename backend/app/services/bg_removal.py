@@ -0,0 +1,276 @@
+"""
+Background removal for packshots shot on a plain backdrop.
+
+Unlike utils.image_ops.remove_simple_bg (which clears every near-white
+pixel), only background-coloured regions connected to the image border
+are removed, so white labels and highlights inside the product survive.
+
+1. The backdrop colour is estimated from the border pixels.
+2. A downscaled "near backdrop" mask is flood-filled from the border with
+   a vectorised connected-components pass (run labelling along rows and
+   columns, repeated until stable).
+3. Full resolution is processed tile by tile: the low-res region seeds a
+   flood fill within the tile's own mask, the result is feathered with a
+   Gaussian blur (tiles overlap by the blur margin) and written into a
+   single alpha plane.
+
+The decoded image itself is still held whole: it is converted to one
+full-size RGBA image (4 bytes per pixel, plus the decoded source while it
+is converted) because the PNG it is written to needs the full image. What
+the tiling bounds is the working memory on top of that: one alpha plane
+(1 byte per pixel) and the arrays of a few tiles, instead of several
+full-size int16/bool arrays for the colour distance, mask and blur.
+"""
+from __future__ import annotations
+
+import glob
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from ..config import ASSETS_DIR, BG_REMOVAL_FEATHER, BG_REMOVAL_TOLERANCE
+from .storage_manager import touch
+
+TILE_SIZE = int(os.getenv("AIRC_BG_TILE", "1024"))
+BG_WORKERS = int(os.getenv("AIRC_BG_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Side of the low-resolution mask used to find border-connected regions
+COARSE_SIDE = 1024
+DEFAULT_TOLERANCE = BG_REMOVAL_TOLERANCE
+DEFAULT_FEATHER = BG_REMOVAL_FEATHER
+MAX_FLOOD_PASSES = 256
+_OUTPUT_NAME = re.compile(r"^bgremoved_(.+?)(?:_t(\d+)_f([0-9.]+))?\.png$")
+
+
+def _propagate_rows(mask: np.ndarray, reached: np.ndarray) -> np.ndarray:
+    """Spreads `reached` along each horizontal run of True pixels in `mask`."""
+    starts = mask.copy()
+    starts[:, 1:] &= ~mask[:, :-1]
+    # Runs never span rows: a masked pixel in column 0 always starts a run
+    run_id = np.cumsum(starts, axis=None).reshape(mask.shape)
+    run_id[~mask] = 0
+    hit = np.zeros(int(run_id.max()) + 1, dtype=bool)
+    hit[run_id[reached & mask]] = True
+    hit[0] = False
+    return hit[run_id]
+
+
+def flood_fill(mask: np.ndarray, seeds: np.ndarray) -> np.ndarray:
+    """Pixels of `mask` 4-connected to `seeds`, by alternating row/column run propagation."""
+    reached = seeds & mask
+    count = int(reached.sum())
+    for _ in range(MAX_FLOOD_PASSES):
+        reached = _propagate_rows(mask, reached)
+        reached = _propagate_rows(mask.T, reached.T).T
+        new_count = int(reached.sum())
+        if new_count == count:
+            break
+        count = new_count
+    return reached
+
+
+def _border_seeds(shape) -> np.ndarray:
+    seeds = np.zeros(shape, dtype=bool)
+    seeds[0, :] = seeds[-1, :] = True
+    seeds[:, 0] = seeds[:, -1] = True
+    return seeds
+
+
+def estimate_background(img: Image.Image) -> np.ndarray:
+    """Median RGB of the image border (only the four one-pixel strips are read)."""
+    w, h = img.size
+    strips = [img.crop(box).convert("RGB") for box in ((0, 0, w, 1), (0, h - 1, w, h), (0, 0, 1, h), (w - 1, 0, w, h))]
+    border = np.concatenate([np.asarray(strip).reshape(-1, 3) for strip in strips])
+    return np.median(border, axis=0)
+
+
+def _near_background(rgba: np.ndarray, bg: np.ndarray, tolerance: int) -> np.ndarray:
+    diff = np.abs(rgba[..., :3].astype(np.int16) - bg.astype(np.int16)).max(axis=-1)
+    return (diff <= tolerance) | (rgba[..., 3] < 16)
+
+
+def background_alpha(img: Image.Image, tolerance: int = DEFAULT_TOLERANCE, feather: float = DEFAULT_FEATHER) -> Image.Image:
+    """Returns an "L" alpha plane with the border-connected backdrop cleared (RGBA input)."""
+    w, h = img.size
+    bg = estimate_background(img)
+
+    # 1. coarse border-connected background
+    scale = max(1.0, max(w, h) / COARSE_SIDE)
+    coarse_size = (max(1, round(w / scale)), max(1, round(h / scale)))
+    coarse = np.asarray(img.resize(coarse_size, Image.BOX) if scale > 1 else img)
+    coarse_mask = _near_background(coarse, bg, tolerance)
+    coarse_bg = flood_fill(coarse_mask, _border_seeds(coarse_mask.shape))
+    # Slightly grown region bounds the full-res fill; an eroded one seeds it
+    coarse_img = Image.fromarray(coarse_bg.astype(np.uint8) * 255, "L")
+    region_img = coarse_img.filter(ImageFilter.MaxFilter(3))
+    seed_img = coarse_img.filter(ImageFilter.MinFilter(3))
+
+    # 2. full resolution, one tile at a time
+    alpha = img.getchannel("A")
+    margin = int(np.ceil(feather * 3)) + 1
+    tile = max(64, TILE_SIZE)
+    for ty in range(0, h, tile):
+        for tx in range(0, w, tile):
+            box = (max(0, tx - margin), max(0, ty - margin), min(w, tx + tile + margin), min(h, ty + tile + margin))
+            bw, bh = box[2] - box[0], box[3] - box[1]
+            coarse_box = tuple(v / scale for v in box)
+            region = np.asarray(region_img.resize((bw, bh), Image.NEAREST, box=coarse_box)) > 0
+            seeds = np.asarray(seed_img.resize((bw, bh), Image.NEAREST, box=coarse_box)) > 0
+            if not region.any():
+                continue
+            px = np.asarray(img.crop(box))
+            mask = _near_background(px, bg, tolerance) & region
+            # pixels on the image border are always seeds
+            edge = np.zeros_like(mask)
+            if box[1] == 0:
+                edge[0, :] = True
+            if box[3] == h:
+                edge[-1, :] = True
+            if box[0] == 0:
+                edge[:, 0] = True
+            if box[2] == w:
+                edge[:, -1] = True
+            if seeds.all():
+                # Tile lies inside the backdrop: every candidate pixel is connected
+                removed = mask
+            else:
+                removed = flood_fill(mask, seeds | edge)
+
+            keep = Image.fromarray(np.where(removed, 0, 255).astype(np.uint8), "L")
+            if feather > 0:
+                keep = keep.filter(ImageFilter.GaussianBlur(feather))
+            inner = (tx - box[0], ty - box[1], tx - box[0] + min(tile, w - tx), ty - box[1] + min(tile, h - ty))
+            keep = np.asarray(keep.crop(inner))
+            current = np.asarray(alpha.crop((tx, ty, tx + keep.shape[1], ty + keep.shape[0])))
+            alpha.paste(Image.fromarray(np.minimum(current, keep), "L"), (tx, ty))
+    return alpha
+
+
+def remove_background(
+    input_path: Path,
+    output_path: Path,
+    tolerance: int = DEFAULT_TOLERANCE,
+    feather: float = DEFAULT_FEATHER,
+) -> Path:
+    """
+    Writes a PNG of `input_path` with its border-connected backdrop made
+    transparent. The whole image is decoded and held as RGBA; only the mask
+    work is tiled (see the module docstring).
+    """
+    with Image.open(input_path) as src:
+        img = src.convert("RGBA")
+    img.putalpha(background_alpha(img, tolerance, feather))
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output_path.with_suffix(f".{os.getpid()}.tmp")
+    img.save(tmp, format="PNG")
+    os.replace(tmp, output_path)
+    return output_path
+
+
+def output_name(name: str, tolerance: int = DEFAULT_TOLERANCE, feather: float = DEFAULT_FEATHER) -> str:
+    """
+    bgremoved_<stem>.png (always PNG: the result has an alpha channel).
+    Non-default settings are part of the name so cached outputs never mix.
+    """
+    stem = Path(name).stem
+    if tolerance != DEFAULT_TOLERANCE or feather != DEFAULT_FEATHER:
+        stem = f"{stem}_t{tolerance}_f{feather:g}"
+    return f"bgremoved_{stem}.png"
+
+
+def restore_output(name: str) -> Optional[Path]:
+    """
+    Re-creates an output the storage manager evicted, from its source asset
+    and the settings encoded in `name` (see output_name). None unless the
+    storage index recorded `name` as evicted, so only outputs that existed
+    before are ever made again. The caller holds the render admission slot.
+    """
+    from .storage_manager import get_manager
+
+    m = _OUTPUT_NAME.match(name)
+    if m is None or not get_manager().restorable("bgremoved", name):
+        return None
+    sources = [p for p in glob.glob(os.path.join(glob.escape(str(ASSETS_DIR)), glob.escape(m.group(1)) + ".*"))
+               if not p.endswith(".tmp")]
+    if not sources:
+        return None
+    tolerance = int(m.group(2)) if m.group(2) else DEFAULT_TOLERANCE
+    feather = float(m.group(3)) if m.group(3) else DEFAULT_FEATHER
+    if output_name(Path(sources[0]).name, tolerance, feather) != name:
+        return None
+    out = remove_background_cached(Path(sources[0]), ASSETS_DIR / name, tolerance=tolerance, feather=feather)
+    get_manager().restored("bgremoved", name)
+    return out
+
+
+def remove_background_cached(input_path: Path, output_path: Path, **kwargs) -> Path:
+    """Skips work when the output is already newer than the source."""
+    if output_path.exists() and output_path.stat().st_mtime >= input_path.stat().st_mtime:
+        return output_path
+    return remove_background(input_path, output_path, **kwargs)
+
+
+def remove_background_batch(
+    pairs: List[tuple],
+    workers: Optional[int] = None,
+    **kwargs,
+) -> List[Optional[Exception]]:
+    """
+    Processes (input_path, output_path) pairs on a thread pool (NumPy and
+    PIL release the GIL for the heavy parts). Returns one entry per pair:
+    None on success or the exception raised for that asset.
+    """
+    def run(pair):
+        try:
+            remove_background_cached(pair[0], pair[1], **kwargs)
+            return None
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, workers or BG_WORKERS)) as pool:
+        return list(pool.map(run, pairs))
+
+
+def remove_background_assets(
+    urls: List[str],
+    tolerance: int = DEFAULT_TOLERANCE,
+    feather: float = DEFAULT_FEATHER,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> List[dict]:
+    """
+    Background removal for uploaded assets (/static/assets/<name> urls).
+    One result per url, in order: {"source", "url", "file_path"} or
+    {"source", "error"[, "detail"]}. `progress(fraction, message)` is called
+    after each chunk of work when given.
+    """
+    results: List[dict] = [{} for _ in urls]
+    pairs = []
+    slots = []
+    for i, url in enumerate(urls):
+        name = Path(url).name
+        src = ASSETS_DIR / name
+        if not src.exists():
+            results[i] = {"source": url, "error": "not_found"}
+            continue
+        pairs.append((src, ASSETS_DIR / output_name(name, tolerance, feather)))
+        slots.append(i)
+
+    # Chunks of one worker-pool width, so progress moves while the batch runs
+    step = max(1, BG_WORKERS)
+    for start in range(0, len(pairs), step):
+        chunk = pairs[start:start + step]
+        errors = remove_background_batch(chunk, tolerance=tolerance, feather=feather)
+        for i, (_, out), err in zip(slots[start:start + step], chunk, errors):
+            if err is not None:
+                results[i] = {"source": urls[i], "error": "processing_failed", "detail": str(err)}
+            else:
+                touch("bgremoved", out.name)
+                results[i] = {"source": urls[i], "url": f"/static/assets/{out.name}", "file_path": str(out)}
+        if progress:
+            done = min(len(pairs), start + step)
+            progress(done / len(pairs), f"{done}/{len(pairs)} assets")
+    return results
@@ -0,0 +1,221 @@
+"""
+Catalog-scale ad copy: reads products from CSV or JSONL, generates copy in
+multi-product prompts on a bounded worker pool, screens every field with
+the banned-copy matcher and emits one NDJSON record per product, in input
+order. Output order makes resuming trivial: restart from the first index
+that is missing from the output.
+
+CLI (from backend/):
+
+    python -m app.services.bulk_copy products.csv -o copy.ndjson
+
+Re-running the same command continues after the last complete line.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Iterator, List, Optional
+
+from .compliance_engine import banned_copy_pattern
+from .llm_service import generate_ad_copy_batch, fallback_rewrite
+
+BULK_COPY_BATCH_SIZE = int(os.getenv("AIRC_COPY_BATCH_SIZE", "8"))
+BULK_COPY_CONCURRENCY = int(os.getenv("AIRC_COPY_CONCURRENCY", "4"))
+
+COPY_FIELDS = ("headline", "subhead", "value_text")
+
+
+def _csv_rows(stream: IO[str]) -> Iterator[tuple]:
+    reader = csv.DictReader(stream)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num, None, str(e)
+            continue
+        yield reader.line_num, row, None
+
+
+def _jsonl_rows(stream: IO[str]) -> Iterator[tuple]:
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f"invalid JSON: {e}"
+
+
+def read_products(stream: IO[str], fmt: str) -> Iterator[dict]:
+    """
+    Yields {"product_name", "topic"} rows from a CSV (header row required,
+    `product_name` or `name` column) or JSONL stream. Rows without a
+    product name are skipped. A row that cannot be read yields
+    {"error": "line N: ..."} in its place instead of ending the stream.
+    """
+    if fmt == "csv":
+        rows = _csv_rows(stream)
+    elif fmt == "jsonl":
+        rows = _jsonl_rows(stream)
+    else:
+        raise ValueError(f"Unsupported product file format: {fmt}")
+    try:
+        for line, row, error in rows:
+            if error is None and not isinstance(row, dict):
+                error = "expected a JSON object"
+            if error is None:
+                name = row.get("product_name") or row.get("name") or ""
+                topic = row.get("topic") or "general"
+                if isinstance(name, str) and isinstance(topic, str):
+                    if name.strip():
+                        yield {"product_name": name.strip(), "topic": topic.strip() or "general"}
+                    continue
+                error = "product_name and topic must be strings"
+            yield {"error": f"line {line}: {error}"}
+    except UnicodeDecodeError as e:
+        yield {"error": f"input is not valid UTF-8: {e.reason}"}
+
+
+def text_stream(binary: IO[bytes]) -> IO[str]:
+    """Wraps an uploaded (binary) file for read_products."""
+    return io.TextIOWrapper(binary, encoding="utf-8", newline="")
+
+
+def detect_format(filename: str) -> str:
+    return "csv" if filename.lower().endswith(".csv") else "jsonl"
+
+
+def screen_copy(copy: dict) -> dict:
+    """
+    Runs each copy field through the banned-copy matcher; offending fields get
+    the deterministic rewrite, which is checked again. Fields it fixed are
+    listed under "rewritten", fields that still match (e.g. prices, which it
+    cannot reword) under "still_banned".
+    """
+    pattern = banned_copy_pattern()
+    out = dict(copy)
+    rewritten: List[str] = []
+    still_banned: List[str] = []
+    for field in COPY_FIELDS:
+        text = out.get(field)
+        if isinstance(text, str) and pattern.search(text):
+            out[field] = fallback_rewrite(text)
+            (still_banned if pattern.search(out[field]) else rewritten).append(field)
+    out["rewritten"] = rewritten
+    out["still_banned"] = still_banned
+    return out
+
+
+def _batches(products: Iterator[dict], start: int, batch_size: int) -> Iterator[List[tuple]]:
+    batch: List[tuple] = []
+    for index, product in enumerate(products):
+        if index < start:
+            continue
+        batch.append((index, product))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _run_batch(batch: List[tuple]) -> List[dict]:
+    readable = [(index, product) for index, product in batch if "error" not in product]
+    copies = iter(generate_ad_copy_batch([(p["product_name"], p["topic"]) for _, p in readable]))
+    return [
+        {"index": index, **product} if "error" in product else {"index": index, **product, **screen_copy(next(copies))}
+        for index, product in batch
+    ]
+
+
+def generate_bulk_copy(
+    products: Iterator[dict],
+    start: int = 0,
+    batch_size: int = BULK_COPY_BATCH_SIZE,
+    concurrency: int = BULK_COPY_CONCURRENCY,
+) -> Iterator[dict]:
+    """
+    Yields one result per product from `start` on, in input order; rows
+    read_products could not parse come back as {"index", "error"}.
+    At most `concurrency` prompts are in flight and at most twice that many
+    batches are buffered, so memory stays flat however long the catalog is.
+    """
+    batch_size = max(1, batch_size)
+    concurrency = max(1, concurrency)
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in _batches(products, start, batch_size):
+            pending.append(pool.submit(_run_batch, batch))
+            if len(pending) >= concurrency * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def generate_bulk_ndjson(products: Iterator[dict], start: int = 0, **kwargs) -> Iterator[str]:
+    for result in generate_bulk_copy(products, start=start, **kwargs):
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+def _resume_index(out_path: Path) -> int:
+    """Number of complete records already written (results are in input order)."""
+    if not out_path.exists():
+        return 0
+    done = 0
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            done = json.loads(line)["index"] + 1
+    return done
+
+
+def _truncate_partial_line(out_path: Path) -> None:
+    if not out_path.exists():
+        return
+    data = out_path.read_bytes()
+    cut = data.rfind(b"\n") + 1
+    if cut != len(data):
+        with open(out_path, "r+b") as f:
+            f.truncate(cut)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Generate ad copy for a product catalog (CSV/JSONL -> NDJSON)")
+    ap.add_argument("input", type=Path)
+    ap.add_argument("-o", "--output", type=Path, required=True)
+    ap.add_argument("--batch-size", type=int, default=BULK_COPY_BATCH_SIZE)
+    ap.add_argument("--concurrency", type=int, default=BULK_COPY_CONCURRENCY)
+    ap.add_argument("--restart", action="store_true", help="Ignore existing output instead of resuming")
+    args = ap.parse_args(argv)
+
+    if args.restart and args.output.exists():
+        args.output.unlink()
+    _truncate_partial_line(args.output)
+    start = _resume_index(args.output)
+    if start:
+        print(f"Resuming at product #{start}", file=sys.stderr)
+
+    written = 0
+    with open(args.input, "r", encoding="utf-8", newline="") as src, \
+            open(args.output, "a", encoding="utf-8") as out:
+        products = read_products(src, detect_format(args.input.name))
+        for line in generate_bulk_ndjson(products, start=start, batch_size=args.batch_size, concurrency=args.concurrency):
+            out.write(line)
+            out.flush()
+            written += 1
+    print(f"Wrote {written} records to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,540 @@
+"""
+Campaign pipeline: every product of a CSV/JSONL file rendered in every
+format, as a job (kind "campaign") or from the CLI.
+
+Each (product, format) item streams through four stages, each with its own
+worker threads and a bounded queue in front of it, so a slow stage holds
+back the file reader instead of piling items up in memory:
+
+    layout      algorithmic candidates (plus the LLM's with use_llm)
+    compliance  check_compliance(ocr=False) of every candidate; without use_llm
+                banned copy gets fallback_rewrite, so no stage calls the LLM
+    autofix     autofixes, re-check, best candidate (as validate_candidates)
+    render      render_canvas into EXPORTS_DIR
+
+An item that fails in one stage skips the rest and is recorded as failed.
+Finished items are checkpointed one by one in data/campaigns.sqlite3 under
+the run id (by default a hash of the products and options), so running the
+same campaign again resumes it: done items are skipped, failed ones are
+retried. The report gives throughput per stage (items/s over the stage's
+active time, busy time, latency percentiles, utilisation of its workers
+and the peak depth of its queue, which shows where items wait).
+
+Input columns / keys: id, headline, subhead, value_text, logo, packshots
+(CSV: separated by ";" or "|"), formats (optional per product override).
+Run from backend/:
+
+    python -m app.services.campaign run products.csv [--formats SQUARE,LANDSCAPE]
+        [--output-format PNG] [--llm] [--workers render=4] [--out DIR] [--report FILE]
+    python -m app.services.campaign status RUN_ID
+
+    AIRC_CAMPAIGN_WORKERS  default workers per stage, e.g. "layout=2,render=4"
+    AIRC_CAMPAIGN_MAX_WORKERS  cap on any stage's workers (CPU count)
+    AIRC_CAMPAIGN_QUEUE    items each stage queue holds (16)
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from pydantic import ValidationError
+
+from ..config import DATA_DIR
+from ..models.schemas import CampaignProduct, Canvas, ComplianceIssue, Format
+from ..utils.sqlite import connect
+from .admission import BATCH, workload_priority
+
+CAMPAIGNS_DB_PATH = DATA_DIR / "campaigns.sqlite3"
+STAGES = ("layout", "compliance", "autofix", "render")
+QUEUE_SIZE = int(os.getenv("AIRC_CAMPAIGN_QUEUE", "16"))
+MAX_STAGE_WORKERS = max(1, int(os.getenv("AIRC_CAMPAIGN_MAX_WORKERS", str(os.cpu_count() or 1))))
+# Progress callbacks closer together than this are skipped (the last one always runs)
+PROGRESS_INTERVAL_S = 0.5
+
+DONE, FAILED = "done", "failed"
+
+Progress = Callable[[float, str], None]
+
+_END = object()
+
+
+def parse_workers(spec: str) -> Dict[str, int]:
+    """"layout=2,render=4" -> {"layout": 2, "render": 4}."""
+    workers = {}
+    for part in spec.split(","):
+        name, _, count = part.strip().partition("=")
+        if name:
+            workers[name] = int(count)
+    return workers
+
+
+def default_workers() -> Dict[str, int]:
+    cpus = os.cpu_count() or 1
+    workers = {"layout": 1, "compliance": 1, "autofix": 1, "render": max(1, min(4, cpus))}
+    workers.update(parse_workers(os.getenv("AIRC_CAMPAIGN_WORKERS", "")))
+    return {name: min(MAX_STAGE_WORKERS, max(1, n)) for name, n in workers.items()}
+
+
+# --- input --------------------------------------------------------------------
+
+def _split(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in re.split(r"[;|]", value or "") if v.strip()]
+
+
+def read_products(content: str, input_format: str = "csv") -> List[CampaignProduct]:
+    """Parses a campaign file. Raises ValueError naming the row of the first invalid product."""
+    rows: List[dict] = []
+    if input_format == "csv":
+        for row in csv.DictReader(io.StringIO(content)):
+            row = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+            for key in ("packshots", "formats"):
+                if key in row:
+                    row[key] = _split(row[key]) or None
+            rows.append({k: v for k, v in row.items() if v not in ("", None)})
+    elif input_format == "jsonl":
+        for n, line in enumerate(content.splitlines(), 1):
+            if line.strip():
+                try:
+                    rows.append(json.loads(line))
+                except ValueError as e:
+                    raise ValueError(f"Line {n}: {e}")
+    else:
+        raise ValueError(f"Unknown input format: {input_format}")
+
+    products: List[CampaignProduct] = []
+    seen: Set[str] = set()
+    for n, row in enumerate(rows, 1):
+        try:
+            product = CampaignProduct.model_validate(row)
+        except ValidationError as e:
+            raise ValueError(f"Product {n}: {e.errors(include_url=False)[0]['msg']}")
+        product.id = product.id or str(n)
+        if product.id in seen:
+            raise ValueError(f"Product {n}: duplicate id {product.id!r}")
+        seen.add(product.id)
+        products.append(product)
+    return products
+
+
+# --- checkpoints --------------------------------------------------------------
+
+class CampaignCheckpoint:
+    """Runs and their finished items. Safe to share between threads."""
+
+    def __init__(self, path: Path = CAMPAIGNS_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS campaign_runs (
+                    id TEXT PRIMARY KEY,
+                    options TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS campaign_items (
+                    run_id TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    finished_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, item)
+                );
+                """
+            )
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            return self._db().execute(sql, params)
+
+    def start(self, run_id: str, options: dict, total: int) -> None:
+        now = time.time()
+        self._execute(
+            "INSERT INTO campaign_runs (id, options, total, created_at, updated_at) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET total = excluded.total, updated_at = excluded.updated_at, finished_at = NULL",
+            (run_id, json.dumps(options), total, now, now),
+        )
+
+    def finish(self, run_id: str) -> None:
+        self._execute("UPDATE campaign_runs SET finished_at = ? WHERE id = ?", (time.time(), run_id))
+
+    def done(self, run_id: str) -> Set[str]:
+        return {r["item"] for r in self._execute("SELECT item FROM campaign_items WHERE run_id = ? AND status = ?", (run_id, DONE))}
+
+    def record(self, run_id: str, item: str, status: str, result: Optional[dict], error: Optional[str]) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO campaign_items (run_id, item, status, result, error, finished_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (run_id, item, status, json.dumps(result) if result is not None else None, error, time.time()),
+        )
+
+    def items(self, run_id: str) -> Dict[str, dict]:
+        rows = self._execute("SELECT item, status, result, error FROM campaign_items WHERE run_id = ?", (run_id,)).fetchall()
+        return {r["item"]: {"status": r["status"], "result": json.loads(r["result"]) if r["result"] else None, "error": r["error"]} for r in rows}
+
+    def run(self, run_id: str) -> Optional[dict]:
+        row = self._execute("SELECT * FROM campaign_runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = dict(row)
+        run["options"] = json.loads(run["options"])
+        counts = self._execute("SELECT status, COUNT(*) AS n FROM campaign_items WHERE run_id = ? GROUP BY status", (run_id,))
+        run.update({DONE: 0, FAILED: 0}, **{r["status"]: r["n"] for r in counts})
+        return run
+
+
+# --- stages -------------------------------------------------------------------
+
+@dataclass
+class _Item:
+    key: str
+    product: CampaignProduct
+    format: Format
+    candidates: List[Canvas] = field(default_factory=list)
+    issues: List[List[ComplianceIssue]] = field(default_factory=list)
+    canvas: Optional[Canvas] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+
+def item_key(product_id: str, fmt: Format) -> str:
+    return f"{product_id}:{fmt.value}"
+
+
+def _layout(item: _Item, options: dict) -> None:
+    from .layout_engine import algorithmic_layouts, suggest_layouts
+
+    p = item.product
+    build = suggest_layouts if options["use_llm"] else algorithmic_layouts
+    item.candidates = build(item.format, p.headline, p.subhead, p.value_text, p.logo, p.packshots)
+    if not item.candidates:
+        raise ValueError("no layout candidates")
+
+
+def _compliance(item: _Item, options: dict) -> None:
+    from .compliance_engine import check_compliance
+
+    item.issues = [check_compliance(c, ocr=False, llm=options["use_llm"]) for c in item.candidates]
+
+
+def _autofix(item: _Item, options: dict) -> None:
+    from .layout_engine import candidate_rank, validate_candidate
+
+    checked = [validate_candidate(c, issues) for c, issues in zip(item.candidates, item.issues)]
+    # min() keeps the first of equals, like the stable sort in rank_candidates
+    item.canvas = min(checked, key=candidate_rank)
+    item.candidates, item.issues = [], []
+
+
+def _render(item: _Item, options: dict) -> None:
+    from .exporter import export_info, render_canvas
+
+    report = item.canvas.metadata["compliance"]
+    item.result = {
+        **export_info(render_canvas(item.canvas, options["output_format"])),
+        "score": report["score"],
+        "residual": [i["code"] for i in report["residual"]],
+    }
+    item.canvas = None
+
+
+_STAGE_FUNCS: Dict[str, Callable[[_Item, dict], None]] = {
+    "layout": _layout,
+    "compliance": _compliance,
+    "autofix": _autofix,
+    "render": _render,
+}
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+class _Stage:
+    """
+    Worker threads taking items from `inbox`, applying the stage and passing
+    them to `outbox`. Once `stop` is set, items are dropped unprocessed and
+    only the end markers go through.
+    """
+
+    def __init__(
+        self, name: str, workers: int, inbox: queue.Queue, outbox: queue.Queue, consumers: int, options: dict,
+        stop: threading.Event,
+    ):
+        self.name = name
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        # How many end markers the next stage needs: one per downstream worker
+        self.consumers = consumers
+        self.options = options
+        self.stop = stop
+        self._alive = workers
+        self._lock = threading.Lock()
+        self.durations: List[float] = []
+        self.errors = 0
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+        self.queue_peak = 0
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"campaign-{self.name}-{i}", daemon=True).start()
+
+    def _work(self) -> None:
+        fn = _STAGE_FUNCS[self.name]
+        with workload_priority(BATCH):
+            while True:
+                depth = self.inbox.qsize()
+                item = self.inbox.get()
+                if item is _END:
+                    break
+                if self.stop.is_set():
+                    continue
+                if item.error is None:
+                    started = time.perf_counter()
+                    try:
+                        fn(item, self.options)
+                    except Exception as e:
+                        item.error = f"{self.name}: {type(e).__name__}: {e}"
+                    ended = time.perf_counter()
+                    with self._lock:
+                        self.durations.append(ended - started)
+                        self.errors += item.error is not None
+                        self.first_start = started if self.first_start is None else min(self.first_start, started)
+                        self.last_end = ended if self.last_end is None else max(self.last_end, ended)
+                        self.queue_peak = max(self.queue_peak, depth)
+                self.outbox.put(item)
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+        if last:
+            for _ in range(self.consumers):
+                self.outbox.put(_END)
+
+    def stats(self) -> dict:
+        with self._lock:
+            durations = sorted(self.durations)
+            span = (self.last_end - self.first_start) if durations else 0.0
+        busy = sum(durations)
+        return {
+            "workers": self.workers,
+            "items": len(durations),
+            "errors": self.errors,
+            "busy_s": round(busy, 3),
+            "items_per_s": round(len(durations) / span, 2) if span > 0 else None,
+            "mean_ms": round(busy / len(durations) * 1000, 2) if durations else None,
+            "p50_ms": round(_percentile(durations, 0.5) * 1000, 2),
+            "p95_ms": round(_percentile(durations, 0.95) * 1000, 2),
+            "utilization": round(busy / (self.workers * span), 3) if span > 0 else None,
+            "queue_peak": self.queue_peak,
+        }
+
+
+# --- runs ---------------------------------------------------------------------
+
+def default_run_id(products: List[CampaignProduct], options: dict) -> str:
+    data = json.dumps([[p.model_dump(mode="json") for p in products], options], sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", value)
+
+
+def run_campaign(
+    products: List[CampaignProduct],
+    formats: Iterable[Format] = tuple(Format),
+    output_format: str = "PNG",
+    use_llm: bool = False,
+    run_id: Optional[str] = None,
+    workers: Optional[Dict[str, int]] = None,
+    progress: Optional[Progress] = None,
+    out_dir: Optional[Path] = None,
+    checkpoint: Optional[CampaignCheckpoint] = None,
+) -> dict:
+    """
+    Runs (or resumes) a campaign and returns its report: totals, per-stage
+    throughput and one result per item (including those finished by an
+    earlier, interrupted run). `out_dir` also receives a copy of each render
+    as <product id>_<format>.<ext>.
+    """
+    formats = [Format(f) for f in formats]
+    options = {"formats": [f.value for f in formats], "output_format": output_format.upper(), "use_llm": use_llm}
+    counts = default_workers()
+    for name, n in (workers or {}).items():
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage {name!r}; stages are {', '.join(STAGES)}")
+        counts[name] = min(MAX_STAGE_WORKERS, max(1, int(n)))
+    checkpoint = checkpoint or CampaignCheckpoint()
+    run_id = run_id or default_run_id(products, options)
+
+    items = [(p, f) for p in products for f in (p.formats or formats)]
+    checkpoint.start(run_id, options, len(items))
+    finished = checkpoint.done(run_id)
+    pending = [(p, f) for p, f in items if item_key(p.id, f) not in finished]
+    resumed = len(items) - len(pending)
+
+    # One bounded queue in front of each stage; the sink reads the last one
+    queues = [queue.Queue(maxsize=max(1, QUEUE_SIZE)) for _ in STAGES] + [queue.Queue()]
+    stop = threading.Event()
+    stages = [
+        _Stage(name, counts[name], queues[i], queues[i + 1], counts[STAGES[i + 1]] if i + 1 < len(STAGES) else 1, options, stop)
+        for i, name in enumerate(STAGES)
+    ]
+
+    def feed():
+        for product, fmt in pending:
+            if stop.is_set():
+                break
+            queues[0].put(_Item(item_key(product.id, fmt), product, fmt))
+        for _ in range(counts[STAGES[0]]):
+            queues[0].put(_END)
+
+    if out_dir is not None:
+        out_dir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    for s in stages:
+        s.start()
+    threading.Thread(target=feed, name="campaign-feed", daemon=True).start()
+
+    processed = failed = 0
+    last_progress = 0.0
+    ended = False
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _END:
+                break
+            if item.error is None and out_dir is not None:
+                try:
+                    src = Path(item.result["file_path"])
+                    shutil.copyfile(src, out_dir / f"{_safe_name(item.product.id)}_{item.format.value}{src.suffix}")
+                except OSError as e:
+                    item.error = f"copy: {e}"
+            status = DONE if item.error is None else FAILED
+            checkpoint.record(run_id, item.key, status, item.result, item.error)
+            processed += 1
+            failed += status == FAILED
+            now = time.perf_counter()
+            if progress and (now - last_progress >= PROGRESS_INTERVAL_S or processed == len(pending)):
+                last_progress = now
+                rate = processed / (now - started)
+                progress((resumed + processed) / max(1, len(items)), f"{resumed + processed}/{len(items)} items, {rate:.1f}/s")
+        ended = True
+    finally:
+        if not ended:
+            # The sink failed (e.g. the checkpoint could not be written): stop
+            # the stages and drain them so no worker stays blocked on a queue
+            stop.set()
+            while queues[-1].get() is not _END:
+                pass
+    wall = time.perf_counter() - started
+    checkpoint.finish(run_id)
+
+    recorded = checkpoint.items(run_id)
+    results = []
+    for product, fmt in items:
+        entry = recorded.get(item_key(product.id, fmt), {"status": FAILED, "result": None, "error": "not processed"})
+        results.append({"product": product.id, "format": fmt.value, "status": entry["status"],
+                        **(entry["result"] or {}), **({"error": entry["error"]} if entry["error"] else {})})
+    done = sum(r["status"] == DONE for r in results)
+    return {
+        "run_id": run_id,
+        "total": len(items),
+        "done": done,
+        "failed": len(items) - done,
+        "resumed": resumed,
+        "processed": processed,
+        "wall_s": round(wall, 3),
+        "items_per_s": round(processed / wall, 2) if wall > 0 and processed else None,
+        "stages": {s.name: s.stats() for s in stages},
+        "results": results,
+    }
+
+
+# --- CLI ----------------------------------------------------------------------
+
+def _print_report(report: dict) -> None:
+    print(f"Run {report['run_id']}: {report['done']}/{report['total']} done, {report['failed']} failed,"
+          f" {report['resumed']} resumed; {report['processed']} items in {report['wall_s']} s ({report['items_per_s']}/s)")
+    print(f"{'stage':<12}{'workers':>8}{'items':>7}{'items/s':>9}{'mean ms':>9}{'p95 ms':>9}{'util':>7}{'queue':>7}")
+    for name, s in report["stages"].items():
+        print(f"{name:<12}{s['workers']:>8}{s['items']:>7}{str(s['items_per_s']):>9}{str(s['mean_ms']):>9}"
+              f"{s['p95_ms']:>9}{str(s['utilization']):>7}{s['queue_peak']:>7}")
+    for r in report["results"]:
+        if r["status"] == FAILED:
+            print(f"  failed {r['product']} {r['format']}: {r.get('error')}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="AIRC campaign pipeline")
+    sub = ap.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Render every product in every format (resumes an interrupted run)")
+    run.add_argument("file", type=Path, help="CSV with a header row, or JSONL")
+    run.add_argument("--input-format", choices=("csv", "jsonl"), help="Default: from the file extension")
+    run.add_argument("--formats", default=",".join(f.value for f in Format))
+    run.add_argument("--output-format", choices=("PNG", "JPG"), default="PNG")
+    run.add_argument("--llm", action="store_true", help="Add the LLM layout candidate")
+    run.add_argument("--run-id", help="Default: derived from the products and options")
+    run.add_argument("--workers", default="", help='Per stage, e.g. "layout=2,render=4"')
+    run.add_argument("--out", type=Path, help="Also copy each render here")
+    run.add_argument("--report", type=Path, help="Write the JSON report here")
+    run.add_argument("--db", type=Path, default=CAMPAIGNS_DB_PATH)
+    st = sub.add_parser("status", help="Progress of a run")
+    st.add_argument("run_id")
+    st.add_argument("--db", type=Path, default=CAMPAIGNS_DB_PATH)
+    args = ap.parse_args(argv)
+
+    checkpoint = CampaignCheckpoint(args.db)
+    if args.command == "status":
+        found = checkpoint.run(args.run_id)
+        print(json.dumps(found, indent=2) if found else f"No run {args.run_id}")
+        return
+
+    input_format = args.input_format or ("jsonl" if args.file.suffix.lower() in (".jsonl", ".ndjson") else "csv")
+    try:
+        products = read_products(args.file.read_text(encoding="utf-8-sig"), input_format)
+        formats = [Format(f.strip()) for f in args.formats.split(",") if f.strip()]
+        report = run_campaign(
+            products,
+            formats=formats,
+            output_format=args.output_format,
+            use_llm=args.llm,
+            run_id=args.run_id,
+            workers=parse_workers(args.workers),
+            progress=lambda fraction, message: print(f"  {message}"),
+            out_dir=args.out,
+            checkpoint=checkpoint,
+        )
+    except ValueError as e:
+        raise SystemExit(f"error: {e}")
+    _print_report(report)
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,90 @@
 from __future__ import annotations
 
 import re
-from typing import List, Tuple
-from ..models.schemas import Canvas, ComplianceIssue, TextElement, ImageElement, BaseElement
+from functools import lru_cache
+from pathlib import Path
+from typing import List
+from ..models.compact import to_compact
+from ..models.schemas import Canvas, ComplianceIssue
 from ..config import SAFE_ZONES, BANNED_COPY_PATTERNS, MIN_FONT_SIZES, DRINKAWARE_TEXT
 from ..utils.contrast import passes_wcag_aa
-from ..compliance.ocr_check import ocr_text_from_bytes
+from ..compliance.ocr_check import ocr_available, ocr_text_from_bytes
 from ..services.llm_service import suggest_compliant_rewrite, fallback_rewrite
-
-
-def _rgb_tuple(rgba) -> Tuple[int, int, int]:
-    return (rgba.r, rgba.g, rgba.b)
-
-
-def _elements_by_type(canvas: Canvas):
-    texts: List[TextElement] = []
-    images: List[ImageElement] = []
-    for el in canvas.elements:
-        if isinstance(el, TextElement):
-            texts.append(el)
-        elif isinstance(el, ImageElement):
-            images.append(el)
-    return texts, images
-
-
-def check_compliance(canvas: Canvas) -> List[ComplianceIssue]:
+from .admission import Overloaded, admit
+from .asset_store import asset_path, file_digest
+from .metrics import register_collector, stage
+from .shared_cache import get_shared_cache
+
+# Shared cache namespace of OCR text by image content hash
+OCR_NAMESPACE = "ocr_text"
+
+
+@lru_cache(maxsize=1)
+def banned_copy_pattern() -> re.Pattern:
+    """All BANNED_COPY_PATTERNS as one case-insensitive regex, compiled once per process."""
+    return re.compile("|".join(BANNED_COPY_PATTERNS), flags=re.IGNORECASE)
+
+
+# Many text elements share a colour pair; the WCAG maths only runs once per pair
+_contrast_ok = lru_cache(maxsize=1024)(passes_wcag_aa)
+
+register_collector(
+    "airc_contrast_cache_lookups_total",
+    "counter",
+    "WCAG contrast results served from / added to the per-colour-pair cache",
+    lambda: [
+        ("airc_contrast_cache_lookups_total", {"result": "hit"}, _contrast_ok.cache_info().hits),
+        ("airc_contrast_cache_lookups_total", {"result": "miss"}, _contrast_ok.cache_info().misses),
+    ],
+)
+
+
+def ocr_text(path: Path) -> str:
+    """Text in an image file; recognised once per content for all workers, within the "ocr" admission budget."""
+    if not ocr_available():
+        return ""
+    cache = get_shared_cache()
+    key = file_digest(path)
+    data = cache.get(OCR_NAMESPACE, key)
+    if data is not None:
+        return data.decode("utf-8")
+    with admit("ocr"), stage("ocr"):
+        with open(path, "rb") as f:
+            text = ocr_text_from_bytes(f.read())
+    cache.put(OCR_NAMESPACE, key, text.encode("utf-8"))
+    return text
+
+
+def check_compliance(canvas: Canvas, ocr: bool = True, llm: bool = True) -> List[ComplianceIssue]:
+    """
+    Runs all rules against the canvas. `ocr=False` skips the (slow) image
+    text scan; `llm=False` suggests the deterministic fallback_rewrite for
+    banned copy instead of asking the LLM (one call per banned element).
+    """
     issues: List[ComplianceIssue] = []
     t, r, b, l = SAFE_ZONES[canvas.format]
 
-    texts, images = _elements_by_type(canvas)
+    compact = to_compact(canvas)
+    texts, images = compact.texts, compact.images
 
     # 1. Safe zones: ensure no element intersects the margin area
-    def in_safe_zone(el) -> bool:
-        x, y, w, h = el.bounds.x, el.bounds.y, el.bounds.width, el.bounds.height
-        if x < l or y < t or x + w > canvas.width - r or y + h > canvas.height - b:
-            return False
-        return True
-
-    for el in canvas.elements:
-        if not in_safe_zone(el):
-            issues.append(
-                ComplianceIssue(
-                    code="SAFE_ZONE",
-                    message=f"Element {el.id} violates safe zone.",
-                    severity="error",
-                    autofix={
-                        "action": "nudge_inside",
-                        "id": el.id,
-                        "min_x": l,
-                        "min_y": t,
-                        "max_x": canvas.width - r - el.bounds.width,
-                        "max_y": canvas.height - b - el.bounds.height,
-                    },
-                )
+    for i in compact.outside(l, t, canvas.width - r, canvas.height - b):
+        el = compact.elements[i]
+        issues.append(
+            ComplianceIssue(
+                code="SAFE_ZONE",
+                message=f"Element {el.id} violates safe zone.",
+                severity="error",
+                autofix={
+                    "action": "nudge_inside",
+                    "id": el.id,
+                    "min_x": l,
+                    "min_y": t,
+                    "max_x": canvas.width - r - el.width,
+                    "max_y": canvas.height - b - el.height,
+                },
             )
+        )
 
     # 2. Packshot limit <= 3
     packshots = [el for el in images if el.type == "packshot"]
@@ -68,10 +99,12 @@ def check_compliance(canvas: Canvas) -> List[ComplianceIssue]:
         )
 
     # 3. Banned copy in any text elements
-    pattern = re.compile("|".join(BANNED_COPY_PATTERNS), flags=re.IGNORECASE)
+    pattern = banned_copy_pattern()
     for te in texts:
-        if te.text and pattern.search(te.text):
-            suggestion = suggest_compliant_rewrite(te.text) or fallback_rewrite(te.text)
+        with stage("regex_scan"):
+            hit = bool(te.text) and pattern.search(te.text) is not None
+        if hit:
+            suggestion = (suggest_compliant_rewrite(te.text) if llm else None) or fallback_rewrite(te.text)
             issues.append(
                 ComplianceIssue(
                     code="BANNED_COPY",
@@ -83,38 +116,37 @@ def check_compliance(canvas: Canvas) -> List[ComplianceIssue]:
             )
 
     # 3b. OCR banned copy inside images (packshots/logos)
-    for img_el in images:
+    for img_el in (images if ocr else []):
+        # src is usually an /static/assets/ URL, not a filesystem path
+        p = asset_path(img_el.src)
+        if not p.exists():
+            continue
         try:
-            from pathlib import Path
-            p = Path(img_el.src)
-            if not p.exists():
-                continue
-            with open(p, 'rb') as f:
-                text = ocr_text_from_bytes(f.read())
-            if text and pattern.search(text):
-                issues.append(
-                    ComplianceIssue(
-                        code="BANNED_COPY_OCR",
-                        message=f"Banned text detected in image {img_el.id} via OCR.",
-                        severity="error",
-                        suggestion="Remove or cover embedded banned text in the image.",
-                        autofix={"action": "highlight_image", "id": img_el.id},
-                    )
-                )
+            text = ocr_text(p)
+        except Overloaded:
+            # An admission rejection must reach the caller
+            raise
         except Exception:
             continue
+        with stage("regex_scan"):
+            hit = bool(text) and pattern.search(text) is not None
+        if hit:
+            issues.append(
+                ComplianceIssue(
+                    code="BANNED_COPY_OCR",
+                    message=f"Banned text detected in image {img_el.id} via OCR.",
+                    severity="error",
+                    suggestion="Remove or cover embedded banned text in the image.",
+                    autofix={"action": "highlight_image", "id": img_el.id},
+                )
+            )
 
     # 4. Contrast checker AA: assume large text if font_size >= 24
-    bg_rgb = (255, 255, 255)
-    if canvas.background_color:
-        bg_rgb = _rgb_tuple(canvas.background_color)
+    bg_rgb = compact.background or (255, 255, 255)
     for te in texts:
-        fg = _rgb_tuple(te.color)
-        bg = bg_rgb
-        if te.background is not None:
-            bg = _rgb_tuple(te.background)
+        bg = te.background or bg_rgb
         large = te.font_size >= 24
-        if not passes_wcag_aa(fg, bg, large):
+        if not _contrast_ok(te.color, bg, large):
             issues.append(
                 ComplianceIssue(
                     code="CONTRAST",
@@ -137,7 +169,7 @@ def check_compliance(canvas: Canvas) -> List[ComplianceIssue]:
                 )
             )
         # bottom placement: within last 15% of canvas height
-        if te.bounds.y < int(canvas.height * 0.85):
+        if te.y < int(canvas.height * 0.85):
             issues.append(
                 ComplianceIssue(
                     code="DRINKAWARE_POSITION",
@@ -146,7 +178,7 @@ def check_compliance(canvas: Canvas) -> List[ComplianceIssue]:
                     autofix={
                         "action": "move_to",
                         "id": te.id,
-                        "x": te.bounds.x,
+                        "x": te.x,
                         "y": int(canvas.height * 0.88),
                     },
                 )
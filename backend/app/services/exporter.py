@@ -1,11 +1,35 @@
 from __future__ import annotations
 
+import math
+import threading
 from pathlib import Path
-from typing import Tuple
-from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Optional, Sequence, Tuple
 import os
-from ..models.schemas import Canvas, TextElement, ImageElement
-from ..config import EXPORTS_DIR, ASSETS_DIR
+from ..models.schemas import Canvas, TextElement, ImageElement, LayoutSuggestRequest
+from ..config import ASSETS_DIR, EXPORTS_DIR, FORMATS
+from .admission import BATCH, admit, workload_priority
+from .asset_store import asset_path
+from .ingest import ensure_record, nearest_mip, open_level, trim_box
+from .metrics import stage
+from .project_store import canvas_hash
+from .storage_manager import touch
+
+if TYPE_CHECKING:
+    from PIL import Image, ImageFont
+
+# Where the fitted image sits inside its bounds, as (x, y) fractions of the slack
+ANCHORS = {
+    "center": (0.5, 0.5),
+    "top": (0.5, 0.0),
+    "bottom": (0.5, 1.0),
+    "left": (0.0, 0.5),
+    "right": (1.0, 0.5),
+    "top_left": (0.0, 0.0),
+    "top_right": (1.0, 0.0),
+    "bottom_left": (0.0, 1.0),
+    "bottom_right": (1.0, 1.0),
+}
 
 
 def _rgb_tuple(rgba) -> Tuple[int, int, int]:
@@ -13,9 +37,17 @@ def _rgb_tuple(rgba) -> Tuple[int, int, int]:
 
 
 def _load_font(name: str, size: int) -> ImageFont.ImageFont:
+    with stage("font_load"):
+        return _open_font(name, size)
+
+
+# Fonts are parsed once per (family, size) and shared by every render
+@lru_cache(maxsize=256)
+def _open_font(name: str, size: int) -> ImageFont.ImageFont:
+    from PIL import ImageFont
+
     # Try bundled font in backend/fonts/, then Arial, then default
     try:
-        from pathlib import Path
         base = Path(__file__).resolve().parent.parent
         fonts_dir = base / "fonts"
         bundled = fonts_dir / "Inter-Regular.ttf"
@@ -29,40 +61,173 @@ def _load_font(name: str, size: int) -> ImageFont.ImageFont:
         return ImageFont.load_default()
 
 
+def fit_geometry(
+    content: Sequence[float],
+    target: Tuple[int, int],
+    fit: str = "contain",
+    anchor: str = "center",
+) -> Tuple[Tuple[float, float, float, float], Tuple[int, int], Tuple[int, int]]:
+    """
+    Maps a content box (x0, y0, x1, y1 in source pixels) onto a target
+    size. Returns (source box to resample, output size, offset inside the
+    target):
+
+    contain  whole content visible, aspect kept, placed by `anchor`
+    cover    target filled, aspect kept, overflow cropped around `anchor`
+    stretch  content resized to exactly the target
+    """
+    x0, y0, x1, y1 = content
+    cw, ch = max(x1 - x0, 1e-6), max(y1 - y0, 1e-6)
+    tw, th = target
+    fx, fy = ANCHORS.get(anchor, ANCHORS["center"])
+    if fit == "contain":
+        scale = min(tw / cw, th / ch)
+        ow, oh = max(1, min(tw, round(cw * scale))), max(1, min(th, round(ch * scale)))
+        return (x0, y0, x1, y1), (ow, oh), (round((tw - ow) * fx), round((th - oh) * fy))
+    if fit == "cover":
+        scale = max(tw / cw, th / ch)
+        vw, vh = min(cw, tw / scale), min(ch, th / scale)
+        sx, sy = x0 + (cw - vw) * fx, y0 + (ch - vh) * fy
+        return (sx, sy, sx + vw, sy + vh), (tw, th), (0, 0)
+    return (x0, y0, x1, y1), (tw, th), (0, 0)
+
+
+def _fit_image(
+    el: ImageElement, src_path: Path, scale: float = 1.0, wait: bool = False,
+) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+    """
+    Fitting stage: picks the content box (the ingest record's trim box, so
+    transparent or backdrop padding is never resampled), works out the
+    geometry, then resamples only that region from the smallest pyramid
+    level that still covers the output. Returns (image, offset in bounds).
+    With `wait`, ingestion is waited for and an asset that cannot be
+    ingested raises instead of being drawn from the original.
+    """
+    from PIL import Image, ImageOps
+
+    target = (round(el.bounds.width * scale), round(el.bounds.height * scale))
+    if target[0] <= 0 or target[1] <= 0:
+        return None
+    fit = el.fit if el.keep_aspect else "stretch"
+
+    record = ensure_record(src_path, wait=wait)
+    if record is not None:
+        full = (record["width"], record["height"])
+        content = record.get("trim_bbox") if el.trim else None
+        box, size, offset = fit_geometry(content or (0, 0, *full), target, fit, el.anchor)
+        # Level whose copy of `box` has at least `size` pixels
+        need = (math.ceil(full[0] * size[0] / max(box[2] - box[0], 1e-6)),
+                math.ceil(full[1] * size[1] / max(box[3] - box[1], 1e-6)))
+        mip_path, level = nearest_mip(src_path, *need, wait=wait)
+    else:
+        mip_path, level = src_path, None
+    if wait and level is None:
+        raise OSError(f"{src_path.name} could not be ingested")
+
+    with stage("decode"):
+        if level is not None:
+            # Decoded once per level, then mapped from the shared cache
+            pic = open_level(record, level)
+        else:
+            with Image.open(mip_path) as source:
+                pic = ImageOps.exif_transpose(source).convert("RGBA")
+            # Not ingested yet: measure the source the way ingestion will
+            full = pic.size
+            content = trim_box(pic) if el.trim else (0, 0, *full)
+            box, size, offset = fit_geometry(content, target, fit, el.anchor)
+        scale = pic.width / full[0]
+        box = tuple(v * scale for v in box)
+        # Crop to whole pixels around the box, then resample just that region
+        crop = (int(box[0]), int(box[1]), min(pic.width, math.ceil(box[2])), min(pic.height, math.ceil(box[3])))
+        region = pic.crop(crop)
+    local = (box[0] - crop[0], box[1] - crop[1], box[2] - crop[0], box[3] - crop[1])
+    with stage("resize"):
+        return region.resize(size, Image.LANCZOS, box=local), offset
+
+
 def render_canvas(canvas: Canvas, output_format: str = "PNG") -> Path:
-    img = Image.new("RGBA", (canvas.width, canvas.height), (*_rgb_tuple(canvas.background_color), int(canvas.background_color.a * 255)))
+    """Renders and encodes `canvas` into EXPORTS_DIR, within the "render" admission budget."""
+    with admit("render"):
+        return _render(canvas, output_format)
+
+
+def compose_canvas(canvas: Canvas, scale: float = 1.0, complete: bool = False) -> Image.Image:
+    """
+    Draws `canvas` into an RGBA image. `scale` < 1 draws every element at
+    reduced size (thumbnails), so images are fitted from small pyramid
+    levels instead of rendering at full size and shrinking. Images that
+    cannot be drawn are skipped, unless `complete`: then every image is
+    drawn from its ingested pyramid (waiting for ingestion) or the call
+    raises OSError.
+    """
+    from PIL import Image, ImageDraw
+
+    size = (max(1, round(canvas.width * scale)), max(1, round(canvas.height * scale)))
+    img = Image.new("RGBA", size, (*_rgb_tuple(canvas.background_color), int(canvas.background_color.a * 255)))
     draw = ImageDraw.Draw(img)
 
     for el in sorted(canvas.elements, key=lambda e: e.z):
         if isinstance(el, ImageElement):
             try:
-                src_path = Path(el.src)
-                if el.src.startswith("/static/assets/"):
-                    src_path = ASSETS_DIR / el.src.replace("/static/assets/", "")
-
+                src_path = asset_path(el.src)
                 if not src_path.exists():
+                    src_path = _restore(src_path)
+                    if src_path is None:
+                        if complete:
+                            raise FileNotFoundError(f"missing image {el.src}")
+                        continue
+                fitted = _fit_image(el, src_path, scale, wait=complete)
+                if fitted is None:
                     continue
-                pic = Image.open(src_path).convert("RGBA")
-                pic = pic.resize((el.bounds.width, el.bounds.height), Image.LANCZOS)
-                img.alpha_composite(pic, (el.bounds.x, el.bounds.y))
+                pic, (ox, oy) = fitted
+                img.alpha_composite(pic, (round(el.bounds.x * scale) + ox, round(el.bounds.y * scale) + oy))
             except Exception:
+                if complete:
+                    raise
                 continue
         elif isinstance(el, TextElement):
-            font = _load_font(el.font_family, el.font_size)
-            tx = el.bounds.x
-            ty = el.bounds.y
-            tw = el.bounds.width
-            th = el.bounds.height
+            font_size = max(1, round(el.font_size * scale))
+            font = _load_font(el.font_family, font_size)
+            tx = el.bounds.x * scale
+            ty = el.bounds.y * scale
+            tw = el.bounds.width * scale
+            th = el.bounds.height * scale
             if el.background is not None:
                 draw.rectangle([tx, ty, tx + tw, ty + th], fill=_rgb_tuple(el.background))
-            # simple vertical centering baseline
-            w, h = draw.textlength(el.text, font=font), el.font_size
-            x = tx + (tw - w) / 2 if el.align == "center" else (tx if el.align == "left" else tx + tw - w)
-            y = ty + (th - h) / 2
-            draw.text((x, y), el.text, font=font, fill=_rgb_tuple(el.color))
+            with stage("text_draw"):
+                # simple vertical centering baseline
+                w, h = draw.textlength(el.text, font=font), font_size
+                x = tx + (tw - w) / 2 if el.align == "center" else (tx if el.align == "left" else tx + tw - w)
+                y = ty + (th - h) / 2
+                draw.text((x, y), el.text, font=font, fill=_rgb_tuple(el.color))
+    return img
+
+
+def _restore(path: Path) -> Optional[Path]:
+    """Background-removal outputs evicted by the storage manager are re-created; other missing files are skipped."""
+    if path.parent != ASSETS_DIR:
+        return None
+    from .bg_removal import restore_output
+
+    return restore_output(path.name)
+
+
+def _render(canvas: Canvas, output_format: str) -> Path:
+    img = compose_canvas(canvas)
 
     EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
-    out_path = EXPORTS_DIR / f"export_{canvas.format}.{output_format.lower()}"
+    # Named by content: concurrent exports never overwrite each other, and
+    # re-exporting the same canvas replaces its previous file
+    out_path = EXPORTS_DIR / f"export_{canvas.format.value}_{canvas_hash(canvas.model_dump(mode='json'))[:16]}.{output_format.lower()}"
+    tmp = out_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with stage("encode"):
+        _encode(img, tmp, output_format)
+    os.replace(tmp, out_path)
+    touch("export", out_path.name)
+    return out_path
+
+
+def _encode(img: Image.Image, out_path: Path, output_format: str) -> None:
     if output_format.upper() == "JPG":
         rgb = img.convert("RGB")
         quality = 85
@@ -73,4 +238,31 @@ def render_canvas(canvas: Canvas, output_format: str = "PNG") -> Path:
             rgb.save(out_path, format="JPEG", quality=quality, optimize=True)
     else:
         img.save(out_path, format="PNG", optimize=True)
-    return out_path
+
+
+def export_info(out_path: Path) -> dict:
+    return {
+        "url": f"/static/exports/{out_path.name}",
+        "file_path": str(out_path),
+        "file_size_bytes": os.path.getsize(out_path),
+    }
+
+
+def export_all_formats(
+    payload: LayoutSuggestRequest,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> dict:
+    """Renders the best validated layout for every format: {format: export info}."""
+    from .layout_engine import suggest_layouts
+
+    results = {}
+    # Each render queues behind interactive exports
+    with workload_priority(BATCH):
+        for i, fmt in enumerate(FORMATS.keys()):
+            candidates = suggest_layouts(fmt, payload.headline, payload.subhead, payload.value_text, payload.logo, payload.packshots, validate=True)
+            if candidates:
+                # Ranked and already autofixed: the head needs the least fixing
+                results[fmt] = export_info(render_canvas(candidates[0], "PNG"))
+            if progress:
+                progress((i + 1) / len(FORMATS), fmt)
+    return results
@@ -0,0 +1,333 @@
+"""
+Asset ingestion: decode each uploaded asset once and keep everything later
+requests need next to it.
+
+For an asset with content hash <sha>, data/derived/<sha>/ holds
+
+    master.png   normalized RGBA (EXIF orientation applied)
+    mip_<n>.png  power-of-two reductions (1/2, 1/4, ...) down to MIP_MIN_SIDE
+    thumb.png    THUMB_SIZE thumbnail
+    meta.json    sidecar record: dimensions, alpha and trim boxes, dominant
+                 colours, files
+
+Ingestion runs on a small worker pool right after upload. Consumers ask for
+nearest_mip() instead of resampling the original, and fall back to the
+original file (scheduling ingestion) if the record is not there yet.
+open_level() returns a level's decoded pixels; they are decoded once and
+then mapped from the shared cache by every worker. The storage manager
+may delete a derived directory to stay within its disk budget; the next
+nearest_mip() for that asset falls back to the original and re-ingests.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from ..config import DATA_DIR
+from .asset_store import file_digest
+from .metrics import cache_lookup, stage
+from .shared_cache import get_shared_cache
+from .storage_manager import touch
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+DERIVED_DIR = DATA_DIR / "derived"
+INGEST_WORKERS = int(os.getenv("AIRC_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+MIP_MIN_SIDE = 64
+THUMB_SIZE = 256
+DOMINANT_COLORS = 5
+# Bump when the record layout changes; older records are re-ingested on demand
+RECORD_VERSION = 2
+# Trim boxes are measured on the largest level at most this big, then scaled up
+TRIM_MEASURE_SIDE = 1024
+TRIM_TOLERANCE = 12
+# Shared cache namespace of decoded RGBA levels
+PIXELS_NAMESPACE = "pixels"
+
+_pool: Optional[ThreadPoolExecutor] = None
+_inflight: Dict[str, Future] = {}
+_records: "OrderedDict[str, dict]" = OrderedDict()
+_RECORD_CACHE_ITEMS = 512
+_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, INGEST_WORKERS), thread_name_prefix="ingest")
+        return _pool
+
+
+def shutdown() -> None:
+    """Stops the worker pool after queued ingests finish; a later submit starts a new one."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def derived_dir(sha256: str) -> Path:
+    return DERIVED_DIR / sha256
+
+
+def _dominant_colors(thumb: Image.Image) -> List[dict]:
+    """Top colours of the opaque pixels, as {"rgb": [r, g, b], "share": fraction}."""
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    arr = np.asarray(thumb)
+    opaque = arr[arr[..., 3] > 0][:, :3]
+    if opaque.size == 0:
+        return []
+    # Posterize first so anti-aliasing shades merge into their base colour
+    strip = ImageOps.posterize(Image.fromarray(opaque.reshape(1, -1, 3).astype(np.uint8), "RGB"), 4)
+    quant = strip.quantize(colors=DOMINANT_COLORS, method=Image.Quantize.MEDIANCUT)
+    palette = quant.getpalette() or []
+    total = opaque.shape[0]
+    counts = sorted(quant.getcolors() or [], reverse=True)
+    return [
+        {"rgb": palette[idx * 3: idx * 3 + 3], "share": round(count / total, 4)}
+        for count, idx in counts
+    ]
+
+
+def _trim_bbox(level_img: Image.Image, scale: int, full_size: Tuple[int, int]) -> List[int]:
+    """
+    Box around the visible product: pixels that are neither (near)
+    transparent nor close to the backdrop colour sampled from the border.
+    Measured on a reduced level and grown by one level pixel so scaling
+    back up never clips content. Falls back to the full image.
+    """
+    import numpy as np
+
+    arr = np.asarray(level_img)
+    border = np.concatenate([arr[0], arr[-1], arr[:, 0], arr[:, -1]])
+    opaque_border = border[border[:, 3] > 16][:, :3]
+    content = arr[..., 3] > 16
+    if opaque_border.size:
+        backdrop = np.median(opaque_border, axis=0).astype(np.int16)
+        content &= np.abs(arr[..., :3].astype(np.int16) - backdrop).max(axis=-1) > TRIM_TOLERANCE
+    ys, xs = np.nonzero(content)
+    w, h = full_size
+    if xs.size == 0:
+        return [0, 0, w, h]
+    return [
+        max(0, (int(xs.min()) - 1) * scale),
+        max(0, (int(ys.min()) - 1) * scale),
+        min(w, (int(xs.max()) + 2) * scale),
+        min(h, (int(ys.max()) + 2) * scale),
+    ]
+
+
+def trim_box(img: Image.Image) -> List[int]:
+    """
+    Trim box of a full-size RGBA image, measured on the same reduced level
+    ingest_asset uses, so drawing from the original before ingestion frames
+    the product exactly like the record's trim_bbox will.
+    """
+    measure, scale = img, 1
+    while max(measure.size) > TRIM_MEASURE_SIDE and max(measure.size) // 2 >= MIP_MIN_SIDE:
+        measure = measure.reduce(2)
+        scale *= 2
+    return _trim_bbox(measure, scale, img.size)
+
+
+def _save_png(img: Image.Image, path: Path) -> None:
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    img.save(tmp, format="PNG", compress_level=3)
+    os.replace(tmp, path)
+
+
+def ingest_asset(src: Path, sha256: Optional[str] = None) -> dict:
+    """Decodes `src` once and writes master, mips, thumbnail and meta.json. Returns the record."""
+    from PIL import Image, ImageOps
+
+    started = time.perf_counter()
+    sha256 = sha256 or file_digest(src)
+    out_dir = derived_dir(sha256)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    with stage("decode"), Image.open(src) as img:
+        source_format = img.format
+        master = ImageOps.exif_transpose(img).convert("RGBA")
+    _save_png(master, out_dir / "master.png")
+
+    mips = [{"level": 0, "width": master.width, "height": master.height, "file": "master.png"}]
+    level_img = master
+    level = 0
+    measure, measure_scale = master, 1
+    while max(level_img.size) // 2 >= MIP_MIN_SIDE:
+        level += 1
+        level_img = level_img.reduce(2)
+        name = f"mip_{level}.png"
+        _save_png(level_img, out_dir / name)
+        mips.append({"level": level, "width": level_img.width, "height": level_img.height, "file": name})
+        if max(measure.size) > TRIM_MEASURE_SIDE:
+            measure, measure_scale = level_img, 2 ** level
+
+    thumb = level_img.copy()
+    thumb.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+    _save_png(thumb, out_dir / "thumb.png")
+
+    alpha = master.getchannel("A")
+    alpha_min, _ = alpha.getextrema()
+    record = {
+        "version": RECORD_VERSION,
+        "sha256": sha256,
+        "source": src.name,
+        "format": source_format,
+        "width": master.width,
+        "height": master.height,
+        "has_alpha": alpha_min < 255,
+        "alpha_bbox": list(alpha.getbbox() or (0, 0, 0, 0)),
+        "trim_bbox": _trim_bbox(measure, measure_scale, master.size),
+        "dominant_colors": _dominant_colors(thumb),
+        "mips": mips,
+        "thumbnail": {"file": "thumb.png", "width": thumb.width, "height": thumb.height},
+        "ingest_seconds": round(time.perf_counter() - started, 4),
+        "created_at": time.time(),
+    }
+    tmp = out_dir / f"meta.{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp.write_text(json.dumps(record), encoding="utf-8")
+    os.replace(tmp, out_dir / "meta.json")
+    _remember(record)
+    touch("derived", sha256)
+    return record
+
+
+def _remember(record: dict) -> None:
+    with _lock:
+        _records[record["sha256"]] = record
+        _records.move_to_end(record["sha256"])
+        while len(_records) > _RECORD_CACHE_ITEMS:
+            _records.popitem(last=False)
+
+
+def _run(src: Path, sha256: str) -> Optional[dict]:
+    try:
+        return ingest_asset(src, sha256)
+    except Exception as e:
+        print(f"Ingest failed for {src}: {e}")
+        return None
+    finally:
+        with _lock:
+            _inflight.pop(sha256, None)
+
+
+def submit_ingest(src: Path, sha256: Optional[str] = None) -> Future:
+    """Queues ingestion on the worker pool; concurrent requests for the same content share one job."""
+    sha256 = sha256 or file_digest(src)
+    with _lock:
+        fut = _inflight.get(sha256)
+        if fut is None:
+            fut = _inflight[sha256] = Future()
+            pending = True
+        else:
+            pending = False
+    if pending:
+        job = _executor().submit(_run, src, sha256)
+        job.add_done_callback(lambda j: fut.set_result(j.result()))
+    return fut
+
+
+def get_record(src: Path, sha256: Optional[str] = None) -> Optional[dict]:
+    """The sidecar record for an asset, or None if it has not been ingested yet."""
+    try:
+        sha256 = sha256 or file_digest(src)
+    except OSError:
+        return None
+    with _lock:
+        record = _records.get(sha256)
+    cache_lookup("asset_record", record is not None)
+    if record is not None:
+        return record
+    meta = derived_dir(sha256) / "meta.json"
+    if not meta.exists():
+        return None
+    try:
+        record = json.loads(meta.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if record.get("version") != RECORD_VERSION:
+        return None
+    _remember(record)
+    return record
+
+
+def ensure_record(src: Path, wait: bool = False) -> Optional[dict]:
+    """Returns the record; if missing, schedules ingestion and (optionally) waits for it."""
+    record = get_record(src)
+    if record is not None:
+        return record
+    try:
+        fut = submit_ingest(src)
+    except OSError:
+        return None
+    return fut.result() if wait else None
+
+
+def open_level(record: dict, mip: dict) -> Image.Image:
+    """
+    RGBA image of one pyramid level. The raw pixels are stored in the
+    shared cache after the first decode; later opens in any worker wrap
+    the mapped buffer without decoding or copying, so the image is
+    read-only (crop or copy before drawing on it).
+    """
+    from PIL import Image
+
+    key = f"{record['sha256']}:{RECORD_VERSION}:{mip['file']}"
+    cache = get_shared_cache()
+    found = cache.view(PIXELS_NAMESPACE, key)
+    if found is not None:
+        buf, meta = found
+        return Image.frombuffer("RGBA", tuple(meta["size"]), buf, "raw", "RGBA", 0, 1)
+    with Image.open(derived_dir(record["sha256"]) / mip["file"]) as pic:
+        img = pic.convert("RGBA")
+    cache.put(PIXELS_NAMESPACE, key, img.tobytes(), meta={"size": list(img.size)})
+    return img
+
+
+def _pick_mip(record: dict, width: int, height: int) -> dict:
+    chosen = record["mips"][0]
+    for mip in record["mips"]:
+        if mip["width"] >= width and mip["height"] >= height:
+            chosen = mip
+        else:
+            break
+    return chosen
+
+
+def nearest_mip(src: Path, width: int, height: int, wait: bool = False) -> Tuple[Path, Optional[dict]]:
+    """
+    Smallest pyramid level at least `width` x `height`, so resizing from it
+    never upsamples more than the original would. Returns (path, level);
+    level is None when the asset is not ingested yet and `src` itself is
+    returned (ingestion is queued for next time). With `wait`, ingestion
+    is waited for instead, so level is only None if it failed.
+    """
+    record = ensure_record(src, wait=wait)
+    if record is None:
+        return src, None
+    chosen = _pick_mip(record, width, height)
+    path = derived_dir(record["sha256"]) / chosen["file"]
+    if not path.exists():
+        # Evicted by the storage manager: rebuild it for next time
+        with _lock:
+            _records.pop(record["sha256"], None)
+        fut = submit_ingest(src, record["sha256"])
+        record = fut.result() if wait else None
+        if record is None:
+            return src, None
+        chosen = _pick_mip(record, width, height)
+        path = derived_dir(record["sha256"]) / chosen["file"]
+    touch("derived", record["sha256"])
+    return path, chosen
@@ -0,0 +1,384 @@
+"""
+Local job subsystem for CPU-heavy work.
+
+Jobs are rows in a SQLite table (data/jobs.sqlite3) and run on a process
+pool, so renders, compliance checks and background removal neither hold
+the API's threadpool nor its GIL. Workers write status, progress and the
+JSON result straight into the table; the API only reads it. A job keeps
+running when the client that submitted it disconnects, and its result
+stays available until the row is deleted.
+
+Several API processes (uvicorn --workers N) share the table. A worker
+claims a job atomically (queued -> running, with its owner id) before
+running it, so a job runs once even if more than one process dispatched
+it, and refreshes the job's heartbeat while it runs. A starting process
+fails only running jobs whose heartbeat is older than AIRC_JOB_LEASE_S
+(their worker is gone) and dispatches the queued ones; jobs other live
+processes are running are left alone.
+
+Each kind maps to (request model, handler). Handlers are module-level
+functions taking the validated request and a progress(fraction, message)
+callback and returning a JSON-serialisable dict; they import their
+services lazily so worker processes start quickly.
+
+    AIRC_JOB_WORKERS   process pool size
+    AIRC_JOB_EXECUTOR  "process" (default) or "thread"
+    AIRC_JOB_LEASE_S   heartbeat age after which a running job counts as lost
+"""
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from ..config import DATA_DIR
+from ..models.schemas import CampaignRequest, ComplianceRequest, ExportRequest, LayoutSuggestRequest, RemoveBgBatchRequest
+from ..utils.sqlite import connect
+from .admission import BATCH, workload_priority
+
+JOBS_DB_PATH = DATA_DIR / "jobs.sqlite3"
+JOB_WORKERS = int(os.getenv("AIRC_JOB_WORKERS", str(min(4, os.cpu_count() or 1))))
+JOB_EXECUTOR = os.getenv("AIRC_JOB_EXECUTOR", "process")
+# Progress writes closer together than this are dropped (the last one always lands)
+PROGRESS_MIN_INTERVAL_S = 0.2
+JOB_LEASE_S = float(os.getenv("AIRC_JOB_LEASE_S", "60"))
+# Running jobs refresh their heartbeat this many times per lease
+HEARTBEATS_PER_LEASE = 4
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+Progress = Callable[[float, str], None]
+
+
+# --- handlers -----------------------------------------------------------------
+
+def _export_image(req: ExportRequest, progress: Progress) -> dict:
+    from .exporter import export_info, render_canvas
+
+    return export_info(render_canvas(req.canvas, req.output_format))
+
+
+def _export_batch(req: LayoutSuggestRequest, progress: Progress) -> dict:
+    from .exporter import export_all_formats
+
+    return export_all_formats(req, progress=progress)
+
+
+def _compliance_check(req: ComplianceRequest, progress: Progress) -> dict:
+    from .compliance_engine import check_compliance
+
+    issues = check_compliance(req.canvas)
+    return {"passed": len(issues) == 0, "issues": [i.model_dump(mode="json") for i in issues]}
+
+
+def _compliance_autofix(req: ComplianceRequest, progress: Progress) -> dict:
+    from .autofix import apply_autofixes
+    from .compliance_engine import check_compliance
+
+    issues = check_compliance(req.canvas)
+    return apply_autofixes(req.canvas, issues).model_dump(mode="json")
+
+
+def _remove_bg(req: RemoveBgBatchRequest, progress: Progress) -> dict:
+    from .bg_removal import remove_background_assets
+
+    return {"results": remove_background_assets(req.urls, tolerance=req.tolerance, feather=req.feather, progress=progress)}
+
+
+def _campaign(req: CampaignRequest, progress: Progress) -> dict:
+    from .campaign import read_products, run_campaign
+
+    products = read_products(req.content, req.input_format)
+    return run_campaign(
+        products,
+        formats=req.formats,
+        output_format=req.output_format,
+        use_llm=req.use_llm,
+        run_id=req.run_id,
+        workers=req.workers,
+        progress=progress,
+    )
+
+
+JOB_KINDS: Dict[str, Tuple[Type[BaseModel], Callable[[BaseModel, Progress], dict]]] = {
+    "export_image": (ExportRequest, _export_image),
+    "export_batch": (LayoutSuggestRequest, _export_batch),
+    "compliance_check": (ComplianceRequest, _compliance_check),
+    "compliance_autofix": (ComplianceRequest, _compliance_autofix),
+    "remove_bg": (RemoveBgBatchRequest, _remove_bg),
+    "campaign": (CampaignRequest, _campaign),
+}
+
+
+# --- storage ------------------------------------------------------------------
+
+class JobStore:
+    """The jobs table. One instance per process; safe to share between threads."""
+
+    def __init__(self, path: Path = JOBS_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    heartbeat REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+                """
+            )
+            columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            return self._db().execute(sql, params)
+
+    def create(self, kind: str, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(payload), time.time()),
+        )
+        return job_id
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[dict]:
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop("payload")
+        result = job.pop("result")
+        if with_result:
+            job["result"] = json.loads(result) if result else None
+        return job
+
+    def payload(self, job_id: str) -> dict:
+        row = self._execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["payload"])
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[dict]:
+        sql = "SELECT id, kind, status, progress, message, error, created_at, started_at, finished_at FROM jobs"
+        params: tuple = ()
+        if status:
+            sql += " WHERE status = ?"
+            params = (status,)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        return [dict(r) for r in self._execute(sql, params + (limit,)).fetchall()]
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """queued -> running for `owner`; False if another worker claimed it first (or it is finished)."""
+        now = time.time()
+        return self._execute(
+            "UPDATE jobs SET status = ?, owner = ?, started_at = ?, heartbeat = ? WHERE id = ? AND status = ?",
+            (RUNNING, owner, now, now, job_id, QUEUED),
+        ).rowcount > 0
+
+    def heartbeat(self, job_id: str, owner: str) -> None:
+        self._execute(
+            "UPDATE jobs SET heartbeat = ? WHERE id = ? AND owner = ? AND status = ?",
+            (time.time(), job_id, owner, RUNNING),
+        )
+
+    def set_progress(self, job_id: str, owner: str, progress: float, message: str = "") -> None:
+        self._execute(
+            "UPDATE jobs SET progress = ?, message = ?, heartbeat = ? WHERE id = ? AND status = ? AND owner = ?",
+            (max(0.0, min(1.0, progress)), message, time.time(), job_id, RUNNING, owner),
+        )
+
+    def finish(self, job_id: str, owner: str, result: dict) -> None:
+        """Records the result of a job `owner` is running; a job already failed as lost stays failed."""
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, progress = 1, finished_at = ? WHERE id = ? AND status = ? AND owner = ?",
+            (DONE, json.dumps(result), time.time(), job_id, RUNNING, owner),
+        )
+
+    def fail(self, job_id: str, error: str) -> None:
+        """Marks a job failed unless it already finished."""
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status NOT IN (?, ?)",
+            (FAILED, error, time.time(), job_id, DONE, FAILED),
+        )
+
+    def fail_lost(self, lease_s: float) -> int:
+        """Fails running jobs whose heartbeat is older than `lease_s` (their worker died). Returns how many."""
+        now = time.time()
+        return self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ? AND COALESCE(heartbeat, started_at, 0) < ?",
+            (FAILED, "interrupted", now, RUNNING, now - lease_s),
+        ).rowcount
+
+    def queued(self) -> List[dict]:
+        rows = self._execute("SELECT id, kind FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)).fetchall()
+        return [dict(r) for r in rows]
+
+
+# --- execution ----------------------------------------------------------------
+
+_worker_stores: Dict[str, JobStore] = {}
+
+
+def _progress_writer(store: JobStore, job_id: str, owner: str) -> Progress:
+    last = [0.0]
+
+    def progress(fraction: float, message: str = "") -> None:
+        now = time.monotonic()
+        if fraction < 1.0 and now - last[0] < PROGRESS_MIN_INTERVAL_S:
+            return
+        last[0] = now
+        store.set_progress(job_id, owner, fraction, message)
+
+    return progress
+
+
+def _warm_worker() -> int:
+    """Imports the handlers' services in a pool worker, so its first job does not pay for it."""
+    from . import bg_removal, compliance_engine, exporter  # noqa: F401
+
+    return os.getpid()
+
+
+def _heartbeats(store: JobStore, job_id: str, owner: str, stop: threading.Event) -> None:
+    while not stop.wait(JOB_LEASE_S / HEARTBEATS_PER_LEASE):
+        try:
+            store.heartbeat(job_id, owner)
+        except Exception as e:
+            print(f"Job {job_id} heartbeat failed: {e}")
+
+
+def run_job(db_path: str, job_id: str, kind: str) -> None:
+    """Worker entry point: claims the job, runs the handler and records the outcome."""
+    store = _worker_stores.get(db_path)
+    if store is None:
+        store = _worker_stores[db_path] = JobStore(Path(db_path))
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    if not store.claim(job_id, owner):
+        # Already taken by a worker of another process (or finished)
+        return
+    stop = threading.Event()
+    threading.Thread(target=_heartbeats, args=(store, job_id, owner, stop), name=f"job-heartbeat-{job_id[:8]}", daemon=True).start()
+    try:
+        model, handler = JOB_KINDS[kind]
+        request = model.model_validate(store.payload(job_id))
+        with workload_priority(BATCH):
+            result = handler(request, _progress_writer(store, job_id, owner))
+        store.finish(job_id, owner, result)
+    except Exception as e:
+        store.fail(job_id, f"{type(e).__name__}: {e}")
+    finally:
+        stop.set()
+
+
+class JobQueue:
+    """
+    Submits jobs to the pool. On start, running jobs whose lease expired
+    are failed and queued jobs are dispatched (claiming makes a job that
+    another process also dispatched run once).
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, workers: int = JOB_WORKERS, executor: str = JOB_EXECUTOR):
+        self.store = store or JobStore()
+        self._workers = max(1, workers)
+        self._kind = executor
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        lost = self.store.fail_lost(JOB_LEASE_S)
+        if lost:
+            print(f"Jobs: {lost} running jobs lost their worker and were failed")
+        for job in self.store.queued():
+            self._dispatch(job["id"], job["kind"])
+
+    def _executor(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self._kind == "thread":
+                    self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="job")
+                else:
+                    # spawn: forking a process that runs threads (uvicorn, ingest pool) is unsafe
+                    self._pool = ProcessPoolExecutor(max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _dispatch(self, job_id: str, kind: str) -> None:
+        fut = self._executor().submit(run_job, str(self.store.path), job_id, kind)
+
+        def on_done(f):
+            # Only reached with an exception if the worker itself died
+            exc = f.exception()
+            if exc is not None:
+                self.store.fail(job_id, f"worker_error: {exc}")
+
+        fut.add_done_callback(on_done)
+
+    def submit(self, kind: str, payload: dict) -> str:
+        """Validates `payload` for `kind` and queues it. Raises KeyError / pydantic.ValidationError."""
+        model, _ = JOB_KINDS[kind]
+        payload = model.model_validate(payload).model_dump(mode="json")
+        job_id = self.store.create(kind, payload)
+        self._dispatch(job_id, kind)
+        return job_id
+
+    def prestart(self, timeout: Optional[float] = None) -> int:
+        """Starts the pool's workers and warms them up. Returns how many distinct workers answered."""
+        pool = self._executor()
+        try:
+            futures = [pool.submit(_warm_worker) for _ in range(self._workers)]
+            return len({f.result(timeout) for f in futures})
+        except BrokenExecutor:
+            # Let the next submit start a fresh pool instead of failing on this one
+            self.shutdown()
+            raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=False)
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> JobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+def shutdown_queue() -> None:
+    """Stops the pool if jobs were ever used; running jobs finish in their workers."""
+    with _queue_lock:
+        queue = _queue
+    if queue is not None:
+        queue.shutdown()
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-from typing import List
-from ..models.schemas import Canvas, TextElement, ImageElement, BaseElement, Rect, RGBA, Format
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+from ..models.schemas import Canvas, CanvasElement, ComplianceIssue, TextElement, ImageElement, Rect, RGBA, Format
 from ..config import FORMATS, SAFE_ZONES
-from .llm_service import generate_layout_json
+from .llm_service import generate_layout_json, generate_layout_json_async
+from .compliance_engine import check_compliance
+from .autofix import apply_autofixes
 
 # Z-index constants
 Z_BG = 0
@@ -53,7 +57,7 @@ def _arrange_packshots(packshots: List[str], bounds: Rect, z_start: int) -> List
 def _generate_landscape_standard(format, headline, subhead, value_text, logo, packshots) -> Canvas:
     """Standard Landscape: Image Left, Text Right"""
     w, h, t, r, b, l = _get_safe_zones(format)
-    elements: List[BaseElement] = []
+    elements: List[CanvasElement] = []
     mid_x = w // 2
     
     # 1. Logo (Top Right)
@@ -130,7 +134,7 @@ def _generate_landscape_standard(format, headline, subhead, value_text, logo, pa
 def _generate_landscape_inverted(format, headline, subhead, value_text, logo, packshots) -> Canvas:
     """Inverted Landscape: Text Left, Image Right"""
     w, h, t, r, b, l = _get_safe_zones(format)
-    elements: List[BaseElement] = []
+    elements: List[CanvasElement] = []
     mid_x = w // 2
     
     # 1. Logo (Top Left)
@@ -197,7 +201,7 @@ def _generate_landscape_inverted(format, headline, subhead, value_text, logo, pa
 def _generate_vertical_standard(format, headline, subhead, value_text, logo, packshots) -> Canvas:
     """Standard Vertical: Logo Top Left, Text Top, Packshot Bottom Right, Value Bottom Left"""
     w, h, t, r, b, l = _get_safe_zones(format)
-    elements: List[BaseElement] = []
+    elements: List[CanvasElement] = []
     safe_w = w - l - r
     
     current_y = t + 20
@@ -281,7 +285,7 @@ def _generate_vertical_standard(format, headline, subhead, value_text, logo, pac
 def _generate_vertical_centered(format, headline, subhead, value_text, logo, packshots) -> Canvas:
     """Centered Vertical: Logo Top Center, Text Center, Packshot Bottom Center"""
     w, h, t, r, b, l = _get_safe_zones(format)
-    elements: List[BaseElement] = []
+    elements: List[CanvasElement] = []
     safe_w = w - l - r
     
     current_y = t + 20
@@ -356,6 +360,78 @@ def _generate_vertical_centered(format, headline, subhead, value_text, logo, pac
     return Canvas(format=format, width=w, height=h, background_color=RGBA(r=255, g=255, b=255, a=1), elements=elements)
 
 
+def _canvas_from_llm(format: Format, llm_data: Optional[dict]) -> Optional[Canvas]:
+    if not llm_data:
+        return None
+    try:
+        # Ensure format is correct enum
+        llm_data["format"] = format
+        return Canvas(**llm_data)
+    except Exception as e:
+        print(f"Error parsing LLM layout: {e}")
+        return None
+
+
+def algorithmic_layouts(
+    format: Format,
+    headline: str | None,
+    subhead: str | None,
+    value_text: str | None,
+    logo: str | None,
+    packshots: list[str],
+) -> List[Canvas]:
+    """Deterministic template layouts; cheap enough to build inline on every request."""
+    if format in ("LANDSCAPE", "CHECKOUT"):
+        return [
+            _generate_landscape_standard(format, headline, subhead, value_text, logo, packshots),
+            _generate_landscape_inverted(format, headline, subhead, value_text, logo, packshots),
+        ]
+    return [
+        _generate_vertical_standard(format, headline, subhead, value_text, logo, packshots),
+        _generate_vertical_centered(format, headline, subhead, value_text, logo, packshots),
+    ]
+
+
+def validate_candidate(canvas: Canvas, issues: Optional[List[ComplianceIssue]] = None) -> Canvas:
+    """
+    Checks a candidate (without OCR or LLM rewrites: banned copy gets the
+    deterministic fallback, so validation adds no model round trips),
+    applies autofixes and re-checks.
+    Returns the fixed canvas with the findings under metadata["compliance"]:
+    the original issues, the residual ones autofix could not resolve and a
+    score in [0, 1] (1 = compliant as generated). `issues` skips the first
+    check when the caller already ran it.
+    """
+    if issues is None:
+        issues = check_compliance(canvas, ocr=False, llm=False)
+    fixed = apply_autofixes(canvas, issues) if issues else canvas.model_copy(deep=True)
+    residual = check_compliance(fixed, ocr=False, llm=False) if issues else []
+    score = max(0.0, 1.0 - 0.2 * len(residual) - 0.05 * len(issues))
+    fixed.metadata = dict(fixed.metadata or {})
+    fixed.metadata["compliance"] = {
+        "issues": [i.model_dump() for i in issues],
+        "residual": [i.model_dump() for i in residual],
+        "autofixed": bool(issues),
+        "score": round(score, 3),
+    }
+    return fixed
+
+
+def rank_candidates(candidates: List[Canvas]) -> List[Canvas]:
+    """Validates candidates in parallel and orders them by residual violations, then score."""
+    if not candidates:
+        return []
+    with ThreadPoolExecutor(max_workers=len(candidates)) as pool:
+        checked = list(pool.map(validate_candidate, candidates))
+    # sorted() is stable, so ties keep the generator order
+    return sorted(checked, key=candidate_rank)
+
+
+def candidate_rank(canvas: Canvas) -> tuple:
+    """Sort key of a validated candidate: fewest residual violations, then highest score."""
+    return (len(canvas.metadata["compliance"]["residual"]), -canvas.metadata["compliance"]["score"])
+
+
 def suggest_layouts(
     format: Format,
     headline: str | None,
@@ -363,6 +439,7 @@ def suggest_layouts(
     value_text: str | None,
     logo: str | None,
     packshots: list[str],
+    validate: bool = False,
 ) -> List[Canvas]:
     
     candidates = []
@@ -372,20 +449,53 @@ def suggest_layouts(
     llm_data = generate_layout_json(
         format, w, h, headline, subhead, value_text, logo, packshots
     )
-    if llm_data:
-        try:
-            # Ensure format is correct enum
-            llm_data["format"] = format
-            candidates.append(Canvas(**llm_data))
-        except Exception as e:
-            print(f"Error parsing LLM layout: {e}")
+    llm_canvas = _canvas_from_llm(format, llm_data)
+    if llm_canvas is not None:
+        candidates.append(llm_canvas)
 
     # 2. Algorithmic Fallbacks
-    if format in ("LANDSCAPE", "CHECKOUT"):
-        candidates.append(_generate_landscape_standard(format, headline, subhead, value_text, logo, packshots))
-        candidates.append(_generate_landscape_inverted(format, headline, subhead, value_text, logo, packshots))
-    else:
-        candidates.append(_generate_vertical_standard(format, headline, subhead, value_text, logo, packshots))
-        candidates.append(_generate_vertical_centered(format, headline, subhead, value_text, logo, packshots))
-        
+    candidates.extend(algorithmic_layouts(format, headline, subhead, value_text, logo, packshots))
+
+    if validate:
+        return rank_candidates(candidates)
     return candidates
+
+
+async def stream_layouts(
+    format: Format,
+    headline: str | None,
+    subhead: str | None,
+    value_text: str | None,
+    logo: str | None,
+    packshots: list[str],
+    deadline: float,
+) -> AsyncIterator[Tuple[str, Canvas | None]]:
+    """
+    Yields (source, canvas) pairs as they become available.
+
+    The LLM request starts first and runs on the event loop while the
+    algorithmic candidates are yielded straight away. The LLM candidate
+    follows once it arrives; if it has not arrived within `deadline`
+    seconds it is cancelled and ("llm_timeout", None) is yielded instead.
+    """
+    w, h = FORMATS[format]
+    llm_task = asyncio.create_task(
+        generate_layout_json_async(format, w, h, headline, subhead, value_text, logo, packshots)
+    )
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        for canvas in algorithmic_layouts(format, headline, subhead, value_text, logo, packshots):
+            yield "algorithmic", canvas
+
+        remaining = max(0.0, deadline - (loop.time() - started))
+        try:
+            llm_data = await asyncio.wait_for(llm_task, timeout=remaining)
+        except asyncio.TimeoutError:
+            yield "llm_timeout", None
+            return
+        llm_canvas = _canvas_from_llm(format, llm_data)
+        yield ("llm", llm_canvas) if llm_canvas is not None else ("llm_unavailable", None)
+    finally:
+        if not llm_task.done():
+            llm_task.cancel()
@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Sequence
+
+from ..config import DATA_DIR
+from ..utils.sqlite import connect
+from .metrics import IN_FLIGHT, stage
+from .shared_cache import SharedCache, get_shared_cache
+
+# Shared cache namespace of response texts
+CACHE_NAMESPACE = "llm_response"
+# Where responses were cached before the shared cache; imported once, then deleted
+LEGACY_CACHE_PATH = DATA_DIR / "cache" / "llm_cache.sqlite3"
+
+
+def _model_name() -> str:
+    return os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+
+def _endpoint() -> Optional[str]:
+    """Base URL of an HTTP LLM stand-in (see llm_standin.py); unset means live Gemini."""
+    url = os.getenv("AIRC_LLM_ENDPOINT")
+    return url.rstrip("/") if url else None
+
+
+def _timeout() -> float:
+    return float(os.getenv("AIRC_LLM_TIMEOUT", "30"))
+
+
+def _cache_ttl() -> float:
+    # Seconds; 0 disables the response cache
+    return float(os.getenv("AIRC_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def image_digest(img: Any) -> str:
+    """
+    Content hash for a PIL image prompt part. Prompt-asset thumbnails carry
+    a precomputed hash in img.info["airc_sha256"]; anything else is hashed
+    from its pixels.
+    """
+    info = getattr(img, "info", None) or {}
+    if info.get("airc_sha256"):
+        return info["airc_sha256"]
+    h = hashlib.sha256(f"{img.mode}:{img.size}".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def prompt_key(model_name: str, parts: Sequence[Any]) -> str:
+    """Cache key over (model, prompt text, image hashes)."""
+    h = hashlib.sha256(model_name.encode())
+    for part in parts:
+        if isinstance(part, str):
+            h.update(b"\x00t:")
+            h.update(part.encode("utf-8"))
+        else:
+            h.update(b"\x00i:")
+            h.update(image_digest(part).encode())
+    return h.hexdigest()
+
+
+def migrate_legacy_cache(cache: SharedCache, path: Path = LEGACY_CACHE_PATH) -> int:
+    """
+    Moves responses from the old per-gateway SQLite cache into the shared
+    cache (with what is left of their TTL) and deletes the old database.
+    Returns the number of responses imported; safe to run from several
+    processes at once.
+    """
+    if not path.exists():
+        return 0
+    ttl = _cache_ttl()
+    now = time.time()
+    imported = 0
+    try:
+        conn = connect(path)
+        try:
+            rows = conn.execute("SELECT key, model, response, created_at FROM llm_cache").fetchall()
+        finally:
+            conn.close()
+        for row in rows:
+            left = row["created_at"] + ttl - now
+            if ttl > 0 and left > 0:
+                cache.put(CACHE_NAMESPACE, row["key"], row["response"].encode("utf-8"), meta={"model": row["model"]}, ttl=left)
+                imported += 1
+    except Exception as e:
+        # An unreadable old cache only costs the answers in it
+        print(f"LLM cache migration error: {e}")
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    if imported:
+        print(f"Moved {imported} cached LLM responses into the shared cache")
+    return imported
+
+
+class LLMGateway:
+    """
+    Single entry point for Gemini calls.
+
+    - one configured client and one GenerativeModel per model name per process
+    - response cache keyed by (model, prompt hash, image hashes), in the
+      shared cache so every worker process reuses every answer
+    - single-flight: concurrent identical prompts share one in-flight call
+    - latency / token / hit-rate counters (see stats())
+
+    With AIRC_LLM_ENDPOINT set, calls go to that HTTP stand-in instead of
+    Gemini (no API key needed); AIRC_LLM_RECORD appends every answered
+    prompt to a JSONL file the stand-in can replay.
+
+    generate()/agenerate() return the response text, or None when the LLM is
+    disabled, unconfigured or the call failed; callers keep their fallbacks.
+    """
+
+    def __init__(self, cache: Optional[SharedCache] = None):
+        self._shared = cache
+        self._legacy_checked = False
+        self._lock = threading.Lock()
+        self._models: Dict[str, Any] = {}
+        self._configured_key: Optional[str] = None
+        self._inflight: Dict[str, Future] = {}
+        self._ainflight: Dict[tuple, asyncio.Future] = {}
+        self._counters = {
+            "calls": 0,
+            "errors": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "coalesced": 0,
+            "prompt_tokens": 0,
+            "output_tokens": 0,
+        }
+        self._latencies = deque(maxlen=1024)
+        self._http = None
+        # event loop -> AsyncClient; an entry goes away with its loop
+        self._ahttp: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._record_lock = threading.Lock()
+
+    # -- client pool -------------------------------------------------------
+
+    def available(self) -> bool:
+        if os.getenv("AIRC_LLM_ENABLED", "1") in ("0", "false", "False"):
+            return False
+        return bool(_endpoint() or os.getenv("GEMINI_API_KEY"))
+
+    def warm(self) -> None:
+        """Imports the client library and opens the client ahead of the first call."""
+        if not self.available():
+            return
+        if _endpoint():
+            self._http_client()
+        else:
+            self._model(_model_name())
+
+    def _http_client(self):
+        import httpx
+
+        with self._lock:
+            if self._http is None:
+                self._http = httpx.Client(timeout=_timeout())
+            return self._http
+
+    def _ahttp_client(self):
+        import httpx
+
+        # httpx async pools are bound to the loop that opened them
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._ahttp.get(loop)
+            if client is None:
+                client = self._ahttp[loop] = httpx.AsyncClient(timeout=_timeout())
+            return client
+
+    async def aclose(self) -> None:
+        """
+        Closes the async HTTP clients (lifespan shutdown): the running loop's
+        is awaited, those of other live loops are closed on their loop, and
+        those of closed loops, whose connections went with them, are dropped.
+        """
+        current = asyncio.get_running_loop()
+        with self._lock:
+            clients = list(self._ahttp.items())
+            self._ahttp.clear()
+        for loop, client in clients:
+            if loop is current:
+                await client.aclose()
+                continue
+            try:
+                loop.call_soon_threadsafe(lambda c=client: asyncio.ensure_future(c.aclose()))
+            except RuntimeError:
+                pass  # the loop is closed
+
+    def _model(self, model_name: str):
+        api_key = os.getenv("GEMINI_API_KEY")
+        with self._lock:
+            if api_key != self._configured_key:
+                import google.generativeai as genai
+
+                genai.configure(api_key=api_key)
+                self._configured_key = api_key
+                self._models.clear()
+            model = self._models.get(model_name)
+            if model is None:
+                import google.generativeai as genai
+
+                model = self._models[model_name] = genai.GenerativeModel(model_name)
+            return model
+
+    # -- metrics -----------------------------------------------------------
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def _record_call(self, started: float, resp: Any) -> None:
+        usage = getattr(resp, "usage_metadata", None)
+        with self._lock:
+            self._counters["calls"] += 1
+            self._latencies.append(time.perf_counter() - started)
+            if usage is not None:
+                self._counters["prompt_tokens"] += int(getattr(usage, "prompt_token_count", 0) or 0)
+                self._counters["output_tokens"] += int(getattr(usage, "candidates_token_count", 0) or 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            lat = sorted(self._latencies)
+        lookups = out["cache_hits"] + out["cache_misses"]
+        out["hit_rate"] = round(out["cache_hits"] / lookups, 4) if lookups else 0.0
+        if lat:
+            out["latency_p50_s"] = round(lat[len(lat) // 2], 4)
+            out["latency_p95_s"] = round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 4)
+            out["latency_max_s"] = round(lat[-1], 4)
+        return out
+
+    # -- calls -------------------------------------------------------------
+
+    def _cache(self) -> SharedCache:
+        cache = self._shared or get_shared_cache()
+        if not self._legacy_checked:
+            self._legacy_checked = True
+            migrate_legacy_cache(cache)
+        return cache
+
+    def _cached(self, key: str) -> Optional[str]:
+        if _cache_ttl() <= 0:
+            return None
+        try:
+            data = self._cache().get(CACHE_NAMESPACE, key)
+        except Exception as e:
+            print(f"LLM cache read error: {e}")
+            data = None
+        text = data.decode("utf-8") if data is not None else None
+        self._count("cache_hits" if text is not None else "cache_misses")
+        return text
+
+    def _store(self, key: str, model_name: str, text: Optional[str]) -> None:
+        ttl = _cache_ttl()
+        if text and ttl > 0:
+            try:
+                self._cache().put(CACHE_NAMESPACE, key, text.encode("utf-8"), meta={"model": model_name}, ttl=ttl)
+            except Exception as e:
+                print(f"LLM cache write error: {e}")
+
+    @staticmethod
+    def _http_payload(model_name: str, key: str, parts: Sequence[Any]) -> dict:
+        return {
+            "model": model_name,
+            "key": key,
+            "parts": [{"text": p} if isinstance(p, str) else {"image": image_digest(p)} for p in parts],
+        }
+
+    @staticmethod
+    def _http_response(resp: Any) -> Any:
+        resp.raise_for_status()
+        body = resp.json()
+        usage = body.get("usage") or {}
+        return SimpleNamespace(
+            text=body.get("text"),
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=usage.get("prompt_tokens", 0),
+                candidates_token_count=usage.get("output_tokens", 0),
+            ),
+        )
+
+    def _record(self, model_name: str, key: str, parts: Sequence[Any], text: Optional[str], started: float) -> None:
+        """Record mode (AIRC_LLM_RECORD=<file.jsonl>): append the exchange for later replay."""
+        path = os.getenv("AIRC_LLM_RECORD")
+        if not path or not text:
+            return
+        row = {
+            "key": key,
+            "model": model_name,
+            "prompt": "\n".join(p for p in parts if isinstance(p, str)),
+            "images": [image_digest(p) for p in parts if not isinstance(p, str)],
+            "text": text,
+            "latency_s": round(time.perf_counter() - started, 4),
+        }
+        with self._record_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def _call(self, model_name: str, key: str, parts: Sequence[Any]) -> Optional[str]:
+        started = time.perf_counter()
+        try:
+            endpoint = _endpoint()
+            with stage("llm_call"), IN_FLIGHT.track("llm_call"):
+                if endpoint:
+                    resp = self._http_response(
+                        self._http_client().post(f"{endpoint}/v1/generate", json=self._http_payload(model_name, key, parts))
+                    )
+                else:
+                    resp = self._model(model_name).generate_content(list(parts))
+        except Exception as e:
+            self._count("errors")
+            print(f"LLM Error: {e}")
+            return None
+        self._record_call(started, resp)
+        text = getattr(resp, "text", None) or None
+        self._record(model_name, key, parts, text, started)
+        return text
+
+    async def _acall(self, model_name: str, key: str, parts: Sequence[Any]) -> Optional[str]:
+        started = time.perf_counter()
+        try:
+            endpoint = _endpoint()
+            with stage("llm_call"), IN_FLIGHT.track("llm_call"):
+                if endpoint:
+                    resp = self._http_response(
+                        await self._ahttp_client().post(f"{endpoint}/v1/generate", json=self._http_payload(model_name, key, parts))
+                    )
+                else:
+                    resp = await self._model(model_name).generate_content_async(list(parts))
+        except Exception as e:
+            self._count("errors")
+            print(f"LLM Error: {e}")
+            return None
+        self._record_call(started, resp)
+        text = getattr(resp, "text", None) or None
+        await asyncio.to_thread(self._record, model_name, key, parts, text, started)
+        return text
+
+    def generate(self, parts: Sequence[Any] | str, model_name: Optional[str] = None) -> Optional[str]:
+        if not self.available():
+            return None
+        if isinstance(parts, str):
+            parts = [parts]
+        model_name = model_name or _model_name()
+        key = prompt_key(model_name, parts)
+
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+        if not leader:
+            self._count("coalesced")
+            return fut.result()
+
+        text = None
+        try:
+            text = self._call(model_name, key, parts)
+            self._store(key, model_name, text)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fut.set_result(text)
+        return text
+
+    async def agenerate(self, parts: Sequence[Any] | str, model_name: Optional[str] = None) -> Optional[str]:
+        """
+        generate() for the event loop. Only the model call is awaited on the
+        loop; hashing the parts and the SQLite cache reads/writes run in
+        worker threads so a large image does not stall other requests.
+        """
+        if not self.available():
+            return None
+        if isinstance(parts, str):
+            parts = [parts]
+        model_name = model_name or _model_name()
+        key = await asyncio.to_thread(prompt_key, model_name, parts)
+
+        cached = await asyncio.to_thread(self._cached, key)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)
+        fut = self._ainflight.get(slot)
+        if fut is not None:
+            self._count("coalesced")
+            # shield: a cancelled follower must not cancel the shared call
+            return await asyncio.shield(fut)
+
+        fut = self._ainflight[slot] = loop.create_future()
+        text = None
+        try:
+            text = await self._acall(model_name, key, parts)
+            await asyncio.to_thread(self._store, key, model_name, text)
+        finally:
+            self._ainflight.pop(slot, None)
+            if not fut.done():
+                fut.set_result(text)
+        return text
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
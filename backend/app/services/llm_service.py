@@ -1,13 +1,15 @@
 from __future__ import annotations
 
-import os
+import asyncio
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from pathlib import Path
 from ..config import ASSETS_DIR
+from .llm_gateway import get_gateway
 
 def _enabled() -> bool:
-    return os.getenv("AIRC_LLM_ENABLED", "1") not in ("0", "false", "False")
+    """LLM switched on (AIRC_LLM_ENABLED) and configured (GEMINI_API_KEY)."""
+    return get_gateway().available()
 
 
 def suggest_compliant_rewrite(text: str) -> Optional[str]:
@@ -15,33 +17,40 @@ def suggest_compliant_rewrite(text: str) -> Optional[str]:
     if not text or not _enabled():
         return None
 
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    prompt = (
+        "Rewrite this ad copy to be retail-media compliant. "
+        "Keep meaning similar, remove/avoid banned claims (e.g., free, win, competition, price claims, sustainability claims), "
+        "avoid absolute guarantees, and keep it short. Return ONLY the rewritten copy.\n\n"
+        f"COPY: {text}"
+    )
+
+    out = get_gateway().generate(prompt)
+    if not out:
         return None
+    out = out.strip().strip('"').strip("'")
+    return out or None
 
-    model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
 
-    try:
-        import google.generativeai as genai
+def _copy_fallback(product_name: str) -> dict:
+    return {
+        "headline": f"New {product_name}",
+        "subhead": "Quality you can trust",
+        "value_text": "Great Value"
+    }
 
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name)
 
-        prompt = (
-            "Rewrite this ad copy to be retail-media compliant. "
-            "Keep meaning similar, remove/avoid banned claims (e.g., free, win, competition, price claims, sustainability claims), "
-            "avoid absolute guarantees, and keep it short. Return ONLY the rewritten copy.\n\n"
-            f"COPY: {text}"
-        )
+def _clean_json_text(txt: str) -> str:
+    return txt.replace("```json", "").replace("```", "").strip()
 
-        resp = model.generate_content(prompt)
-        out = getattr(resp, "text", None)
-        if not out:
-            return None
-        out = out.strip().strip('"').strip("'")
-        return out or None
-    except Exception:
-        return None
+
+def _copy_from_data(data: Any, fallback: dict) -> dict:
+    if not isinstance(data, dict):
+        return fallback
+    return {
+        "headline": data.get("headline", fallback["headline"]),
+        "subhead": data.get("subhead", fallback["subhead"]),
+        "value_text": data.get("value_text", fallback["value_text"]),
+    }
 
 
 def generate_ad_copy(product_name: str, topic: str = "promotion") -> dict:
@@ -49,49 +58,176 @@ def generate_ad_copy(product_name: str, topic: str = "promotion") -> dict:
     Generate ad copy (headline, subhead, value_text) for a product.
     Returns a dict with those keys.
     """
-    fallback = {
-        "headline": f"New {product_name}",
-        "subhead": "Quality you can trust",
-        "value_text": "Great Value"
-    }
+    fallback = _copy_fallback(product_name)
 
     if not _enabled():
         return fallback
 
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return fallback
+    prompt = (
+        f"Write retail ad copy for product: '{product_name}'. Topic: '{topic}'.\n"
+        "Return valid JSON with 3 keys: 'headline' (max 25 chars), 'subhead' (max 40 chars), 'value_text' (e.g. price/offer, max 15 chars).\n"
+        "No markdown formatting. JSON only."
+    )
 
-    model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+    txt = get_gateway().generate(prompt)
+    if not txt:
+        return fallback
     try:
-        import google.generativeai as genai
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name)
-
-        prompt = (
-            f"Write retail ad copy for product: '{product_name}'. Topic: '{topic}'.\n"
-            "Return valid JSON with 3 keys: 'headline' (max 25 chars), 'subhead' (max 40 chars), 'value_text' (e.g. price/offer, max 15 chars).\n"
-            "No markdown formatting. JSON only."
-        )
-
-        resp = model.generate_content(prompt)
-        txt = getattr(resp, "text", "")
-        if not txt:
-            return fallback
-        
-        # clean cleanup
-        txt = txt.replace("```json", "").replace("```", "").strip()
-        data = json.loads(txt)
-        return {
-            "headline": data.get("headline", fallback["headline"]),
-            "subhead": data.get("subhead", fallback["subhead"]),
-            "value_text": data.get("value_text", fallback["value_text"]),
-        }
+        return _copy_from_data(json.loads(_clean_json_text(txt)), fallback)
     except Exception as e:
         print(f"LLM Error: {e}")
         return fallback
 
 
+def generate_ad_copy_batch(products: List[Tuple[str, str]]) -> List[dict]:
+    """
+    Ad copy for several (product_name, topic) pairs with a single prompt.
+    Returns one dict per product, in order; products the model skipped or
+    garbled get the same fallback as generate_ad_copy.
+    """
+    fallbacks = [_copy_fallback(name) for name, _ in products]
+    if not products or not _enabled():
+        return fallbacks
+    if len(products) == 1:
+        return [generate_ad_copy(*products[0])]
+
+    listing = "\n".join(
+        f"{i + 1}. product: '{name}'. Topic: '{topic}'." for i, (name, topic) in enumerate(products)
+    )
+    prompt = (
+        f"Write retail ad copy for each of these {len(products)} products:\n{listing}\n"
+        f"Return a valid JSON array of exactly {len(products)} objects in the same order, each with 3 keys: "
+        "'headline' (max 25 chars), 'subhead' (max 40 chars), 'value_text' (e.g. price/offer, max 15 chars).\n"
+        "No markdown formatting. JSON only."
+    )
+
+    txt = get_gateway().generate(prompt)
+    if not txt:
+        return fallbacks
+    try:
+        data = json.loads(_clean_json_text(txt))
+    except Exception as e:
+        print(f"LLM Error: {e}")
+        return fallbacks
+    if not isinstance(data, list):
+        return fallbacks
+    return [
+        _copy_from_data(data[i] if i < len(data) else None, fallbacks[i])
+        for i in range(len(products))
+    ]
+
+
+def _layout_prompt_parts(
+    format_name: str,
+    width: int,
+    height: int,
+    headline: str,
+    subhead: str,
+    value_text: str,
+    logo_url: str,
+    packshot_urls: List[str]
+) -> List[Any]:
+    """Builds the multimodal prompt (packshot images + instructions) for a layout request."""
+    from .prompt_assets import prompt_image
+
+    prompt_parts: List[Any] = []
+
+    # Load images if available (cached, model-sized thumbnails)
+    for p_url in packshot_urls:
+        # Convert /static/assets/foo.png -> ASSETS_DIR/foo.png
+        if "/static/assets/" in p_url:
+            fname = p_url.split("/static/assets/")[-1]
+            fpath = ASSETS_DIR / fname
+            if fpath.exists():
+                img = prompt_image(fpath)
+                if img is not None:
+                    prompt_parts.append(img)
+                    prompt_parts.append(f"Image: {fname}")
+
+    # Construct a description of the elements
+    elements_desc = []
+    if headline:
+        elements_desc.append(f"- Headline text: '{headline}'")
+    else:
+        elements_desc.append("- Headline text: (MISSING - Please generate a catchy, short retail headline based on the product image)")
+        
+    if subhead:
+        elements_desc.append(f"- Subhead text: '{subhead}'")
+    else:
+        elements_desc.append("- Subhead text: (MISSING - Please generate a short supporting subhead)")
+
+    if value_text:
+        elements_desc.append(f"- Value/Price text: '{value_text}'")
+    
+    if logo_url:
+        elements_desc.append(f"- Logo image (src='{logo_url}')")
+    
+    for i, p in enumerate(packshot_urls):
+        elements_desc.append(f"- Packshot image {i+1} (src='{p}')")
+
+    text_prompt = f"""
+    You are an expert graphic designer. Create a JSON layout for a retail banner ad.
+    
+    Canvas Details:
+    - Format: {format_name}
+    - Dimensions: {width}x{height} pixels
+    
+    Elements to Include:
+    {chr(10).join(elements_desc)}
+    
+    Requirements:
+    1. Return ONLY valid JSON. No markdown formatting.
+    2. The JSON must match this schema structure:
+       {{
+         "format": "{format_name}",
+         "width": {width},
+         "height": {height},
+         "background_color": {{ "r": 255, "g": 255, "b": 255, "a": 1 }},
+         "elements": [
+           {{
+             "id": "unique_id",
+             "type": "text" | "image" | "logo" | "packshot" | "value_tile",
+             "text": "string (if text type)",
+             "src": "string (if image type)",
+             "bounds": {{ "x": int, "y": int, "width": int, "height": int }},
+             "font_size": int (if text),
+             "color": {{ "r": int, "g": int, "b": int, "a": 1 }},
+             "background": {{ "r": int, "g": int, "b": int, "a": float }} (optional),
+             "z": int (layer order)
+           }}
+         ]
+       }}
+    3. Design Guidelines:
+       - **Visual Analysis:** Look at the provided product images. Place text in negative space (empty areas) if possible. Match the color scheme to the product if appropriate.
+       - **Copy Generation:** If headline or subhead were marked MISSING, generate them now. Keep them short, punchy, and relevant to the visual product.
+       - **Safe Zones:** Keep all text and logos at least 50px away from any edge. Do NOT place content at y=0 or y={height}.
+       - **Style:** Use a clean, modern retail style. Prefer dark text on white background or white text on transparent background if over a clean area. Avoid heavy black bars behind text unless absolutely necessary for contrast.
+       - **Logo:** Place the logo in a corner (top-left, top-right) or top-center, with ample padding (at least 40px from top/left).
+       - **Packshots:** Center the main product images. Ensure they are large enough but do not touch the edges.
+       - **Text:** Ensure headline is prominent. Avoid overlapping text on top of product faces/details.
+       - **Value Tile:** Make the price/offer pop (e.g., yellow/red background), but place it strategically (e.g., bottom corner or near product) without covering the product.
+    """
+    
+    prompt_parts.append(text_prompt)
+    return prompt_parts
+
+
+def _parse_layout_text(out: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not out:
+        return None
+    
+    # Clean up potential markdown code blocks
+    out = out.strip()
+    if out.startswith("```json"):
+        out = out[7:]
+    if out.startswith("```"):
+        out = out[3:]
+    if out.endswith("```"):
+        out = out[:-3]
+    
+    return json.loads(out.strip())
+
+
 def generate_layout_json(
     format_name: str,
     width: int,
@@ -109,119 +245,40 @@ def generate_layout_json(
     if not _enabled():
         return None
 
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return None
-
-    model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-
     try:
-        import google.generativeai as genai
-        from PIL import Image
-        
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name)
+        prompt_parts = _layout_prompt_parts(
+            format_name, width, height, headline, subhead, value_text, logo_url, packshot_urls
+        )
+        return _parse_layout_text(get_gateway().generate(prompt_parts))
+    except Exception as e:
+        print(f"LLM Layout Gen Error: {e}")
+        return None
 
-        # Prepare inputs for multimodal prompt
-        prompt_parts = []
-        
-        # Load images if available
-        loaded_images = []
-        for p_url in packshot_urls:
-            # Convert /static/assets/foo.png -> ASSETS_DIR/foo.png
-            if "/static/assets/" in p_url:
-                fname = p_url.split("/static/assets/")[-1]
-                fpath = ASSETS_DIR / fname
-                if fpath.exists():
-                    try:
-                        img = Image.open(fpath)
-                        loaded_images.append(img)
-                        prompt_parts.append(img)
-                        prompt_parts.append(f"Image: {fname}")
-                    except Exception:
-                        pass
-
-        # Construct a description of the elements
-        elements_desc = []
-        if headline:
-            elements_desc.append(f"- Headline text: '{headline}'")
-        else:
-            elements_desc.append("- Headline text: (MISSING - Please generate a catchy, short retail headline based on the product image)")
-            
-        if subhead:
-            elements_desc.append(f"- Subhead text: '{subhead}'")
-        else:
-            elements_desc.append("- Subhead text: (MISSING - Please generate a short supporting subhead)")
-
-        if value_text:
-            elements_desc.append(f"- Value/Price text: '{value_text}'")
-        
-        if logo_url:
-            elements_desc.append(f"- Logo image (src='{logo_url}')")
-        
-        for i, p in enumerate(packshot_urls):
-            elements_desc.append(f"- Packshot image {i+1} (src='{p}')")
 
-        text_prompt = f"""
-        You are an expert graphic designer. Create a JSON layout for a retail banner ad.
-        
-        Canvas Details:
-        - Format: {format_name}
-        - Dimensions: {width}x{height} pixels
-        
-        Elements to Include:
-        {chr(10).join(elements_desc)}
-        
-        Requirements:
-        1. Return ONLY valid JSON. No markdown formatting.
-        2. The JSON must match this schema structure:
-           {{
-             "format": "{format_name}",
-             "width": {width},
-             "height": {height},
-             "background_color": {{ "r": 255, "g": 255, "b": 255, "a": 1 }},
-             "elements": [
-               {{
-                 "id": "unique_id",
-                 "type": "text" | "image" | "logo" | "packshot" | "value_tile",
-                 "text": "string (if text type)",
-                 "src": "string (if image type)",
-                 "bounds": {{ "x": int, "y": int, "width": int, "height": int }},
-                 "font_size": int (if text),
-                 "color": {{ "r": int, "g": int, "b": int, "a": 1 }},
-                 "background": {{ "r": int, "g": int, "b": int, "a": float }} (optional),
-                 "z": int (layer order)
-               }}
-             ]
-           }}
-        3. Design Guidelines:
-           - **Visual Analysis:** Look at the provided product images. Place text in negative space (empty areas) if possible. Match the color scheme to the product if appropriate.
-           - **Copy Generation:** If headline or subhead were marked MISSING, generate them now. Keep them short, punchy, and relevant to the visual product.
-           - **Safe Zones:** Keep all text and logos at least 50px away from any edge. Do NOT place content at y=0 or y={height}.
-           - **Style:** Use a clean, modern retail style. Prefer dark text on white background or white text on transparent background if over a clean area. Avoid heavy black bars behind text unless absolutely necessary for contrast.
-           - **Logo:** Place the logo in a corner (top-left, top-right) or top-center, with ample padding (at least 40px from top/left).
-           - **Packshots:** Center the main product images. Ensure they are large enough but do not touch the edges.
-           - **Text:** Ensure headline is prominent. Avoid overlapping text on top of product faces/details.
-           - **Value Tile:** Make the price/offer pop (e.g., yellow/red background), but place it strategically (e.g., bottom corner or near product) without covering the product.
-        """
-        
-        prompt_parts.append(text_prompt)
+async def generate_layout_json_async(
+    format_name: str,
+    width: int,
+    height: int,
+    headline: str,
+    subhead: str,
+    value_text: str,
+    logo_url: str,
+    packshot_urls: List[str]
+) -> Optional[Dict[str, Any]]:
+    """
+    Same as generate_layout_json but awaits Gemini on the event loop
+    (generate_content_async) so it can run alongside other work. The prompt
+    (image hashing, decode/resize, cache lookups) is built in a worker thread.
+    """
+    if not _enabled():
+        return None
 
-        resp = model.generate_content(prompt_parts)
-        out = getattr(resp, "text", None)
-        if not out:
-            return None
-        
-        # Clean up potential markdown code blocks
-        out = out.strip()
-        if out.startswith("```json"):
-            out = out[7:]
-        if out.startswith("```"):
-            out = out[3:]
-        if out.endswith("```"):
-            out = out[:-3]
-        
-        return json.loads(out.strip())
+    try:
+        prompt_parts = await asyncio.to_thread(
+            _layout_prompt_parts,
+            format_name, width, height, headline, subhead, value_text, logo_url, packshot_urls,
+        )
+        return _parse_layout_text(await get_gateway().agenerate(prompt_parts))
     except Exception as e:
         print(f"LLM Layout Gen Error: {e}")
         return None
@@ -0,0 +1,252 @@
+"""
+Local stand-in for the Gemini API, for load tests and CI without network.
+
+Point the backend at it with AIRC_LLM_ENDPOINT=http://127.0.0.1:<port>;
+the LLM gateway then POSTs prompts to /v1/generate instead of calling
+Gemini. Responses come from a recordings file written in record mode
+(AIRC_LLM_RECORD=<file.jsonl> against the live API) and, for prompts that
+were never recorded, optionally from built-in synthetic responders.
+
+Latency, error rate and timeouts are configurable so the latency
+behaviour of /layout/suggest, /copy/generate and compliance rewrites can
+be reproduced deterministically (fixed --seed).
+
+    python -m app.services.llm_standin --port 8765 --recordings rec.jsonl \
+        --latency lognormal:5.5,0.4 --error-rate 0.02 --timeout-rate 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+class LatencyModel:
+    """
+    Response delay distribution, parsed from a spec string (milliseconds):
+
+        fixed:120          always 120ms
+        uniform:50,400     uniform between 50 and 400ms
+        normal:200,50      mean 200ms, stddev 50ms (clamped at 0)
+        lognormal:5.3,0.4  exp(N(mu, sigma)) ms, a long-tailed API-like shape
+        replay             the latency stored with each recording
+    """
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",") if a]
+        if kind not in ("fixed", "uniform", "normal", "lognormal", "replay"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random, recorded_s: Optional[float] = None) -> float:
+        """Returns a delay in seconds."""
+        if self.kind == "replay":
+            return recorded_s or 0.0
+        if self.kind == "fixed":
+            ms = self.args[0] if self.args else 0.0
+        elif self.kind == "uniform":
+            ms = rng.uniform(self.args[0], self.args[1])
+        elif self.kind == "normal":
+            ms = rng.gauss(self.args[0], self.args[1])
+        else:
+            ms = rng.lognormvariate(self.args[0], self.args[1])
+        return max(0.0, ms) / 1000.0
+
+
+def load_recordings(path: Optional[Path]) -> Dict[str, dict]:
+    """Reads a record-mode JSONL file into key -> record (last one wins)."""
+    recordings: Dict[str, dict] = {}
+    if not path or not Path(path).exists():
+        return recordings
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                row = json.loads(line)
+                recordings[row["key"]] = row
+    return recordings
+
+
+def synthetic_response(prompt: str) -> Optional[str]:
+    """Plausible answers for the prompt shapes in llm_service."""
+    if "Create a JSON layout" in prompt:
+        fmt = re.search(r"- Format: (\w+)", prompt)
+        dims = re.search(r"- Dimensions: (\d+)x(\d+)", prompt)
+        headline = re.search(r"- Headline text: '([^']*)'", prompt)
+        w, h = (int(dims.group(1)), int(dims.group(2))) if dims else (1080, 1080)
+        return json.dumps({
+            "format": fmt.group(1) if fmt else "SQUARE",
+            "width": w,
+            "height": h,
+            "background_color": {"r": 255, "g": 255, "b": 255, "a": 1},
+            "elements": [{
+                "id": "headline",
+                "type": "text",
+                "text": headline.group(1) if headline else "Fresh picks",
+                "font_size": 56,
+                "bounds": {"x": w // 8, "y": h // 3, "width": w * 3 // 4, "height": 120},
+                "z": 20,
+            }],
+        })
+    if "Write retail ad copy for each of these" in prompt:
+        names = re.findall(r"\d+\. product: '([^']*)'", prompt)
+        return json.dumps([
+            {"headline": f"Meet {name}"[:25], "subhead": "Picked for everyday moments", "value_text": "Great Value"}
+            for name in names
+        ])
+    if "Write retail ad copy for product" in prompt:
+        name = re.search(r"product: '([^']*)'", prompt)
+        product = name.group(1) if name else "product"
+        return json.dumps({
+            "headline": f"Meet {product}"[:25],
+            "subhead": "Picked for everyday moments",
+            "value_text": "Great Value",
+        })
+    if "COPY:" in prompt:
+        from .llm_service import fallback_rewrite
+
+        return fallback_rewrite(prompt.split("COPY:", 1)[1].strip())
+    return None
+
+
+class StandinConfig:
+    def __init__(
+        self,
+        recordings: Optional[Dict[str, dict]] = None,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_s: float = 60.0,
+        synthetic: bool = True,
+        seed: int = 0,
+    ):
+        self.recordings = recordings or {}
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_s = timeout_s
+        self.synthetic = synthetic
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.served = {"replayed": 0, "synthetic": 0, "missed": 0, "errors": 0, "timeouts": 0}
+
+    def bump(self, name: str) -> None:
+        with self.rng_lock:
+            self.served[name] += 1
+
+    def draw(self, recorded_s: Optional[float]) -> Tuple[float, float, float]:
+        # one shared seeded RNG keeps a run reproducible across handler threads
+        with self.rng_lock:
+            return self.rng.random(), self.rng.random(), self.latency.sample(self.rng, recorded_s)
+
+
+def _make_handler(config: StandinConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # keep test/CI output quiet
+            pass
+
+        def _send(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "recordings": len(config.recordings), **config.served})
+            else:
+                self._send(404, {"error": "not_found"})
+
+        def do_POST(self):
+            if self.path != "/v1/generate":
+                self._send(404, {"error": "not_found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(length) or b"{}")
+            record = config.recordings.get(req.get("key", ""))
+            p_error, p_timeout, delay = config.draw(record.get("latency_s") if record else None)
+
+            if p_timeout < config.timeout_rate:
+                config.bump("timeouts")
+                time.sleep(config.timeout_s)
+                self._send(504, {"error": "timeout"})
+                return
+            time.sleep(delay)
+            if p_error < config.error_rate:
+                config.bump("errors")
+                self._send(500, {"error": "injected_failure"})
+                return
+
+            if record is not None:
+                config.bump("replayed")
+                text = record["text"]
+            else:
+                prompt = "\n".join(p["text"] for p in req.get("parts", []) if "text" in p)
+                text = synthetic_response(prompt) if config.synthetic else None
+                if text is None:
+                    config.bump("missed")
+                    self._send(404, {"error": "no_recording", "key": req.get("key")})
+                    return
+                config.bump("synthetic")
+            prompt_chars = sum(len(p.get("text", "")) for p in req.get("parts", []))
+            self._send(200, {
+                "text": text,
+                # rough 4-chars-per-token estimate so token metrics move
+                "usage": {"prompt_tokens": prompt_chars // 4, "output_tokens": len(text) // 4},
+            })
+
+    return Handler
+
+
+def start_standin(config: StandinConfig, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Starts the stand-in on a daemon thread; returns (server, base_url). Call server.shutdown() to stop."""
+    server = ThreadingHTTPServer((host, port), _make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="llm-standin", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Offline Gemini stand-in for AIRC load tests")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--recordings", type=Path, help="JSONL written with AIRC_LLM_RECORD")
+    ap.add_argument("--latency", default="fixed:0", help="fixed:MS | uniform:LO,HI | normal:MEAN,SD | lognormal:MU,SIGMA | replay")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--timeout-rate", type=float, default=0.0)
+    ap.add_argument("--timeout-s", type=float, default=60.0, help="How long a 'timed out' request hangs")
+    ap.add_argument("--no-synthetic", action="store_true", help="404 on prompts missing from the recordings")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    config = StandinConfig(
+        recordings=load_recordings(args.recordings),
+        latency=args.latency,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_s=args.timeout_s,
+        synthetic=not args.no_synthetic,
+        seed=args.seed,
+    )
+    server, url = start_standin(config, args.host, args.port)
+    print(f"LLM stand-in listening on {url} ({len(config.recordings)} recordings)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
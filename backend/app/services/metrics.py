@@ -0,0 +1,229 @@
+"""
+In-process metrics, exposed in the Prometheus text format at /metrics.
+
+    airc_http_request_duration_seconds  histogram per method, route template, status
+    airc_http_requests_in_flight        gauge
+    airc_stage_duration_seconds         histogram per pipeline stage (decode,
+                                        resize, font_load, text_draw, encode,
+                                        ocr, regex_scan, llm_call, autofix, ...)
+    airc_cache_requests_total           counter per cache and result (hit/miss)
+    airc_in_flight                      gauge per kind of work (render, ocr, ...)
+
+Collectors registered with register_collector() add values owned by other
+services at scrape time (admission gates, LLM gateway, lru caches), so
+nothing is copied on the request path.
+
+Recording is a perf_counter() pair, a bisect and a couple of integer
+updates under a lock; nothing is written or logged per request. Values are
+per process: jobs run on the process pool (AIRC_JOB_EXECUTOR=process) are
+not included.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; stages go down to sub-millisecond (font loads, regex scans)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (name, labels, value) as produced by collectors
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    @contextmanager
+    def track(self, *labels: str) -> Iterator[None]:
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last = +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, *labels: str) -> Optional[dict]:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                return None
+            return {"count": series[2], "sum": series[1]}
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        out = self.header()
+        for key, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = 'le="%s"' % _num(bound)
+                out.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {running}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(total)}")
+            out.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return out
+
+
+_registry: List[_Metric] = []
+_collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def counter(name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, help, labels))
+
+
+def gauge(name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge(name, help, labels))
+
+
+def histogram(name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help, labels, buckets))
+
+
+def register_collector(name: str, kind: str, help: str, collect: Callable[[], Iterable[Sample]]) -> None:
+    """
+    Adds a metric family read at scrape time. `collect` yields (sample
+    name, labels, value); sample names start with `name`.
+    """
+    with _registry_lock:
+        _collectors[:] = [c for c in _collectors if c[0] != name]
+        _collectors.append((name, kind, help, collect))
+
+
+REQUEST_SECONDS = histogram(
+    "airc_http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+REQUESTS_IN_FLIGHT = gauge("airc_http_requests_in_flight", "HTTP requests being handled")
+STAGE_SECONDS = histogram("airc_stage_duration_seconds", "Time spent per pipeline stage", ("stage",))
+CACHE_REQUESTS = counter("airc_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+IN_FLIGHT = gauge("airc_in_flight", "Units of work currently running, by kind", ("kind",))
+
+
+class stage:
+    """
+    `with stage("encode"):` times the block as pipeline stage `name`, also
+    when it raises. A plain class rather than @contextmanager: it runs per
+    element in render loops (~1.5 µs per use instead of ~3.5 µs).
+    """
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "stage":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, self.name)
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    with _registry_lock:
+        metrics = list(_registry)
+        collectors = list(_collectors)
+    out: List[str] = []
+    for metric in metrics:
+        out += metric.lines()
+    for name, kind, help, collect in collectors:
+        try:
+            samples = list(collect())
+        except Exception as e:
+            print(f"Metrics collector {name} failed: {e}")
+            continue
+        out += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        for sample, labels, value in samples:
+            out.append(f"{sample}{_labels(list(labels), list(labels.values()))} {_num(value)}")
+    return "\n".join(out) + "\n"
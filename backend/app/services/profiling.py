@@ -0,0 +1,323 @@
+"""
+Opt-in request profiling.
+
+A profiled request gets a statistical sampler: a thread that reads the
+stack of the request's worker thread every AIRC_PROFILE_INTERVAL_MS (sync
+endpoints run on the API threadpool, so the middleware's own thread would
+see nothing). The middleware puts the sampler in a context variable and
+every endpoint is wrapped so that, on whatever thread it runs, it tags
+that thread with the sampler for the duration of the call; only tagged
+threads are sampled, so concurrent requests never land in each other's
+profiles. Stacks are cut at the endpoint frame. When the request finishes
+the profile is written to data/profiles/:
+
+    <id>.folded  collapsed stacks ("frame;frame;frame count"), readable by
+                 flamegraph.pl, speedscope or inferno
+    <id>.json    request, status, duration, sample count and the functions
+                 with the most self / total samples
+
+Only the newest AIRC_PROFILE_KEEP profiles are kept. The profile id is
+returned in X-AIRC-Profile-Id; profiles are listed and fetched under
+/api/admin/profiles.
+
+Which requests are profiled:
+
+    AIRC_PROFILING=1             honour the X-AIRC-Profile request header,
+                                 which must carry AIRC_ADMIN_TOKEN (header
+                                 profiling stays off without a token)
+    AIRC_PROFILE_SAMPLE_RATE     fraction of all requests (e.g. 0.01)
+    AIRC_ADMIN_TOKEN             required by the admin endpoints in
+                                 X-AIRC-Admin-Token when set, and always
+                                 with AIRC_PROFILING=1
+    AIRC_PROFILE_MAX_CONCURRENT  samplers running at once (2); requests
+                                 beyond it are served unprofiled
+
+With neither of the first two set, install() adds no middleware at all, so
+unprofiled deployments pay nothing. Async endpoints run on the event loop
+thread, so concurrent async requests to the same endpoint can still share
+samples.
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import hmac
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..config import BASE_DIR, DATA_DIR
+
+PROFILE_DIR = DATA_DIR / "profiles"
+PROFILE_HEADER = "X-AIRC-Profile"
+PROFILE_ID_HEADER = "X-AIRC-Profile-Id"
+ADMIN_TOKEN_HEADER = "X-AIRC-Admin-Token"
+# Samples longer than this many frames (runaway recursion) keep the innermost ones
+MAX_STACK_DEPTH = 200
+
+
+def header_enabled() -> bool:
+    return os.getenv("AIRC_PROFILING", "0") in ("1", "true", "True")
+
+
+def _sample_rate() -> float:
+    return float(os.getenv("AIRC_PROFILE_SAMPLE_RATE", "0"))
+
+
+def _interval_s() -> float:
+    return max(0.0005, float(os.getenv("AIRC_PROFILE_INTERVAL_MS", "2")) / 1000)
+
+
+def _max_concurrent() -> int:
+    return max(1, int(os.getenv("AIRC_PROFILE_MAX_CONCURRENT", "2")))
+
+
+def _keep() -> int:
+    return max(1, int(os.getenv("AIRC_PROFILE_KEEP", "50")))
+
+
+def admin_token() -> Optional[str]:
+    return os.getenv("AIRC_ADMIN_TOKEN") or None
+
+
+def enabled() -> bool:
+    return header_enabled() or _sample_rate() > 0
+
+
+def token_matches(value: Optional[str]) -> bool:
+    token = admin_token()
+    return bool(token and value) and hmac.compare_digest(value.encode(), token.encode())
+
+
+def should_profile(header_value: Optional[str]) -> bool:
+    if header_value and header_enabled():
+        return token_matches(header_value)
+    rate = _sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+def _label(code) -> str:
+    path = code.co_filename
+    try:
+        path = str(Path(path).relative_to(BASE_DIR))
+    except ValueError:
+        path = Path(path).name
+    # ';' separates frames in the collapsed format
+    return f"{code.co_qualname} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+# Sampler of the request being handled; endpoint wrappers tag their thread with it
+_current: contextvars.ContextVar[Optional["RequestSampler"]] = contextvars.ContextVar("airc_profile_sampler", default=None)
+
+
+class RequestSampler:
+    """Samples the threads tagged with attach() until finish()."""
+
+    def __init__(self, endpoint: Callable[[], Optional[Callable]], meta: Dict[str, Any], interval_s: Optional[float] = None):
+        self.profile_id = uuid.uuid4().hex[:16]
+        self.meta = meta
+        self.interval_s = interval_s or _interval_s()
+        self._endpoint = endpoint
+        self._threads: Counter = Counter()
+        self._threads_lock = threading.Lock()
+        self._stacks: Counter = Counter()
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name=f"profile-{self.profile_id}", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self._sample()
+        try:
+            save_profile(self.profile_id, self.meta, self._stacks)
+        except Exception as e:
+            print(f"Profile {self.profile_id} not saved: {e}")
+
+    def attach(self) -> None:
+        """Marks the calling thread as running this request."""
+        with self._threads_lock:
+            self._threads[threading.get_ident()] += 1
+
+    def detach(self) -> None:
+        tid = threading.get_ident()
+        with self._threads_lock:
+            self._threads[tid] -= 1
+            if self._threads[tid] <= 0:
+                del self._threads[tid]
+
+    def _sample(self) -> None:
+        code = getattr(self._endpoint(), "__code__", None)
+        if code is None:
+            return
+        with self._threads_lock:
+            tagged = set(self._threads)
+        if not tagged:
+            return
+        frames = sys._current_frames()
+        for tid in tagged:
+            frame = frames.get(tid)
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                if frame.f_code is code:
+                    break
+                frame = frame.f_back
+            else:
+                continue  # not running this endpoint
+            labels = self._labels
+            stack = tuple(labels.get(c) or labels.setdefault(c, _label(c)) for c in reversed(codes[:MAX_STACK_DEPTH]))
+            self._stacks[stack] += 1
+
+    def finish(self, **meta: Any) -> None:
+        """Stops sampling; the profile is written from the sampler thread."""
+        self.meta.update(meta, duration_s=round(time.perf_counter() - self._started, 4))
+        self.meta["interval_s"] = self.interval_s
+        self._stop.set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._thread.join(timeout)
+
+
+def _summary(stacks: Counter, limit: int = 25) -> Tuple[List[dict], int]:
+    own: Counter = Counter()
+    total: Counter = Counter()
+    samples = 0
+    for stack, n in stacks.items():
+        samples += n
+        own[stack[-1]] += n
+        for frame in set(stack):
+            total[frame] += n
+    top = [
+        {"function": f, "self": own[f], "total": total[f]}
+        for f, _ in total.most_common(limit)
+    ]
+    return top, samples
+
+
+def save_profile(profile_id: str, meta: Dict[str, Any], stacks: Counter, directory: Path = PROFILE_DIR) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    top, samples = _summary(stacks)
+    folded = "".join(f"{';'.join(stack)} {n}\n" for stack, n in stacks.most_common())
+    (directory / f"{profile_id}.folded").write_text(folded, encoding="utf-8")
+    record = {"id": profile_id, "created_at": time.time(), **meta, "samples": samples, "top": top}
+    path = directory / f"{profile_id}.json"
+    tmp = directory / f"{profile_id}.json.tmp"
+    tmp.write_text(json.dumps(record, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    _prune(directory, _keep())
+    return path
+
+
+def _prune(directory: Path, keep: int) -> None:
+    records = sorted(directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in records[keep:]:
+        for suffix in (".json", ".folded"):
+            old.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def list_profiles(directory: Path = PROFILE_DIR) -> List[dict]:
+    out = []
+    for path in sorted(directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        record.pop("top", None)
+        out.append(record)
+    return out
+
+
+def profile_path(profile_id: str, suffix: str, directory: Path = PROFILE_DIR) -> Optional[Path]:
+    if not profile_id.isalnum():
+        return None
+    path = directory / f"{profile_id}{suffix}"
+    return path if path.exists() else None
+
+
+def _tagging(fn: Callable) -> Callable:
+    """Wraps an endpoint so the thread running it is tagged with the request's sampler, if any."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def run_async(*args, **kwargs):
+            sampler = _current.get()
+            if sampler is None:
+                return await fn(*args, **kwargs)
+            sampler.attach()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                sampler.detach()
+
+        return run_async
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        sampler = _current.get()
+        if sampler is None:
+            return fn(*args, **kwargs)
+        sampler.attach()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sampler.detach()
+
+    return run
+
+
+def _wrap_endpoints(app) -> None:
+    """Routes are registered after install(), so endpoints are wrapped on the first request."""
+    for route in app.routes:
+        dependant = getattr(route, "dependant", None)
+        if dependant is not None and dependant.call is not None and not hasattr(dependant.call, "__airc_profiled__"):
+            dependant.call = _tagging(dependant.call)
+            dependant.call.__airc_profiled__ = True
+
+
+def install(app, force: bool = False) -> bool:
+    """Adds the profiling middleware when profiling is configured (or `force`)."""
+    if not (force or enabled()):
+        return False
+    if header_enabled() and admin_token() is None:
+        print("AIRC_PROFILING=1 needs AIRC_ADMIN_TOKEN; the profiling header is ignored")
+    slots = threading.BoundedSemaphore(_max_concurrent())
+    wrapped = False
+
+    @app.middleware("http")
+    async def request_profiling(request, call_next):
+        nonlocal wrapped
+        if not wrapped:
+            _wrap_endpoints(app)
+            wrapped = True
+        if not should_profile(request.headers.get(PROFILE_HEADER)):
+            return await call_next(request)
+        if not slots.acquire(blocking=False):
+            # Enough samplers running already; this request goes unprofiled
+            return await call_next(request)
+        sampler = RequestSampler(
+            lambda: request.scope.get("endpoint"),
+            {"method": request.method, "path": request.url.path},
+        )
+        status = 500
+        reset = _current.set(sampler)
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            _current.reset(reset)
+            route = request.scope.get("route")
+            sampler.finish(status=status, route=getattr(route, "path", None))
+            slots.release()
+        response.headers[PROFILE_ID_HEADER] = sampler.profile_id
+        return response
+
+    return True
@@ -0,0 +1,603 @@
+"""
+Project storage in SQLite (data/projects.sqlite3).
+
+    projects          one row per project: current version, the canvas as
+                      of its latest snapshot, and the columns the listing
+                      filters and sorts on (format, size, timestamps) and
+                      the content hash that names its thumbnail
+    project_versions  one row per version: a full snapshot every
+                      SNAPSHOT_EVERY versions, a compact JSON Patch from the
+                      previous version otherwise
+    project_meta      top-level scalar canvas.metadata entries, indexed by
+                      (key, value) so listings can filter on them
+    store_meta        store bookkeeping (schema version, JSON import marker)
+
+Listing uses keyset pagination on (updated_at, id), so a page costs the
+same at the start and the end of tens of thousands of projects. Saves,
+patches, duplicates and renames are single transactions.
+
+Every save is stored as a delta, so an autosave writes roughly the size
+of the edit. Any version is rebuilt from the nearest snapshot at or
+below it plus at most SNAPSHOT_EVERY - 1 patches; current versions are
+also kept in a small in-memory cache. Writers may pass the version they
+edited (base_version); if another save got in first they get
+VersionConflict instead of silently overwriting it.
+
+History is bounded: each snapshot drops the versions that fall out of
+the last KEEP_VERSIONS (AIRC_PROJECT_KEEP_VERSIONS, default 200; 0 keeps
+everything). Pruning stops at a snapshot, so every version still listed
+can be rebuilt; at most SNAPSHOT_EVERY - 1 extra versions are kept.
+
+The previous layout (one JSON file per project in data/projects/) is
+imported automatically the first time the store is opened, and can be
+re-imported with the CLI (from backend/):
+
+    python -m app.services.project_store migrate [--dir DIR] [--overwrite]
+    python -m app.services.project_store list [--format SQUARE] [--limit 20]
+    python -m app.services.project_store prune [--keep 200]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from ..config import DATA_DIR
+from ..models.schemas import Canvas
+from ..utils.json_patch import apply_patch, make_patch
+from ..utils.serialization import dumps, loads
+from ..utils.sqlite import connect
+from .metrics import cache_lookup
+
+PROJECTS_DB_PATH = DATA_DIR / "projects.sqlite3"
+PROJECTS_JSON_DIR = DATA_DIR / "projects"
+SCHEMA_VERSION = 3
+MAX_PAGE_SIZE = 500
+SNAPSHOT_EVERY = max(1, int(os.getenv("AIRC_PROJECT_SNAPSHOT_EVERY", "25")))
+KEEP_VERSIONS = max(0, int(os.getenv("AIRC_PROJECT_KEEP_VERSIONS", "200")))
+_HEAD_CACHE_ITEMS = 256
+
+
+class ProjectExists(Exception):
+    pass
+
+
+class ProjectNotFound(Exception):
+    pass
+
+
+class VersionConflict(Exception):
+    def __init__(self, current_version: int):
+        super().__init__(f"Project is at version {current_version}")
+        self.current_version = current_version
+
+
+def _dumps(value: Any) -> str:
+    return dumps(value).decode("utf-8")
+
+
+def canvas_hash(canvas: dict) -> str:
+    """Content hash of a canvas (key order independent); names its cached thumbnail."""
+    return hashlib.sha256(json.dumps(canvas, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()[:32]
+
+
+def _meta_rows(canvas: dict) -> List[Tuple[str, str]]:
+    """Indexable metadata: top-level scalar values, stored as text."""
+    rows = []
+    for key, value in (canvas.get("metadata") or {}).items():
+        if isinstance(value, bool):
+            rows.append((key, "true" if value else "false"))
+        elif isinstance(value, (str, int, float)):
+            rows.append((key, str(value)))
+    return rows
+
+
+def encode_cursor(updated_at: float, project_id: str) -> str:
+    return f"{updated_at!r}:{project_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    updated_at, _, project_id = cursor.partition(":")
+    return float(updated_at), project_id
+
+
+class ProjectStore:
+    def __init__(self, path: Path = PROJECTS_DB_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        # project id -> (version, canvas_hash, canvas) for recently used current versions.
+        # Other processes share the file and can recreate a project at the same
+        # version, so an entry is used only while both still match the row.
+        self._heads: "OrderedDict[str, Tuple[int, str, dict]]" = OrderedDict()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS projects (
+                    id TEXT PRIMARY KEY,
+                    format TEXT NOT NULL,
+                    width INTEGER NOT NULL,
+                    height INTEGER NOT NULL,
+                    element_count INTEGER NOT NULL,
+                    canvas TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    snapshot_version INTEGER NOT NULL DEFAULT 0,
+                    canvas_hash TEXT
+                );
+                CREATE INDEX IF NOT EXISTS projects_updated ON projects (updated_at, id);
+                CREATE INDEX IF NOT EXISTS projects_format_updated ON projects (format, updated_at, id);
+                CREATE TABLE IF NOT EXISTS project_versions (
+                    project_id TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (project_id, version)
+                );
+                CREATE TABLE IF NOT EXISTS project_meta (
+                    project_id TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (project_id, key)
+                );
+                CREATE INDEX IF NOT EXISTS project_meta_key_value ON project_meta (key, value, project_id);
+                CREATE TABLE IF NOT EXISTS store_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                """
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO store_meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),)
+            )
+            self._upgrade(self._conn)
+        return self._conn
+
+    def _upgrade(self, db: sqlite3.Connection) -> None:
+        version = int(db.execute("SELECT value FROM store_meta WHERE key = 'schema_version'").fetchone()["value"])
+        if version < 2:
+            # 1 -> 2: version columns; existing canvases become snapshot version 1
+            db.execute("BEGIN IMMEDIATE")
+            columns = {r["name"] for r in db.execute("PRAGMA table_info(projects)")}
+            for column in ("version", "snapshot_version"):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE projects ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+            db.execute(
+                "INSERT OR IGNORE INTO project_versions (project_id, version, kind, data, created_at)"
+                " SELECT id, 1, 'snapshot', canvas, updated_at FROM projects WHERE version = 0"
+            )
+            db.execute("UPDATE projects SET version = 1, snapshot_version = 1 WHERE version = 0")
+            db.execute("UPDATE store_meta SET value = '2' WHERE key = 'schema_version'")
+            db.execute("COMMIT")
+        if version < 3:
+            # 2 -> 3: content hash of the current version (thumbnail key)
+            db.execute("BEGIN IMMEDIATE")
+            columns = {r["name"] for r in db.execute("PRAGMA table_info(projects)")}
+            if "canvas_hash" not in columns:
+                db.execute("ALTER TABLE projects ADD COLUMN canvas_hash TEXT")
+            for row in db.execute("SELECT id FROM projects WHERE canvas_hash IS NULL").fetchall():
+                head = self._head(db, row["id"])
+                db.execute("UPDATE projects SET canvas_hash = ? WHERE id = ?", (canvas_hash(head[2]), row["id"]))
+            db.execute("UPDATE store_meta SET value = '3' WHERE key = 'schema_version'")
+            db.execute("COMMIT")
+        db.execute("CREATE INDEX IF NOT EXISTS projects_canvas_hash ON projects (canvas_hash)")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def _read(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._db().execute(sql, params).fetchall()
+
+    # --- versions -----------------------------------------------------------
+
+    def _remember(self, project_id: str, version: int, content_hash: Optional[str], canvas: dict) -> None:
+        if content_hash is None:
+            return
+        with self._lock:
+            self._heads[project_id] = (version, content_hash, canvas)
+            self._heads.move_to_end(project_id)
+            while len(self._heads) > _HEAD_CACHE_ITEMS:
+                self._heads.popitem(last=False)
+
+    def _forget(self, *project_ids: str) -> None:
+        with self._lock:
+            for project_id in project_ids:
+                self._heads.pop(project_id, None)
+
+    def _replay(self, db: sqlite3.Connection, project_id: str, canvas: dict, after: int, upto: int) -> dict:
+        rows = db.execute(
+            "SELECT data FROM project_versions WHERE project_id = ? AND version > ? AND version <= ? ORDER BY version",
+            (project_id, after, upto),
+        ).fetchall()
+        for row in rows:
+            canvas = apply_patch(canvas, loads(row["data"]))
+        return canvas
+
+    def _head(self, db: sqlite3.Connection, project_id: str) -> Optional[Tuple[int, int, dict, Optional[str]]]:
+        """(version, snapshot_version, canvas, canvas_hash) of the current version, or None."""
+        row = db.execute(
+            "SELECT version, snapshot_version, canvas_hash FROM projects WHERE id = ?", (project_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        version, snapshot_version, content_hash = row["version"], row["snapshot_version"], row["canvas_hash"]
+        cached = self._heads.get(project_id)
+        hit = cached is not None and cached[:2] == (version, content_hash)
+        cache_lookup("project_head", hit)
+        if hit:
+            return version, snapshot_version, cached[2], content_hash
+        snapshot = loads(db.execute("SELECT canvas FROM projects WHERE id = ?", (project_id,)).fetchone()["canvas"])
+        canvas = self._replay(db, project_id, snapshot, snapshot_version, version)
+        self._remember(project_id, version, content_hash, canvas)
+        return version, snapshot_version, canvas, content_hash
+
+    def _commit(
+        self,
+        db: sqlite3.Connection,
+        project_id: str,
+        head: Optional[Tuple[int, int, dict, Optional[str]]],
+        canvas: dict,
+        now: float,
+    ) -> Tuple[int, dict, str]:
+        """Stores `canvas` as the version after `head` (None: a new project). Returns (version, canvas, canvas_hash)."""
+        if head is None:
+            version, snapshot_version, old = 1, 0, None
+        else:
+            version, snapshot_version, old = head[0] + 1, head[1], head[2]
+        patch = make_patch(old, canvas) if old is not None else None
+        if patch == []:
+            # Nothing changed: no new version
+            return head[0], old, head[3] or canvas_hash(old)
+
+        content_hash = canvas_hash(canvas)
+        columns = (canvas["format"], canvas["width"], canvas["height"], len(canvas.get("elements") or []), content_hash)
+        if old is None or version - snapshot_version >= SNAPSHOT_EVERY:
+            data, kind = _dumps(canvas), "snapshot"
+            db.execute(
+                """
+                INSERT INTO projects (id, format, width, height, element_count, canvas_hash, canvas, created_at, updated_at, version, snapshot_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    format = excluded.format, width = excluded.width, height = excluded.height,
+                    element_count = excluded.element_count, canvas_hash = excluded.canvas_hash,
+                    canvas = excluded.canvas, updated_at = excluded.updated_at,
+                    version = excluded.version, snapshot_version = excluded.snapshot_version
+                """,
+                (project_id, *columns, data, now, now, version, version),
+            )
+        else:
+            data, kind = _dumps(patch), "patch"
+            db.execute(
+                "UPDATE projects SET format = ?, width = ?, height = ?, element_count = ?, canvas_hash = ?,"
+                " updated_at = ?, version = ? WHERE id = ?",
+                (*columns, now, version, project_id),
+            )
+        db.execute(
+            "INSERT OR REPLACE INTO project_versions (project_id, version, kind, data, created_at) VALUES (?, ?, ?, ?, ?)",
+            (project_id, version, kind, data, now),
+        )
+        if kind == "snapshot" and old is not None:
+            self._prune(db, project_id, version, KEEP_VERSIONS)
+        if old is None or old.get("metadata") != canvas.get("metadata"):
+            db.execute("DELETE FROM project_meta WHERE project_id = ?", (project_id,))
+            db.executemany(
+                "INSERT INTO project_meta (project_id, key, value) VALUES (?, ?, ?)",
+                [(project_id, k, v) for k, v in _meta_rows(canvas)],
+            )
+        return version, canvas, content_hash
+
+    @staticmethod
+    def _prune(db: sqlite3.Connection, project_id: str, version: int, keep: int) -> int:
+        """
+        Deletes the versions before the last `keep` up to `version`, stopping at
+        the snapshot the oldest kept version is rebuilt from. Returns rows deleted.
+        """
+        if keep <= 0 or version <= keep:
+            return 0
+        row = db.execute(
+            "SELECT MAX(version) AS v FROM project_versions WHERE project_id = ? AND version <= ? AND kind = 'snapshot'",
+            (project_id, version - keep + 1),
+        ).fetchone()
+        if row["v"] is None:
+            return 0
+        return db.execute("DELETE FROM project_versions WHERE project_id = ? AND version < ?", (project_id, row["v"])).rowcount
+
+    @staticmethod
+    def _check_base(head: Optional[Tuple[int, int, dict, Optional[str]]], base_version: Optional[int]) -> None:
+        if base_version is not None and base_version != (head[0] if head else 0):
+            raise VersionConflict(head[0] if head else 0)
+
+    # --- single projects --------------------------------------------------
+
+    def get(self, project_id: str) -> Optional[dict]:
+        found = self.get_with_version(project_id)
+        return found[1] if found else None
+
+    def get_with_version(self, project_id: str) -> Optional[Tuple[int, dict]]:
+        """(version, canvas) of the current version. The canvas is shared with the cache: do not modify it."""
+        with self._lock:
+            head = self._head(self._db(), project_id)
+        return (head[0], head[2]) if head else None
+
+    def get_version(self, project_id: str, version: int) -> Optional[dict]:
+        """The canvas as of `version`: nearest snapshot at or below it, plus the patches after it."""
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT version, data FROM project_versions WHERE project_id = ? AND version <= ? AND kind = 'snapshot'"
+                " ORDER BY version DESC LIMIT 1",
+                (project_id, version),
+            ).fetchone()
+            if row is None:
+                return None
+            top = db.execute("SELECT MAX(version) AS v FROM project_versions WHERE project_id = ?", (project_id,)).fetchone()["v"]
+            if version > top:
+                return None
+            return self._replay(db, project_id, loads(row["data"]), row["version"], version)
+
+    def versions(self, project_id: str, limit: int = 50, before: Optional[int] = None) -> List[dict]:
+        """History, newest first: version, kind (snapshot/patch), stored bytes, created_at."""
+        sql = "SELECT version, kind, LENGTH(data) AS size, created_at FROM project_versions WHERE project_id = ?"
+        params: tuple = (project_id,)
+        if before is not None:
+            sql += " AND version < ?"
+            params += (before,)
+        sql += " ORDER BY version DESC LIMIT ?"
+        return [dict(r) for r in self._read(sql, params + (max(1, min(limit, MAX_PAGE_SIZE)),))]
+
+    def info(self, project_id: str) -> Optional[dict]:
+        rows = self._read(
+            "SELECT id, format, width, height, element_count, canvas_hash, created_at, updated_at, version FROM projects WHERE id = ?",
+            (project_id,),
+        )
+        return dict(rows[0]) if rows else None
+
+    def find_by_hash(self, content_hash: str) -> Optional[dict]:
+        """Current canvas of some project whose content hash is `content_hash`."""
+        rows = self._read("SELECT id FROM projects WHERE canvas_hash = ? LIMIT 1", (content_hash,))
+        return self.get(rows[0]["id"]) if rows else None
+
+    def exists(self, project_id: str) -> bool:
+        return bool(self._read("SELECT 1 FROM projects WHERE id = ?", (project_id,)))
+
+    def save(self, project_id: str, canvas: Canvas, updated_at: Optional[float] = None, base_version: Optional[int] = None) -> dict:
+        """Stores a full canvas as the next version (as a delta). Raises VersionConflict."""
+        data = canvas.model_dump(mode="json")
+        with self._transaction() as db:
+            head = self._head(db, project_id)
+            self._check_base(head, base_version)
+            version, data, content_hash = self._commit(db, project_id, head, data, updated_at or time.time())
+        self._remember(project_id, version, content_hash, data)
+        return {"id": project_id, "version": version}
+
+    def patch(self, project_id: str, base_version: int, ops: List[dict]) -> dict:
+        """
+        Applies JSON Patch `ops` to version `base_version` and stores the
+        result. Raises ProjectNotFound, VersionConflict, JsonPatchError or
+        pydantic.ValidationError (the patched document must be a Canvas).
+        """
+        with self._transaction() as db:
+            head = self._head(db, project_id)
+            if head is None:
+                raise ProjectNotFound(project_id)
+            self._check_base(head, base_version)
+            patched = Canvas.model_validate(apply_patch(head[2], ops)).model_dump(mode="json")
+            version, data, content_hash = self._commit(db, project_id, head, patched, time.time())
+        self._remember(project_id, version, content_hash, data)
+        return {"id": project_id, "version": version}
+
+    def revert(self, project_id: str, version: int, base_version: Optional[int] = None) -> dict:
+        """Saves the canvas of an earlier `version` as a new version (undo)."""
+        old = self.get_version(project_id, version)
+        if old is None:
+            raise ProjectNotFound(f"{project_id}@{version}")
+        return self.save(project_id, Canvas.model_validate(old), base_version=base_version)
+
+    def delete(self, project_id: str) -> bool:
+        with self._transaction() as db:
+            deleted = db.execute("DELETE FROM projects WHERE id = ?", (project_id,)).rowcount
+            db.execute("DELETE FROM project_versions WHERE project_id = ?", (project_id,))
+            db.execute("DELETE FROM project_meta WHERE project_id = ?", (project_id,))
+        self._forget(project_id)
+        return deleted > 0
+
+    def duplicate(self, project_id: str, new_id: str) -> None:
+        """Copies the current version as a new project (without history); raises ProjectNotFound / ProjectExists."""
+        with self._transaction() as db:
+            if db.execute("SELECT 1 FROM projects WHERE id = ?", (new_id,)).fetchone():
+                raise ProjectExists(new_id)
+            head = self._head(db, project_id)
+            if head is None:
+                raise ProjectNotFound(project_id)
+            version, data, content_hash = self._commit(db, new_id, None, head[2], time.time())
+        self._remember(new_id, version, content_hash, data)
+
+    def rename(self, project_id: str, new_id: str) -> None:
+        """Renames a project with its history; raises ProjectNotFound / ProjectExists."""
+        with self._transaction() as db:
+            if db.execute("SELECT 1 FROM projects WHERE id = ?", (new_id,)).fetchone():
+                raise ProjectExists(new_id)
+            if not db.execute("UPDATE projects SET id = ?, updated_at = ? WHERE id = ?", (new_id, time.time(), project_id)).rowcount:
+                raise ProjectNotFound(project_id)
+            db.execute("UPDATE project_versions SET project_id = ? WHERE project_id = ?", (new_id, project_id))
+            db.execute("UPDATE project_meta SET project_id = ? WHERE project_id = ?", (new_id, project_id))
+        self._forget(project_id, new_id)
+
+    # --- listing ----------------------------------------------------------
+
+    def list(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        format: Optional[str] = None,
+        q: Optional[str] = None,
+        meta: Optional[Dict[str, str]] = None,
+    ) -> dict:
+        """
+        Newest first. `cursor` is the `next_cursor` of the previous page;
+        `q` matches an id prefix; `meta` filters on metadata key=value pairs.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where: List[str] = []
+        params: list = []
+        if format:
+            where.append("p.format = ?")
+            params.append(format)
+        if q:
+            # Range scan on the primary key instead of LIKE
+            where.append("p.id >= ? AND p.id < ?")
+            params += [q, q + "\U0010ffff"]
+        for key, value in (meta or {}).items():
+            where.append("EXISTS (SELECT 1 FROM project_meta m WHERE m.key = ? AND m.value = ? AND m.project_id = p.id)")
+            params += [key, value]
+        if cursor:
+            updated_at, last_id = decode_cursor(cursor)
+            where.append("(p.updated_at < ? OR (p.updated_at = ? AND p.id < ?))")
+            params += [updated_at, updated_at, last_id]
+        sql = "SELECT p.id, p.format, p.width, p.height, p.element_count, p.version, p.canvas_hash, p.created_at, p.updated_at FROM projects p"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY p.updated_at DESC, p.id DESC LIMIT ?"
+        rows = [dict(r) for r in self._read(sql, tuple(params) + (limit + 1,))]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["updated_at"], rows[-1]["id"])
+        return {"projects": rows, "next_cursor": next_cursor}
+
+    def prune(self, keep: int = KEEP_VERSIONS) -> int:
+        """Applies the retention limit to every project (saves do it as they go). Returns versions deleted."""
+        deleted = 0
+        for row in self._read("SELECT id, version FROM projects"):
+            with self._transaction() as db:
+                deleted += self._prune(db, row["id"], row["version"], keep)
+        return deleted
+
+    def count(self) -> int:
+        return self._read("SELECT COUNT(*) AS n FROM projects")[0]["n"]
+
+    # --- references -------------------------------------------------------
+
+    def asset_references(self, url_prefix: str) -> Set[str]:
+        """
+        Names of the files referenced as <url_prefix><name> by any retained
+        version of any project. Snapshots and patches are scanned as stored
+        text, so older versions (which revert can bring back) count without
+        being rebuilt; pruned versions no longer hold their files.
+        """
+        pattern = re.compile(re.escape(url_prefix) + r'([^"\\/?#\s]+)')
+        names: Set[str] = set()
+        with self._lock:
+            db = self._db()
+            for sql in ("SELECT canvas AS text FROM projects", "SELECT data AS text FROM project_versions"):
+                for row in db.execute(sql):
+                    names.update(pattern.findall(row["text"]))
+        return names
+
+    def content_hashes(self) -> Set[str]:
+        """Content hashes of the current versions (the names of their thumbnails)."""
+        return {r["canvas_hash"] for r in self._read("SELECT canvas_hash FROM projects WHERE canvas_hash IS NOT NULL")}
+
+    # --- bookkeeping ------------------------------------------------------
+
+    def get_meta(self, key: str) -> Optional[str]:
+        rows = self._read("SELECT value FROM store_meta WHERE key = ?", (key,))
+        return rows[0]["value"] if rows else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._db().execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def migrate_json_dir(store: ProjectStore, directory: Path = PROJECTS_JSON_DIR, overwrite: bool = False) -> dict:
+    """
+    Imports <id>.json project files (file mtime becomes updated_at).
+    Existing projects are kept unless `overwrite`. Files that do not
+    validate as a Canvas are reported, not imported.
+    """
+    imported, skipped, failed = 0, 0, []
+    for path in sorted(directory.glob("*.json")):
+        project_id = path.stem
+        if not overwrite and store.exists(project_id):
+            skipped += 1
+            continue
+        try:
+            canvas = Canvas.model_validate_json(path.read_bytes())
+            store.save(project_id, canvas, updated_at=path.stat().st_mtime)
+            imported += 1
+        except Exception as e:
+            failed.append({"file": path.name, "error": str(e)})
+    store.set_meta("json_import", json.dumps({"dir": str(directory), "at": time.time()}))
+    return {"imported": imported, "skipped": skipped, "failed": failed}
+
+
+_store: Optional[ProjectStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ProjectStore:
+    """The process-wide store; imports legacy JSON projects on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            store = ProjectStore()
+            if store.get_meta("json_import") is None and PROJECTS_JSON_DIR.is_dir():
+                result = migrate_json_dir(store)
+                for failure in result["failed"]:
+                    print(f"Project import failed for {failure['file']}: {failure['error']}")
+            _store = store
+        return _store
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="AIRC project store")
+    sub = ap.add_subparsers(dest="command", required=True)
+    mig = sub.add_parser("migrate", help="Import data/projects/*.json into the SQLite store")
+    mig.add_argument("--dir", type=Path, default=PROJECTS_JSON_DIR)
+    mig.add_argument("--db", type=Path, default=PROJECTS_DB_PATH)
+    mig.add_argument("--overwrite", action="store_true", help="Replace projects that already exist")
+    ls = sub.add_parser("list", help="List projects, newest first")
+    ls.add_argument("--db", type=Path, default=PROJECTS_DB_PATH)
+    ls.add_argument("--format")
+    ls.add_argument("--limit", type=int, default=20)
+    pr = sub.add_parser("prune", help="Drop versions beyond the retention limit")
+    pr.add_argument("--db", type=Path, default=PROJECTS_DB_PATH)
+    pr.add_argument("--keep", type=int, default=KEEP_VERSIONS)
+    args = ap.parse_args(argv)
+
+    store = ProjectStore(args.db)
+    if args.command == "migrate":
+        print(json.dumps(migrate_json_dir(store, args.dir, overwrite=args.overwrite), indent=2))
+    elif args.command == "prune":
+        print(json.dumps({"deleted": store.prune(args.keep)}))
+    else:
+        for row in store.list(limit=args.limit, format=args.format)["projects"]:
+            print(f"{row['id']}\t{row['format']}\t{row['element_count']} elements\t{time.ctime(row['updated_at'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import io
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .asset_store import file_digest
+from .shared_cache import get_shared_cache
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+CACHE_NAMESPACE = "prompt_image"
+# Longest side of images sent to the model; more pixels only cost tokens
+PROMPT_IMAGE_MAX = int(os.getenv("AIRC_PROMPT_IMAGE_MAX", "768"))
+PROMPT_IMAGE_QUALITY = 80
+
+
+def _build_jpeg(src: Path) -> bytes:
+    from PIL import Image
+
+    from .ingest import nearest_mip
+
+    # An ingested asset's pyramid level is already close to the target size
+    src, _ = nearest_mip(src, PROMPT_IMAGE_MAX, PROMPT_IMAGE_MAX)
+    with Image.open(src) as img:
+        # draft() lets JPEG decode straight at a reduced scale
+        img.draft("RGB", (PROMPT_IMAGE_MAX, PROMPT_IMAGE_MAX))
+        img = img.convert("RGBA")
+        img.thumbnail((PROMPT_IMAGE_MAX, PROMPT_IMAGE_MAX), Image.LANCZOS)
+        flat = Image.new("RGB", img.size, (255, 255, 255))
+        flat.paste(img, mask=img.getchannel("A"))
+    buf = io.BytesIO()
+    flat.save(buf, format="JPEG", quality=PROMPT_IMAGE_QUALITY, optimize=True)
+    return buf.getvalue()
+
+
+def prompt_image(src: Path) -> Optional[Image.Image]:
+    """
+    Model-sized JPEG rendition of an asset for multimodal prompts.
+
+    Built once per source content hash and kept in the shared cache, so
+    every worker reuses it and the size of each prompt image is bounded by
+    PROMPT_IMAGE_MAX regardless of the original resolution. The returned
+    image carries its cache key in info["airc_sha256"], which the LLM
+    gateway uses instead of re-hashing pixels. Returns None if the asset
+    cannot be read.
+    """
+    from PIL import Image
+
+    try:
+        digest = file_digest(src)
+    except OSError:
+        return None
+    key = f"{digest}_{PROMPT_IMAGE_MAX}"
+    cache = get_shared_cache()
+    try:
+        data = cache.get(CACHE_NAMESPACE, key)
+        if data is None:
+            data = _build_jpeg(src)
+            cache.put(CACHE_NAMESPACE, key, data)
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception as e:
+        print(f"Prompt asset error for {src}: {e}")
+        return None
+    img.info["airc_sha256"] = key
+    return img
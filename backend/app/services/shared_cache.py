@@ -0,0 +1,338 @@
+"""
+Cache tier shared by every worker process on the machine.
+
+With `uvicorn --workers N`, per-process caches hold and warm everything N
+times. SharedCache keeps values under data/cache/shared/ instead:
+
+    index.sqlite3  one row per entry: namespace, key, size, expiry, last
+                   access, and either the value itself (small values) or
+                   the name of its blob file
+    blobs/         values over AIRC_SHARED_CACHE_INLINE_KB, one file each
+
+SQLite (WAL, BEGIN IMMEDIATE for writes) keeps the index consistent across
+processes and threads. A blob is written under a fresh name and renamed
+into place before its row is committed, and unlinked only after its row is
+gone, so readers see a complete value or a miss, never a torn one.
+
+view() returns blobs as read-only memoryviews over an mmap of the file:
+nothing is copied into the process and the page cache holds one copy for
+all workers, so decoded pixel buffers go straight into Image.frombuffer.
+A mapping stays valid after its entry is evicted.
+
+The AIRC_SHARED_CACHE_MB budget is split between namespaces
+(AIRC_SHARED_CACHE_SHARES, fractions of the budget, e.g.
+"pixels=0.6,llm_response=0.1"; namespaces not listed share the "*"
+fraction). A write evicts the least recently used entries of its own
+budget down to EVICT_TO of it, so a burst of large pixel buffers cannot
+push out LLM answers that cost an API call each. Reads refresh an entry's
+access time at most every TOUCH_INTERVAL_S, so hot keys do not turn every
+read into a write. Namespaces in use: llm_response, prompt_image, pixels,
+ocr_text.
+"""
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from ..config import DATA_DIR
+from ..utils.serialization import dumps, loads
+from ..utils.sqlite import connect
+from .metrics import cache_lookup, counter, register_collector
+
+SHARED_CACHE_DIR = DATA_DIR / "cache" / "shared"
+SHARED_CACHE_BYTES = int(float(os.getenv("AIRC_SHARED_CACHE_MB", "512")) * 1024 * 1024)
+INLINE_MAX_BYTES = int(float(os.getenv("AIRC_SHARED_CACHE_INLINE_KB", "64")) * 1024)
+# Fractions of the budget per namespace; "*" is shared by all other namespaces
+DEFAULT_SHARES = {"pixels": 0.55, "prompt_image": 0.2, "llm_response": 0.1, "ocr_text": 0.05, "*": 0.1}
+TOUCH_INTERVAL_S = 10.0
+# Eviction frees a little more than needed so the next writes do not evict again
+EVICT_TO = 0.9
+# Blob files without an index row (crashed writer, failed unlink) are removed after this
+ORPHAN_AGE_S = 3600
+
+EVICTIONS = counter("airc_shared_cache_evictions_total", "Entries evicted from the shared cache", ("namespace",))
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def parse_shares(spec: str) -> Dict[str, float]:
+    """"pixels=0.6,llm_response=0.1" -> DEFAULT_SHARES with those fractions replaced."""
+    shares = dict(DEFAULT_SHARES)
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            shares[name.strip()] = float(value)
+    return shares
+
+
+class SharedCache:
+    """Byte-budgeted LRU cache of (namespace, key) -> bytes, shared by processes through SQLite and mmap."""
+
+    def __init__(
+        self,
+        directory: Path = SHARED_CACHE_DIR,
+        budget_bytes: int = SHARED_CACHE_BYTES,
+        inline_max: int = INLINE_MAX_BYTES,
+        shares: Optional[Dict[str, float]] = None,
+    ):
+        self.directory = directory
+        self.blobs = directory / "blobs"
+        self.budget_bytes = budget_bytes
+        self.inline_max = inline_max
+        self.shares = shares if shares is not None else parse_shares(os.getenv("AIRC_SHARED_CACHE_SHARES", ""))
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            self.blobs.mkdir(parents=True, exist_ok=True)
+            self._conn = connect(self.directory / "index.sqlite3")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    value BLOB,
+                    file TEXT,
+                    meta TEXT,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    expires_at REAL,
+                    PRIMARY KEY (namespace, key)
+                );
+                BEGIN IMMEDIATE;
+                DROP INDEX IF EXISTS entries_lru;
+                CREATE INDEX IF NOT EXISTS entries_ns_lru ON entries (namespace, accessed_at);
+                -- Expiry runs on every put; only entries with a TTL are indexed
+                CREATE INDEX IF NOT EXISTS entries_expiry ON entries (expires_at) WHERE expires_at IS NOT NULL;
+                -- One running total per namespace (replaces the single-row totals table)
+                DROP TRIGGER IF EXISTS entries_added;
+                DROP TRIGGER IF EXISTS entries_removed;
+                DROP TABLE IF EXISTS totals;
+                CREATE TABLE IF NOT EXISTS namespace_totals (namespace TEXT PRIMARY KEY, bytes INTEGER NOT NULL);
+                INSERT OR IGNORE INTO namespace_totals (namespace, bytes)
+                    SELECT namespace, SUM(size) FROM entries GROUP BY namespace;
+                CREATE TRIGGER IF NOT EXISTS namespace_added AFTER INSERT ON entries
+                    BEGIN
+                        INSERT INTO namespace_totals (namespace, bytes) VALUES (NEW.namespace, NEW.size)
+                            ON CONFLICT (namespace) DO UPDATE SET bytes = bytes + NEW.size;
+                    END;
+                CREATE TRIGGER IF NOT EXISTS namespace_removed AFTER DELETE ON entries
+                    BEGIN UPDATE namespace_totals SET bytes = bytes - OLD.size WHERE namespace = OLD.namespace; END;
+                COMMIT;
+                """
+            )
+            self._sweep_orphans()
+        return self._conn
+
+    def _pool(self, namespace: str) -> str:
+        """Budget a namespace counts against: its own if it has a share, otherwise the shared "*" one."""
+        return namespace if namespace in self.shares and namespace != "*" else "*"
+
+    def budget(self, namespace: str) -> int:
+        return int(self.budget_bytes * self.shares.get(self._pool(namespace), 0.0))
+
+    # -- reads -------------------------------------------------------------
+
+    def view(self, namespace: str, key: str) -> Optional[Tuple[memoryview, dict]]:
+        """(read-only view of the value, meta) or None. Blob values are mmapped, not copied."""
+        found = self._view(namespace, key)
+        cache_lookup(namespace, found is not None)
+        return found
+
+    def _view(self, namespace: str, key: str) -> Optional[Tuple[memoryview, dict]]:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT value, file, meta, accessed_at, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None:
+                return None
+            if row["expires_at"] is not None and row["expires_at"] <= now:
+                doomed = self._delete_locked(db, namespace, key)
+                row = None
+            elif now - row["accessed_at"] > TOUCH_INTERVAL_S:
+                db.execute("UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+        if row is None:
+            self._unlink(doomed)
+            return None
+        meta = loads(row["meta"]) if row["meta"] else {}
+        if row["file"] is None:
+            return memoryview(row["value"]), meta
+        try:
+            with open(self.blobs / row["file"], "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # Replaced or evicted by another process between the lookup and the open
+            return None
+        return memoryview(mapped), meta
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        found = self.view(namespace, key)
+        return bytes(found[0]) if found is not None else None
+
+    def get_json(self, namespace: str, key: str) -> Any:
+        found = self.view(namespace, key)
+        return loads(bytes(found[0])) if found is not None else None
+
+    # -- writes ------------------------------------------------------------
+
+    def put(self, namespace: str, key: str, value: Buffer, meta: Optional[dict] = None, ttl: Optional[float] = None) -> bool:
+        """Stores `value` (replacing any previous one). Values over a quarter of the namespace's budget are not cached."""
+        data = memoryview(value).cast("B")
+        size = data.nbytes
+        if size > self.budget(namespace) // 4:
+            return False
+        now = time.time()
+        file = None
+        if size > self.inline_max:
+            digest = hashlib.sha256(f"{namespace}\0{key}".encode()).hexdigest()[:32]
+            file = f"{digest}.{uuid.uuid4().hex[:12]}.bin"
+            tmp = self.blobs / f"{file}.tmp"
+            self.blobs.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.blobs / file)
+        doomed: List[str] = []
+        with self._lock:
+            db = self._db()
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                doomed += self._delete_locked(db, namespace, key)
+                db.execute(
+                    "INSERT INTO entries (namespace, key, size, value, file, meta, created_at, accessed_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (namespace, key, size, None if file else bytes(data), file,
+                     dumps(meta) if meta else None, now, now, now + ttl if ttl else None),
+                )
+                doomed += self._evict_locked(db, namespace, now)
+                db.execute("COMMIT")
+            except Exception:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                if file:
+                    self._unlink([file])
+                raise
+        self._unlink(doomed)
+        return True
+
+    def put_json(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return self.put(namespace, key, dumps(value), ttl=ttl)
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            doomed = self._delete_locked(self._db(), namespace, key)
+        self._unlink(doomed)
+
+    def _delete_locked(self, db, namespace: str, key: str) -> List[str]:
+        row = db.execute("SELECT file FROM entries WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+        if row is None:
+            return []
+        db.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        return [row["file"]] if row["file"] else []
+
+    def _evict_locked(self, db, namespace: str, now: float) -> List[str]:
+        """
+        Drops expired entries, then the least recently used ones of
+        `namespace`'s budget until it fits. Returns blob files to unlink.
+        """
+        doomed: List[str] = []
+        for row in db.execute("SELECT namespace, file FROM entries WHERE expires_at <= ?", (now,)).fetchall():
+            doomed += [row["file"]] if row["file"] else []
+        db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        pool = self._pool(namespace)
+        if pool == "*":
+            # Every namespace without a share of its own
+            owned = [ns for ns in self.shares if ns != "*"]
+            marks = ",".join("?" * len(owned))
+            where, args = f"namespace NOT IN ({marks})", owned
+        else:
+            where, args = "namespace = ?", [pool]
+        total = db.execute(f"SELECT COALESCE(SUM(bytes), 0) FROM namespace_totals WHERE {where}", args).fetchone()[0]
+        budget = self.budget(namespace)
+        if total <= budget:
+            return doomed
+        excess = total - int(budget * EVICT_TO)
+        victims = []
+        for row in db.execute(f"SELECT namespace, key, size, file FROM entries WHERE {where} ORDER BY accessed_at", args):
+            if excess <= 0:
+                break
+            victims.append((row["namespace"], row["key"]))
+            doomed += [row["file"]] if row["file"] else []
+            excess -= row["size"]
+        db.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+        for victim, _ in victims:
+            EVICTIONS.inc(victim)
+        return doomed
+
+    def _unlink(self, files: List[str]) -> None:
+        for name in files:
+            try:
+                (self.blobs / name).unlink(missing_ok=True)
+            except OSError:
+                # Still mapped on a platform that refuses the unlink; swept later
+                pass
+
+    def _sweep_orphans(self) -> None:
+        known = {r["file"] for r in self._conn.execute("SELECT file FROM entries WHERE file IS NOT NULL")}
+        cutoff = time.time() - ORPHAN_AGE_S
+        for path in self.blobs.iterdir():
+            try:
+                if path.name not in known and path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                continue
+
+    # -- stats -------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            db = self._db()
+            total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM namespace_totals").fetchone()[0]
+            rows = db.execute(
+                "SELECT namespace, COUNT(*) AS entries, SUM(size) AS bytes FROM entries GROUP BY namespace"
+            ).fetchall()
+        return {
+            "bytes": total,
+            "budget_bytes": self.budget_bytes,
+            "namespaces": {
+                r["namespace"]: {"entries": r["entries"], "bytes": r["bytes"], "budget_bytes": self.budget(r["namespace"])}
+                for r in rows
+            },
+        }
+
+
+_cache: Optional[SharedCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> SharedCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SharedCache()
+        return _cache
+
+
+def _collector(field: str):
+    def collect():
+        # Only once this process has used the cache; a scrape should not create it
+        if _cache is None:
+            return []
+        namespaces = _cache.stats()["namespaces"]
+        return [(f"airc_shared_cache_{field}", {"namespace": ns}, s[field]) for ns, s in namespaces.items()]
+
+    return collect
+
+
+register_collector("airc_shared_cache_bytes", "gauge", "Bytes in the shared cache (all processes), by namespace", _collector("bytes"))
+register_collector("airc_shared_cache_entries", "gauge", "Entries in the shared cache (all processes), by namespace", _collector("entries"))
@@ -0,0 +1,196 @@
+"""
+Startup timings, optional warmup and shutdown of the worker pools.
+
+Heavy libraries (NumPy, Pillow, pytesseract, the LLM clients) are imported
+by the functions that use them, so importing app.main stays cheap and a
+new worker accepts connections sooner. What the first requests would pay
+for instead (imports, font parsing, rule compilation, asset records,
+worker processes) can be done up front:
+
+    AIRC_WARMUP          0 (default): nothing, first use pays
+                         background (or 1): warm in a thread once the app
+                         has started; requests are served meanwhile
+                         blocking: finish warming before the app accepts
+                         requests
+    AIRC_WARMUP_STEPS    comma list, default every step in WARMUP_STEPS
+    AIRC_WARMUP_ASSETS   newest uploads whose ingest records are preloaded (64)
+
+Timings (importing app.main, each warmup step) are printed once, exported
+as airc_startup_seconds{phase} on /metrics and returned by
+/api/health/startup, whose "ready" field stays false while a warmup is
+running (for readiness probes with AIRC_WARMUP=background).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from ..config import ASSETS_DIR, MIN_FONT_SIZES
+from .metrics import register_collector
+
+# Font sizes parsed by the fonts step: everything from the smallest allowed
+# size up to the largest the layout engine uses
+WARM_FONT_SIZES = range(min(MIN_FONT_SIZES.values()), 97)
+WARM_FONT_FAMILY = "Arial"
+
+TIMINGS: Dict[str, float] = {}
+_errors: Dict[str, str] = {}
+_state = "off"
+_lock = threading.Lock()
+
+
+def _mode() -> str:
+    mode = os.getenv("AIRC_WARMUP", "0").lower()
+    if mode in ("1", "true", "background"):
+        return "background"
+    return "blocking" if mode == "blocking" else "off"
+
+
+def _warm_assets_limit() -> int:
+    return int(os.getenv("AIRC_WARMUP_ASSETS", "64"))
+
+
+def record(phase: str, seconds: float) -> None:
+    with _lock:
+        TIMINGS[phase] = seconds
+
+
+def _warm_imports() -> None:
+    import numpy  # noqa: F401
+    from PIL import Image, ImageDraw, ImageFont  # noqa: F401
+
+    # Registers every image plugin up front; Image.open would do it on first use
+    Image.init()
+    from . import bg_removal, compliance_engine, exporter, ingest, layout_engine  # noqa: F401
+    from ..models import compact  # noqa: F401
+
+
+def _warm_fonts() -> None:
+    from .exporter import _open_font
+
+    for size in WARM_FONT_SIZES:
+        _open_font(WARM_FONT_FAMILY, size)
+
+
+def _warm_rules() -> None:
+    from ..compliance.ocr_check import ocr_available
+    from .compliance_engine import banned_copy_pattern
+
+    banned_copy_pattern()
+    ocr_available()
+
+
+def _warm_assets() -> None:
+    from .asset_store import get_index
+    from .ingest import get_record
+
+    for asset in get_index().recent(_warm_assets_limit()):
+        get_record(ASSETS_DIR / asset["name"], asset["sha256"])
+
+
+def _warm_llm() -> None:
+    from .llm_gateway import get_gateway
+
+    get_gateway().warm()
+
+
+def _warm_pools() -> None:
+    from .jobs import JOB_EXECUTOR, get_queue
+
+    # Spawned job workers are the slowest thing to start; thread pools start on demand anyway
+    if JOB_EXECUTOR == "process":
+        get_queue().prestart()
+
+
+WARMUP_STEPS: Dict[str, Callable[[], None]] = {
+    "imports": _warm_imports,
+    "fonts": _warm_fonts,
+    "rules": _warm_rules,
+    "assets": _warm_assets,
+    "llm": _warm_llm,
+    "pools": _warm_pools,
+}
+
+
+def _steps_from_env() -> List[str]:
+    spec = os.getenv("AIRC_WARMUP_STEPS")
+    if not spec:
+        return list(WARMUP_STEPS)
+    return [s.strip() for s in spec.split(",") if s.strip() in WARMUP_STEPS]
+
+
+def warmup(steps: Optional[Sequence[str]] = None) -> Dict[str, float]:
+    """Runs the warmup steps in order, timing each; a failing step is reported and skipped."""
+    global _state
+    _state = "running"
+    started = time.perf_counter()
+    for name in steps if steps is not None else _steps_from_env():
+        step_started = time.perf_counter()
+        try:
+            WARMUP_STEPS[name]()
+        except Exception as e:
+            _errors[name] = f"{type(e).__name__}: {e}"
+            print(f"Warmup step {name} failed: {e}")
+        record(f"warmup.{name}", time.perf_counter() - step_started)
+    record("warmup", time.perf_counter() - started)
+    _state = "failed" if _errors else "done"
+    print(f"Warmup: {_summary()}")
+    return dict(TIMINGS)
+
+
+def _summary() -> str:
+    with _lock:
+        return ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in TIMINGS.items())
+
+
+async def start(mode: Optional[str] = None) -> None:
+    """Lifespan startup: starts the storage sweeper and warms up according to AIRC_WARMUP."""
+    global _state
+    from . import storage_manager
+
+    storage_manager.start()
+    mode = mode or _mode()
+    print(f"Startup: {_summary()}; warmup {mode}")
+    if mode == "blocking":
+        await asyncio.to_thread(warmup)
+    elif mode == "background":
+        _state = "running"  # before the thread starts, so readiness never sees a gap
+        threading.Thread(target=warmup, name="warmup", daemon=True).start()
+
+
+async def stop() -> None:
+    """
+    Lifespan shutdown: stops the pools and the storage sweeper (work already
+    queued finishes in the background) and closes the LLM gateway's async clients.
+    """
+    from . import ingest, jobs, llm_gateway, storage_manager, thumbnails
+
+    jobs.shutdown_queue()
+    ingest.shutdown()
+    thumbnails.shutdown()
+    storage_manager.stop()
+    if llm_gateway._gateway is not None:
+        await llm_gateway._gateway.aclose()
+
+
+def status() -> dict:
+    with _lock:
+        timings = {k: round(v * 1000, 1) for k, v in TIMINGS.items()}
+    return {
+        "warmup": _mode(),
+        "state": _state,
+        "ready": _state != "running",
+        "timings_ms": timings,
+        "errors": dict(_errors),
+    }
+
+
+register_collector(
+    "airc_startup_seconds",
+    "gauge",
+    "Time spent importing the app and per warmup step",
+    lambda: [("airc_startup_seconds", {"phase": k}, v) for k, v in list(TIMINGS.items())],
+)
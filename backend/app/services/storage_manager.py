@@ -0,0 +1,424 @@
+"""
+Disk budget for generated artifacts.
+
+Everything the app writes on its own (as opposed to what users upload)
+can be produced again, so it is kept under a size budget instead of
+growing forever:
+
+    export     STATIC_DIR/exports/export_<format>_<hash>.<ext>
+    bgremoved  ASSETS_DIR/bgremoved_*.png (background removal outputs)
+    derived    DATA_DIR/derived/<sha>/ (ingest pyramids, one unit per asset)
+    thumbnail  DATA_DIR/thumbnails/<content hash>.jpg
+
+An access index (data/storage.sqlite3, one row per artifact: kind, size,
+last access) is fed by touch(), which the writers and the static file
+mounts call; touches are buffered in memory and written in batches by the
+sweeper thread (or, without one, a short-lived flush thread), never by the
+caller, and
+files the index has not seen (older files, other processes) are picked up
+by the directory scan that starts every sweep, with their mtime as last
+access.
+
+A background thread sweeps every AIRC_STORAGE_SWEEP_S seconds. When the
+artifacts add up to more than AIRC_STORAGE_BUDGET_MB it deletes them down
+to EVICT_TO of the budget: first the unreferenced ones (exports, outputs
+no project uses, derived data of assets no project uses, thumbnails of
+superseded versions), then the rest least recently used first. Never
+deleted:
+
+  - uploads (user data; not managed at all)
+  - bgremoved outputs referenced by any version of any saved project
+  - anything used or written in the last AIRC_STORAGE_MIN_AGE_S seconds,
+    so a freshly exported URL can still be downloaded
+
+Derived data and thumbnails are rebuilt on demand when needed again.
+Evictions are remembered for EVICTED_MEMORY_S; only an output evicted
+within that time is re-created on request (restorable()), so requests for
+made-up names cannot trigger new work. With
+several worker processes, one sweep runs per interval (claimed in the
+index); the others only flush their touches.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from ..config import ASSETS_DIR, DATA_DIR, EXPORTS_DIR
+from ..utils.sqlite import connect
+from .metrics import counter, register_collector
+
+STORAGE_INDEX_PATH = DATA_DIR / "storage.sqlite3"
+BUDGET_BYTES = int(float(os.getenv("AIRC_STORAGE_BUDGET_MB", "2048")) * 1024 * 1024)
+SWEEP_INTERVAL_S = float(os.getenv("AIRC_STORAGE_SWEEP_S", "300"))
+MIN_AGE_S = float(os.getenv("AIRC_STORAGE_MIN_AGE_S", "600"))
+# Touches are written to the index at most this often
+FLUSH_INTERVAL_S = 10.0
+# Sweeps free a little more than needed so the next one does not evict again
+EVICT_TO = 0.9
+BGREMOVED_PREFIX = "bgremoved_"
+# How long an evicted artifact stays restorable on request
+EVICTED_MEMORY_S = 30 * 24 * 3600
+
+KINDS = ("export", "bgremoved", "derived", "thumbnail")
+
+EVICTIONS = counter("airc_storage_evictions_total", "Artifacts deleted to stay within the storage budget", ("kind",))
+EVICTED_BYTES = counter("airc_storage_evicted_bytes_total", "Bytes deleted to stay within the storage budget", ("kind",))
+
+Key = Tuple[str, str]
+
+
+def _root(kind: str) -> Path:
+    if kind == "export":
+        return EXPORTS_DIR
+    if kind == "bgremoved":
+        return ASSETS_DIR
+    if kind == "derived":
+        from .ingest import DERIVED_DIR
+
+        return DERIVED_DIR
+    from .thumbnails import THUMBNAILS_DIR
+
+    return THUMBNAILS_DIR
+
+
+def _size(path: Path) -> int:
+    if not path.is_dir():
+        return path.stat().st_size
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+
+def _scan(kind: str) -> Iterator[Tuple[str, int, float]]:
+    """(name, size, mtime) of every artifact of `kind` on disk; temp files are skipped."""
+    root = _root(kind)
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        name = entry.name
+        if name.startswith(".") or name.endswith(".tmp"):
+            continue
+        if kind == "bgremoved" and not name.startswith(BGREMOVED_PREFIX):
+            continue
+        if (kind == "derived") != entry.is_dir():
+            continue
+        try:
+            yield name, _size(Path(entry.path)), entry.stat().st_mtime
+        except OSError:
+            continue
+
+
+class StorageManager:
+    """Access index of generated artifacts and the sweeps that keep them within the budget."""
+
+    def __init__(self, path: Path = STORAGE_INDEX_PATH, budget_bytes: int = BUDGET_BYTES, min_age_s: float = MIN_AGE_S):
+        self.path = path
+        self.budget_bytes = budget_bytes
+        self.min_age_s = min_age_s
+        self._conn = None
+        self._lock = threading.Lock()
+        self._touched: Dict[Key, float] = {}
+        self._touched_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flushing = False
+        self.last_sweep: dict = {}
+        # Per-kind totals of the last sweep, for the metrics collector
+        self.totals: Dict[str, Dict[str, int]] = {}
+
+    def _db(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = connect(self.path)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    kind TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (kind, name)
+                );
+                CREATE INDEX IF NOT EXISTS artifacts_lru ON artifacts (accessed_at);
+                CREATE TABLE IF NOT EXISTS evicted (
+                    kind TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    evicted_at REAL NOT NULL,
+                    PRIMARY KEY (kind, name)
+                );
+                CREATE TABLE IF NOT EXISTS storage_meta (key TEXT PRIMARY KEY, value REAL NOT NULL);
+                INSERT OR IGNORE INTO storage_meta (key, value) VALUES ('last_sweep', 0);
+                """
+            )
+        return self._conn
+
+    # -- access tracking ---------------------------------------------------
+
+    def touch(self, kind: str, name: str) -> None:
+        """Records a use (or creation) of an artifact. Cheap: buffered until the next flush."""
+        with self._touched_lock:
+            self._touched[(kind, name)] = time.time()
+        if _thread is None and time.monotonic() - self._last_flush > FLUSH_INTERVAL_S:
+            # No sweeper in this process (job workers, CLIs): flush now and then, on a
+            # short-lived thread so callers on the event loop never wait on the write
+            self._flush_in_background()
+
+    def _flush_in_background(self) -> None:
+        with self._touched_lock:
+            if self._flushing:
+                return
+            self._flushing = True
+            self._last_flush = time.monotonic()
+
+        def run():
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Storage index flush failed: {e}")
+            finally:
+                self._flushing = False
+
+        threading.Thread(target=run, name="storage-flush", daemon=True).start()
+
+    def flush(self) -> None:
+        with self._touched_lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+        if not touched:
+            return
+        rows = []
+        for (kind, name), at in touched.items():
+            try:
+                rows.append((kind, name, _size(_root(kind) / name), at))
+            except OSError:
+                continue
+        with self._lock:
+            self._db().executemany(
+                "INSERT INTO artifacts (kind, name, size, accessed_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (kind, name) DO UPDATE SET size = excluded.size,"
+                " accessed_at = MAX(accessed_at, excluded.accessed_at)",
+                rows,
+            )
+
+    def restorable(self, kind: str, name: str) -> bool:
+        """Whether `name` was produced and then evicted (and so may be produced again on request)."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT 1 FROM evicted WHERE kind = ? AND name = ? AND evicted_at >= ?",
+                (kind, name, time.time() - EVICTED_MEMORY_S),
+            ).fetchone()
+        return row is not None
+
+    def restored(self, kind: str, name: str) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM evicted WHERE kind = ? AND name = ?", (kind, name))
+        self.touch(kind, name)
+
+    # -- sweeps ------------------------------------------------------------
+
+    def _claim(self, interval: float) -> bool:
+        """Whether this process runs the sweep: at most one per `interval` across processes."""
+        now = time.time()
+        with self._lock:
+            claimed = self._db().execute(
+                "UPDATE storage_meta SET value = ? WHERE key = 'last_sweep' AND value <= ?", (now, now - interval)
+            ).rowcount
+        return claimed > 0
+
+    def _reconcile(self) -> Dict[Key, Tuple[int, float]]:
+        """Brings the index in line with the disk; returns {(kind, name): (size, accessed_at)}."""
+        on_disk = {(kind, name): (size, mtime) for kind in KINDS for name, size, mtime in _scan(kind)}
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                indexed = {(r["kind"], r["name"]): r["accessed_at"] for r in db.execute("SELECT kind, name, accessed_at FROM artifacts")}
+                gone = [key for key in indexed if key not in on_disk]
+                db.executemany("DELETE FROM artifacts WHERE kind = ? AND name = ?", gone)
+                db.executemany(
+                    "INSERT INTO artifacts (kind, name, size, accessed_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (kind, name) DO UPDATE SET size = excluded.size",
+                    [(kind, name, size, mtime) for (kind, name), (size, mtime) in on_disk.items()],
+                )
+                db.execute("COMMIT")
+            except Exception:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                raise
+        return {key: (size, max(mtime, indexed.get(key, 0.0))) for key, (size, mtime) in on_disk.items()}
+
+    def _referenced(self) -> Set[Key]:
+        """Artifacts saved projects use (directly, or as the derived data / thumbnail of what they use)."""
+        from .asset_store import ASSET_URL_PREFIX, file_digest, get_index
+        from .project_store import get_store
+
+        store = get_store()
+        names = store.asset_references(ASSET_URL_PREFIX)
+        refs: Set[Key] = {("thumbnail", f"{h}.jpg") for h in store.content_hashes()}
+        index = get_index()
+        for name in names:
+            if name.startswith(BGREMOVED_PREFIX):
+                refs.add(("bgremoved", name))
+                try:
+                    refs.add(("derived", file_digest(ASSETS_DIR / name)))
+                except OSError:
+                    pass
+            else:
+                asset = index.by_name(name)
+                if asset:
+                    refs.add(("derived", asset["sha256"]))
+        return refs
+
+    def sweep(self) -> dict:
+        """One pass: flush touches, rescan, and evict down to the budget if over it. Returns a summary."""
+        started = time.perf_counter()
+        self.flush()
+        artifacts = self._reconcile()
+        totals: Dict[str, Dict[str, int]] = {kind: {"files": 0, "bytes": 0} for kind in KINDS}
+        for (kind, _), (size, _) in artifacts.items():
+            totals[kind]["files"] += 1
+            totals[kind]["bytes"] += size
+        total = sum(t["bytes"] for t in totals.values())
+        evicted: List[Key] = []
+        freed = 0
+        if total > self.budget_bytes:
+            refs = self._referenced()
+            now = time.time()
+            candidates = sorted(
+                (key in refs, accessed_at, key, size)
+                for key, (size, accessed_at) in artifacts.items()
+                if not (key[0] == "bgremoved" and key in refs) and accessed_at < now - self.min_age_s
+            )
+            excess = total - int(self.budget_bytes * EVICT_TO)
+            for _, _, key, size in candidates:
+                if excess <= 0:
+                    break
+                if self._evict(key, now):
+                    evicted.append(key)
+                    totals[key[0]]["files"] -= 1
+                    totals[key[0]]["bytes"] -= size
+                    excess -= size
+                    freed += size
+                    EVICTIONS.inc(key[0])
+                    EVICTED_BYTES.inc(key[0], amount=size)
+            with self._lock:
+                db = self._db()
+                db.executemany("DELETE FROM artifacts WHERE kind = ? AND name = ?", evicted)
+                db.executemany(
+                    "INSERT OR REPLACE INTO evicted (kind, name, evicted_at) VALUES (?, ?, ?)",
+                    [(kind, name, now) for kind, name in evicted],
+                )
+        with self._lock:
+            self._db().execute("DELETE FROM evicted WHERE evicted_at < ?", (time.time() - EVICTED_MEMORY_S,))
+        self.totals = totals
+        self.last_sweep = {
+            "at": time.time(),
+            "seconds": round(time.perf_counter() - started, 4),
+            "bytes_before": total,
+            "evicted": len(evicted),
+            "freed_bytes": freed,
+        }
+        if evicted:
+            print(f"Storage sweep: evicted {len(evicted)} artifacts, {freed / 1e6:.1f} MB freed")
+        return self.last_sweep
+
+    def _evict(self, key: Key, now: float) -> bool:
+        path = _root(key[0]) / key[1]
+        try:
+            # Rewritten since the scan (a re-export, a re-ingest): no longer a candidate
+            if path.stat().st_mtime >= now - self.min_age_s:
+                return False
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        except FileNotFoundError:
+            return True
+        except OSError as e:
+            print(f"Storage sweep could not remove {path}: {e}")
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "bytes": sum(t["bytes"] for t in self.totals.values()),
+            "kinds": self.totals,
+            "last_sweep": self.last_sweep,
+        }
+
+
+_manager: Optional[StorageManager] = None
+_manager_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def get_manager() -> StorageManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = StorageManager()
+        return _manager
+
+
+def touch(kind: str, name: str) -> None:
+    get_manager().touch(kind, name)
+
+
+def _loop(interval: float) -> None:
+    manager = get_manager()
+    next_sweep = 0.0
+    while not _stop.wait(min(FLUSH_INTERVAL_S, interval) if next_sweep else 0):
+        try:
+            manager.flush()
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + interval
+                if manager._claim(interval / 2):
+                    manager.sweep()
+        except Exception as e:
+            print(f"Storage sweep failed: {e}")
+
+
+def start(interval: Optional[float] = None) -> None:
+    """Starts the background sweeper (AIRC_STORAGE_SWEEP_S=0 disables it)."""
+    global _thread
+    interval = SWEEP_INTERVAL_S if interval is None else interval
+    if interval <= 0 or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, args=(interval,), name="storage-sweeper", daemon=True)
+    _thread.start()
+
+
+def stop() -> None:
+    """Stops the sweeper and writes the buffered touches."""
+    global _thread
+    thread, _thread = _thread, None
+    if thread is not None:
+        _stop.set()
+        thread.join(timeout=5)
+    if _manager is not None:
+        _manager.flush()
+
+
+def _collector(field: str):
+    def collect():
+        if _manager is None:
+            return []
+        return [(f"airc_storage_{field}", {"kind": kind}, t[field]) for kind, t in _manager.totals.items()]
+
+    return collect
+
+
+register_collector("airc_storage_bytes", "gauge", "Bytes of generated artifacts on disk at the last sweep, by kind", _collector("bytes"))
+register_collector("airc_storage_files", "gauge", "Generated artifacts on disk at the last sweep, by kind", _collector("files"))
+register_collector(
+    "airc_storage_budget_bytes",
+    "gauge",
+    "Disk budget for generated artifacts",
+    lambda: [("airc_storage_budget_bytes", {}, _manager.budget_bytes)] if _manager is not None else [],
+)
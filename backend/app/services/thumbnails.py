@@ -0,0 +1,117 @@
+"""
+Project thumbnails, rendered in the background after each save.
+
+Thumbnails are named by the canvas content hash (project_store.canvas_hash),
+so a saved version's thumbnail never changes: it is served with immutable
+cache headers and invalidated simply by the next save getting a new hash.
+Rendering draws the canvas at thumbnail scale (no full-size render) on a
+small worker pool at batch priority, so it never delays editor requests.
+Because a thumbnail is permanent, it is only written once every image on
+the canvas could be drawn from its ingested pyramid: rendering first waits
+for ingestion, and a canvas with a missing or unreadable image gets no
+thumbnail (render_thumbnail raises OSError) rather than a wrong one.
+
+    AIRC_PROJECT_THUMB_SIZE   longest side in pixels
+    AIRC_THUMB_WORKERS        background render threads
+"""
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..config import DATA_DIR
+from ..models.schemas import Canvas, ImageElement
+from .admission import BATCH, admit, workload_priority
+from .project_store import canvas_hash
+from .storage_manager import touch
+
+THUMBNAILS_DIR = DATA_DIR / "thumbnails"
+THUMBNAIL_URL_PREFIX = "/api/projects/thumbnails/"
+THUMB_SIZE = int(os.getenv("AIRC_PROJECT_THUMB_SIZE", "320"))
+THUMB_WORKERS = int(os.getenv("AIRC_THUMB_WORKERS", "1"))
+THUMB_QUALITY = 80
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_pool: Optional[ThreadPoolExecutor] = None
+_inflight: Dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def thumbnail_path(content_hash: str) -> Path:
+    return THUMBNAILS_DIR / f"{content_hash}.jpg"
+
+
+def thumbnail_url(content_hash: Optional[str]) -> Optional[str]:
+    return f"{THUMBNAIL_URL_PREFIX}{content_hash}.jpg" if content_hash else None
+
+
+def render_thumbnail(canvas: dict) -> Path:
+    """Renders (or reuses) the thumbnail for a canvas dict; OSError if an image cannot be drawn."""
+    from PIL import Image
+
+    from .asset_store import asset_path
+    from .exporter import compose_canvas
+    from .ingest import ensure_record
+
+    out = thumbnail_path(canvas_hash(canvas))
+    if out.exists():
+        return out
+    model = Canvas.model_validate(canvas)
+    scale = min(1.0, THUMB_SIZE / max(model.width, model.height, 1))
+    # Ingest outside the render slot; compose_canvas then only draws
+    for el in model.elements:
+        if isinstance(el, ImageElement):
+            src = asset_path(el.src)
+            if src.exists():
+                ensure_record(src, wait=True)
+    with admit("render"):
+        img = compose_canvas(model, scale, complete=True)
+    flat = Image.new("RGB", img.size, (255, 255, 255))
+    flat.paste(img, mask=img.getchannel("A"))
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    flat.save(tmp, format="JPEG", quality=THUMB_QUALITY, optimize=True)
+    os.replace(tmp, out)
+    touch("thumbnail", out.name)
+    return out
+
+
+def _run(canvas: dict, content_hash: str) -> Optional[Path]:
+    try:
+        with workload_priority(BATCH):
+            return render_thumbnail(canvas)
+    except Exception as e:
+        print(f"Thumbnail failed for {content_hash}: {e}")
+        return None
+    finally:
+        with _lock:
+            _inflight.pop(content_hash, None)
+
+
+def shutdown() -> None:
+    """Stops the render pool after queued thumbnails finish."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def schedule_thumbnail(canvas: Optional[dict]) -> Optional[Future]:
+    """Queues a background render unless the thumbnail exists or is already being rendered."""
+    global _pool
+    if canvas is None:
+        return None
+    content_hash = canvas_hash(canvas)
+    if thumbnail_path(content_hash).exists():
+        return None
+    with _lock:
+        fut = _inflight.get(content_hash)
+        if fut is None:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=max(1, THUMB_WORKERS), thread_name_prefix="thumb")
+            fut = _inflight[content_hash] = _pool.submit(_run, canvas, content_hash)
+    return fut
@@ -5,7 +5,7 @@ from typing import Tuple
 
 def _linearize_channel(c: float) -> float:
     c = c / 255.0
-    return c / 12.92 if c <= 0.04045 * 255 else ((c + 0.055) / 1.055) ** 2.4
+    return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
 
 
 def relative_luminance(rgb: Tuple[int, int, int]) -> float:
@@ -0,0 +1,171 @@
+"""
+JSON Patch (RFC 6902) for plain JSON values: apply_patch() and a diff,
+make_patch(), producing patches apply_patch() accepts. Documents are never
+modified in place; apply_patch() copies only the containers on the path of
+each operation.
+"""
+from __future__ import annotations
+
+import copy
+import json
+from typing import Any, List, Tuple
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [_unescape(t) for t in pointer[1:].split("/")]
+
+
+def _index(container: list, token: str, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    i = int(token)
+    if i > len(container) or (i == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {i}")
+    return i
+
+
+def _get(doc: Any, tokens: List[str]) -> Any:
+    for token in tokens:
+        if isinstance(doc, dict):
+            if token not in doc:
+                raise JsonPatchError(f"Path not found: /{'/'.join(map(_escape, tokens))}")
+            doc = doc[token]
+        elif isinstance(doc, list):
+            doc = doc[_index(doc, token, allow_end=False)]
+        else:
+            raise JsonPatchError(f"Cannot descend into {type(doc).__name__}")
+    return doc
+
+
+def _parent(root: Any, tokens: List[str]) -> Tuple[Any, Any]:
+    """Copies the containers along `tokens[:-1]`; returns (new root, copied parent)."""
+    root = copy.copy(root)
+    node = root
+    for token in tokens[:-1]:
+        if isinstance(node, dict):
+            if token not in node:
+                raise JsonPatchError(f"Path not found: {token!r}")
+            child = node[token] = copy.copy(node[token])
+        elif isinstance(node, list):
+            i = _index(node, token, allow_end=False)
+            child = node[i] = copy.copy(node[i])
+        else:
+            raise JsonPatchError(f"Cannot descend into {type(node).__name__}")
+        node = child
+    return root, node
+
+
+def _add(doc: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    doc, parent = _parent(doc, tokens)
+    if isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, tokens[-1], allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add into {type(parent).__name__}")
+    return doc
+
+
+def _remove(doc: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise JsonPatchError("Cannot remove the document root")
+    doc, parent = _parent(doc, tokens)
+    if isinstance(parent, dict):
+        if tokens[-1] not in parent:
+            raise JsonPatchError(f"Path not found: {tokens[-1]!r}")
+        del parent[tokens[-1]]
+    elif isinstance(parent, list):
+        del parent[_index(parent, tokens[-1], allow_end=False)]
+    else:
+        raise JsonPatchError(f"Cannot remove from {type(parent).__name__}")
+    return doc
+
+
+def apply_patch(doc: Any, patch: List[dict]) -> Any:
+    """Returns `doc` with `patch` applied. Raises JsonPatchError; `doc` is left untouched."""
+    for op in patch:
+        try:
+            kind, path = op["op"], parse_pointer(op["path"])
+        except (KeyError, TypeError):
+            raise JsonPatchError(f"Malformed operation: {op!r}")
+        if kind == "add":
+            doc = _add(doc, path, copy.deepcopy(op.get("value")))
+        elif kind == "remove":
+            doc = _remove(doc, path)
+        elif kind == "replace":
+            _get(doc, path)
+            doc = _add(_remove(doc, path), path, copy.deepcopy(op.get("value"))) if path else copy.deepcopy(op.get("value"))
+        elif kind in ("move", "copy"):
+            src = parse_pointer(op.get("from", ""))
+            value = _get(doc, src)
+            if kind == "move":
+                if path[:len(src)] == src and len(path) > len(src):
+                    raise JsonPatchError("Cannot move a value into itself")
+                doc = _remove(doc, src)
+            doc = _add(doc, path, copy.deepcopy(value))
+        elif kind == "test":
+            if _get(doc, path) != op.get("value"):
+                raise JsonPatchError(f"Test failed at {op['path']}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {kind!r}")
+    return doc
+
+
+def make_patch(src: Any, dst: Any, path: str = "") -> List[dict]:
+    """
+    A patch turning `src` into `dst`. Objects are diffed key by key; arrays
+    element by element over the common prefix, then the tail is removed or
+    appended; when the length changed and replacing the whole array
+    serialises smaller (e.g. an element dropped near the front), it is
+    replaced instead.
+    """
+    if src == dst and type(src) is type(dst):
+        return []
+    if isinstance(src, dict) and isinstance(dst, dict):
+        ops: List[dict] = []
+        for key in src:
+            if key not in dst:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in dst.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in src:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops += make_patch(src[key], value, child)
+        return ops
+    if isinstance(src, list) and isinstance(dst, list):
+        common = min(len(src), len(dst))
+        ops = []
+        for i in range(common):
+            ops += make_patch(src[i], dst[i], f"{path}/{i}")
+        # Remove from the end so indices stay valid
+        for i in range(len(src) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+        for i in range(common, len(dst)):
+            ops.append({"op": "add", "path": f"{path}/-", "value": dst[i]})
+        if len(src) != len(dst):
+            replace = [{"op": "replace", "path": path, "value": dst}]
+            if len(json.dumps(replace)) < len(json.dumps(ops)):
+                return replace
+        return ops
+    return [{"op": "replace", "path": path, "value": dst}]
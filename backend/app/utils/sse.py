@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Formats one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop reverse proxies (nginx) from buffering the stream
+    "X-Accel-Buffering": "no",
+}
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import os
+from typing import Dict, Optional
+
+import anyio
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from ..services.admission import BATCH, admit, workload_priority
+from ..services.storage_manager import touch
+
+
+def _restore(name: str):
+    """Re-creates an evicted background-removal output within the render budget, at batch priority."""
+    from ..services.bg_removal import restore_output
+
+    with workload_priority(BATCH), admit("render"):
+        return restore_output(name)
+
+
+class TrackedStaticFiles(StaticFiles):
+    """
+    StaticFiles that reports reads of generated artifacts to the storage
+    manager's access index. `tracked` maps a path prefix within the mount
+    to the artifact kind of the files directly under it. Background-removal
+    outputs the storage manager evicted are re-created on the first request;
+    other missing names are a plain 404.
+    """
+
+    def __init__(self, *args, tracked: Dict[str, str], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tracked = tracked
+
+    def _kind(self, path: str) -> Optional[str]:
+        for prefix, kind in self.tracked.items():
+            if path.startswith(prefix) and "/" not in path[len(prefix):]:
+                return kind
+        return None
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        kind = self._kind(path)
+        if kind is None:
+            return await super().get_response(path, scope)
+        name = os.path.basename(path)
+        try:
+            response = await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404 or kind != "bgremoved":
+                raise
+            if await anyio.to_thread.run_sync(_restore, name) is None:
+                raise
+            response = await super().get_response(path, scope)
+        touch(kind, name)
+        return response
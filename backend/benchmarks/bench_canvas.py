@@ -0,0 +1,128 @@
+"""
+Canvas validation and rule-engine passes for canvases of 10 to 1,000 elements.
+
+    python -m benchmarks.bench_canvas [--sizes 10 100 1000] [--repeat 20] [--json out.json]
+
+(run from backend/). Compares, per canvas size:
+
+    validate        Canvas.model_validate with the `type`-discriminated union
+    validate_union  the same payload against the previous, untagged
+                    BaseElement | TextElement | ImageElement union
+    to_compact      building the engine-side CompactCanvas
+    rules_model     safe-zone + contrast rules walking the pydantic models
+    rules_compact   the same rules on an already built CompactCanvas (the
+                    conversion is paid once per request, shared by all passes)
+    compliance      full check_compliance(ocr=False)
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import time
+from typing import List
+
+# Keep the benchmark offline: banned-copy suggestions use the fallback rewrite
+os.environ["AIRC_LLM_ENABLED"] = "0"
+
+from app.config import SAFE_ZONES  # noqa: E402
+from app.models.compact import CompactCanvas, to_compact  # noqa: E402
+from app.models.schemas import BaseElement, Canvas, ImageElement, TextElement  # noqa: E402
+from app.services.compliance_engine import _contrast_ok, check_compliance  # noqa: E402
+from app.utils.contrast import passes_wcag_aa  # noqa: E402
+
+
+class UntaggedCanvas(Canvas):
+    elements: List[BaseElement | TextElement | ImageElement]
+
+
+def make_canvas(n: int, seed: int = 0) -> dict:
+    rnd = random.Random(seed)
+    elements = []
+    for i in range(n):
+        bounds = {"x": rnd.randint(0, 1000), "y": rnd.randint(0, 1000), "width": rnd.randint(20, 300), "height": rnd.randint(20, 200)}
+        if i % 3 == 0:
+            elements.append({"id": f"img{i}", "type": rnd.choice(["image", "logo"]), "bounds": bounds, "z": i,
+                             "src": f"/static/assets/missing{i}.png"})
+        else:
+            elements.append({"id": f"txt{i}", "type": "text", "bounds": bounds, "z": i, "text": f"Label {i}",
+                             "font_size": rnd.choice([18, 28, 48]),
+                             "color": {"r": rnd.choice([0, 120, 200]), "g": 0, "b": 0, "a": 1}})
+    return {"format": "SQUARE", "width": 1080, "height": 1080, "elements": elements}
+
+
+def rules_model(canvas: Canvas) -> int:
+    t, r, b, l = SAFE_ZONES[canvas.format]
+    found = 0
+    for el in canvas.elements:
+        x, y, w, h = el.bounds.x, el.bounds.y, el.bounds.width, el.bounds.height
+        if x < l or y < t or x + w > canvas.width - r or y + h > canvas.height - b:
+            found += 1
+    bg = canvas.background_color
+    for el in canvas.elements:
+        if isinstance(el, TextElement):
+            fg = (el.color.r, el.color.g, el.color.b)
+            if not passes_wcag_aa(fg, (bg.r, bg.g, bg.b), el.font_size >= 24):
+                found += 1
+    return found
+
+
+def rules_compact(c: CompactCanvas) -> int:
+    t, r, b, l = SAFE_ZONES[c.format]
+    found = len(c.outside(l, t, c.width - r, c.height - b))
+    bg = c.background
+    for te in c.texts:
+        if not _contrast_ok(te.color, te.background or bg, te.font_size >= 24):
+            found += 1
+    return found
+
+
+def _time(fn, repeat: int) -> float:
+    """Best of `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 4)
+
+
+def run(sizes: List[int], repeat: int) -> List[dict]:
+    results = []
+    for n in sizes:
+        payload = make_canvas(n)
+        canvas = Canvas.model_validate(payload)
+        compact = to_compact(canvas)
+        assert rules_model(canvas) == rules_compact(compact)
+        results.append({
+            "elements": n,
+            "validate": _time(lambda: Canvas.model_validate(payload), repeat),
+            "validate_union": _time(lambda: UntaggedCanvas.model_validate(payload), repeat),
+            "to_compact": _time(lambda: to_compact(canvas), repeat),
+            "rules_model": _time(lambda: rules_model(canvas), repeat),
+            "rules_compact": _time(lambda: rules_compact(compact), repeat),
+            "compliance": _time(lambda: check_compliance(canvas, ocr=False), max(1, repeat // 4)),
+        })
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = ap.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    columns = list(results[0].keys())
+    print("  ".join(f"{c:>14}" for c in columns) + "   (ms, best of runs)")
+    for row in results:
+        print("  ".join(f"{row[c]:>14}" for c in columns))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Hot-path benchmarks on seeded synthetic workloads (packshots and canvases
+from scripts/generate_demo_assets.py). Run from backend/:
+
+    python -m benchmarks.bench_pipelines [--quick] [--seed 0] [--out results.json]
+    python -m benchmarks.bench_pipelines --baseline baseline.json [--threshold 0.2]
+
+Cases (timings in ms: median, min, p95 over --repeat runs after a warm-up):
+
+    layout.suggest[FMT]             suggest_layouts, every entry in FORMATS
+    layout.suggest_validated[FMT]   ... with compliance + autofix + ranking
+    compliance[N]                   check_compliance(ocr=False), N elements
+    compliance.text_heavy           40 elements of 60-word copy, some banned
+    compliance.ocr[SIZE]            check_compliance(ocr=True), one packshot
+    autofix[N]                      apply_autofixes on the issues of compliance[N]
+    render[FMT.PNG|JPG]             render_canvas, 1k packshots, every format
+    render.packshot[SIZE]           render_canvas, SQUARE PNG, 256px to 8K packshot
+    export_batch                    POST /api/export/batch end to end
+
+The LLM is disabled (algorithmic layouts, fallback rewrites) so runs are
+offline and comparable. Packshots are ingested before timing, as in
+steady state. --quick drops the 8K packshot and uses fewer runs.
+
+Everything runs against a scratch data directory (--data-dir, default a
+temp dir). With --baseline, cases whose median is more than --threshold
+slower than the baseline (and by at least --min-delta-ms) are reported as
+regressions and the exit status is 1. Baselines are machine specific:
+record one with --out on the machine that compares against it.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+HEAVY_REPEAT = 5
+LIGHT_REPEAT = 20
+
+
+def timed(fn: Callable[[], object], repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - started) * 1000)
+    runs.sort()
+    return {
+        "median_ms": round(statistics.median(runs), 3),
+        "min_ms": round(runs[0], 3),
+        "p95_ms": round(runs[min(len(runs) - 1, int(len(runs) * 0.95))], 3),
+        "runs": repeat,
+    }
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], threshold: float, min_delta_ms: float) -> List[dict]:
+    """Per case present in both: median ratio and whether it regressed."""
+    rows = []
+    for name in sorted(set(current) & set(baseline)):
+        cur, base = current[name]["median_ms"], baseline[name]["median_ms"]
+        ratio = cur / base if base > 0 else float("inf")
+        rows.append({
+            "case": name,
+            "baseline_ms": base,
+            "current_ms": cur,
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1 + threshold and cur - base >= min_delta_ms,
+        })
+    return rows
+
+
+def run(args: argparse.Namespace) -> dict:
+    # App modules read their settings at import time, after main() set the environment
+    sys.path.insert(0, str(REPO_ROOT))
+    from scripts.generate_demo_assets import PACKSHOT_SIZES, make_benchmark_packshots, synthetic_canvas, synthetic_copy
+
+    from fastapi.testclient import TestClient
+
+    from app.config import ASSETS_DIR, FORMATS
+    from app.main import app
+    from app.models.schemas import Canvas
+    from app.services.asset_store import ASSET_URL_PREFIX
+    from app.services.autofix import apply_autofixes
+    from app.services.compliance_engine import check_compliance
+    from app.services.exporter import render_canvas
+    from app.services.ingest import ensure_record
+    from app.services.layout_engine import suggest_layouts
+
+    heavy = 3 if args.quick else (args.repeat or HEAVY_REPEAT)
+    light = 5 if args.quick else (args.repeat or LIGHT_REPEAT)
+    sizes = [s for s in PACKSHOT_SIZES if not (args.quick and s == "8k")]
+
+    print(f"Generating packshots ({', '.join(sizes)}) ...", file=sys.stderr)
+    files = make_benchmark_packshots(ASSETS_DIR, args.seed, sizes)
+    for name in files.values():
+        ensure_record(ASSETS_DIR / name, wait=True)
+    urls = {label: f"{ASSET_URL_PREFIX}{name}" for label, name in files.items()}
+
+    rnd = random.Random(args.seed)
+    headline, subhead, value = synthetic_copy(rnd, 4), synthetic_copy(rnd, 8), "2 for 1"
+    packshots = [urls["1k"], urls["256"]]
+    results: Dict[str, dict] = {}
+
+    def bench(name: str, fn: Callable[[], object], repeat: int) -> None:
+        results[name] = timed(fn, repeat)
+        print(f"{name:40s} {results[name]['median_ms']:10.2f} ms", file=sys.stderr)
+
+    for fmt in FORMATS:
+        bench(f"layout.suggest[{fmt}]", lambda: suggest_layouts(fmt, headline, subhead, value, urls["256"], packshots), light)
+        bench(f"layout.suggest_validated[{fmt}]",
+              lambda: suggest_layouts(fmt, headline, subhead, value, urls["256"], packshots, validate=True), light)
+
+    square = FORMATS["SQUARE"]
+    for n in (10, 100, 1000):
+        canvas = Canvas.model_validate(synthetic_canvas(random.Random(f"{args.seed}:{n}"), "SQUARE", square, n, packshots, banned_ratio=0.1))
+        bench(f"compliance[{n}]", lambda: check_compliance(canvas, ocr=False), heavy if n == 1000 else light)
+        issues = check_compliance(canvas, ocr=False)
+        bench(f"autofix[{n}]", lambda: apply_autofixes(canvas, issues), heavy if n == 1000 else light)
+
+    text_heavy = Canvas.model_validate(
+        synthetic_canvas(random.Random(f"{args.seed}:text"), "SQUARE", square, 40, [], words=60, banned_ratio=0.3)
+    )
+    bench("compliance.text_heavy", lambda: check_compliance(text_heavy, ocr=False), light)
+
+    for label in sizes:
+        one = Canvas.model_validate({
+            "format": "SQUARE", "width": square[0], "height": square[1],
+            "elements": [{"id": "pack", "type": "packshot", "src": urls[label],
+                          "bounds": {"x": 200, "y": 200, "width": 680, "height": 680}}],
+        })
+        bench(f"compliance.ocr[{label}]", lambda: check_compliance(one, ocr=True), heavy)
+        bench(f"render.packshot[{label}]", lambda: render_canvas(one, "PNG"), heavy)
+
+    for fmt, size in FORMATS.items():
+        canvas = Canvas.model_validate(synthetic_canvas(random.Random(f"{args.seed}:{fmt}"), fmt, size, 12, packshots))
+        for out in ("PNG", "JPG"):
+            bench(f"render[{fmt}.{out}]", lambda: render_canvas(canvas, out), heavy)
+
+    client = TestClient(app)
+    batch = {"format": "SQUARE", "headline": headline, "subhead": subhead, "value_text": value,
+             "logo": urls["256"], "packshots": packshots}
+
+    def export_batch():
+        res = client.post("/api/export/batch", json=batch)
+        res.raise_for_status()
+
+    bench("export_batch", export_batch, heavy)
+
+    try:
+        import pytesseract  # noqa: F401
+        ocr_available = True
+    except ImportError:
+        ocr_available = False
+    from PIL import __version__ as pillow_version
+
+    return {
+        "meta": {
+            "seed": args.seed,
+            "quick": args.quick,
+            "created_at": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pillow": pillow_version,
+            "ocr_available": ocr_available,
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks for layout, compliance, render and batch export.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="Fewer runs, no 8K packshot")
+    parser.add_argument("--repeat", type=int, help="Runs per case (overrides the defaults)")
+    parser.add_argument("--data-dir", type=Path, help="Scratch data directory (default: a temp dir)")
+    parser.add_argument("--out", type=Path, help="Write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="Results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown of the median (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    scratch = args.data_dir or Path(tempfile.mkdtemp(prefix="airc-bench-"))
+    os.environ["AIRC_DATA_DIR"] = str(scratch / "data")
+    os.environ["AIRC_STATIC_DIR"] = str(scratch / "static")
+    os.environ["AIRC_LLM_ENABLED"] = "0"
+    # Jobs and thumbnails stay in-process
+    os.environ.setdefault("AIRC_JOB_EXECUTOR", "thread")
+
+    report = run(args)
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wrote {args.out}", file=sys.stderr)
+    if not args.baseline:
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    rows = compare(report["results"], baseline["results"], args.threshold, args.min_delta_ms)
+    regressions = [r for r in rows if r["regression"]]
+    print(f"\n{'case':40s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for r in rows:
+        flag = "  REGRESSION" if r["regression"] else ""
+        print(f"{r['case']:40s} {r['baseline_ms']:10.2f} {r['current_ms']:10.2f} {r['ratio']:7.2f}{flag}")
+    print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%} in {len(rows)} compared case(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
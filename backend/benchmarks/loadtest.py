@@ -0,0 +1,379 @@
+"""
+Open-loop load generator for the API. Run from backend/:
+
+    python -m benchmarks.loadtest --rates 1,2,4,8 --duration 30 [--out load.json]
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --rates 2,4,8
+
+By default the app runs in this process behind httpx's ASGI transport, on a
+scratch data dir, with the LLM disabled (--llm standin serves it from
+app.services.llm_standin with --llm-latency instead). Sync endpoints run
+on the same AnyIO threadpool as under uvicorn, so this is one worker; the
+generator shares its CPU, which makes the numbers slightly pessimistic.
+With --url it drives a running server (start it with `uvicorn
+app.main:app --workers 1` and whatever LLM settings you want measured).
+
+Sessions arrive as a Poisson process at each rate in --rates (sessions
+per second), whether or not earlier ones have finished: open loop, so a
+saturated server shows up as growing latency and backlog instead of the
+generator slowing down. Scenario mix (--mix, weights):
+
+    editor    suggest -> compliance check -> autofix -> export (PNG or JPG)
+    autosave  PATCH of one of the seeded projects (base_version tracked,
+              one editor per project)
+    batch     /export/batch with X-AIRC-Priority: batch
+
+Per rate and route: requests, throughput, p50/p95/p99, errors (exceptions
+and 5xx other than 503) and 503 rejections from admission control. A rate
+is saturated when fewer than 90% of its sessions complete within the
+step, errors + rejections exceed 1% of requests, or a route's p99 passes
+--slo-ms. The highest unsaturated rate is reported as the capacity.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SCENARIOS = ("editor", "autosave", "batch")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r} (expected one of {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    """Latencies and outcomes per route label for one rate step."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.sessions: Counter = Counter()
+
+    async def call(self, client, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            res = await client.request(method, url, **kwargs)
+        except Exception as e:
+            self.statuses[label][type(e).__name__] += 1
+            return None
+        self.latencies[label].append((time.perf_counter() - started) * 1000)
+        self.statuses[label][res.status_code] += 1
+        return res if res.status_code < 400 else None
+
+    def report(self, elapsed: float, slo_ms: float) -> Dict[str, dict]:
+        routes = {}
+        for label in sorted(set(self.latencies) | set(self.statuses)):
+            lat = sorted(self.latencies[label])
+            statuses = self.statuses[label]
+            total = sum(statuses.values())
+            rejected = statuses.get(503, 0)
+            errors = sum(n for s, n in statuses.items() if not isinstance(s, int) or (s >= 500 and s != 503))
+            routes[label] = {
+                "requests": total,
+                "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(lat, 0.50), 1),
+                "p95_ms": round(percentile(lat, 0.95), 1),
+                "p99_ms": round(percentile(lat, 0.99), 1),
+                "mean_ms": round(statistics.fmean(lat), 1) if lat else 0.0,
+                "errors": errors,
+                "rejected_503": rejected,
+                "statuses": {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+                "over_slo": percentile(lat, 0.99) > slo_ms,
+            }
+        return routes
+
+
+class Workload:
+    """Payloads and per-project state shared by all sessions of a run."""
+
+    def __init__(self, rnd: random.Random, packshots: List[str], logo: str, projects: List[str]):
+        sys.path.insert(0, str(REPO_ROOT))
+        from scripts.generate_demo_assets import synthetic_copy
+
+        self.rnd = rnd
+        self.copy = synthetic_copy
+        self.packshots = packshots
+        self.logo = logo
+        self.projects = projects
+        self.versions = {p: 1 for p in projects}
+        self.locks = {p: asyncio.Lock() for p in projects}
+        self._next_project = 0
+
+    def suggest_payload(self, fmt: Optional[str] = None) -> dict:
+        rnd = self.rnd
+        return {
+            "format": fmt or rnd.choice(["SQUARE", "FB_STORY", "LANDSCAPE", "CHECKOUT"]),
+            "headline": self.copy(rnd, rnd.randint(2, 6)),
+            "subhead": self.copy(rnd, rnd.randint(4, 12)),
+            "value_text": rnd.choice(["2 for 1", "New", "Only at Tesco", None]),
+            "logo": self.logo,
+            "packshots": rnd.sample(self.packshots, rnd.randint(1, len(self.packshots))),
+        }
+
+    def next_project(self) -> str:
+        project = self.projects[self._next_project % len(self.projects)]
+        self._next_project += 1
+        return project
+
+
+async def editor_session(client, rec: Recorder, work: Workload) -> bool:
+    res = await rec.call(client, "POST /layout/suggest", "POST", "/api/layout/suggest", json=work.suggest_payload())
+    if res is None:
+        return False
+    canvas = res.json()["candidates"][0]
+    if await rec.call(client, "POST /compliance/check", "POST", "/api/compliance/check", json={"canvas": canvas}) is None:
+        return False
+    res = await rec.call(client, "POST /compliance/autofix", "POST", "/api/compliance/autofix", json={"canvas": canvas})
+    if res is None:
+        return False
+    payload = {"canvas": res.json(), "output_format": work.rnd.choice(["PNG", "JPG"])}
+    return await rec.call(client, "POST /export/image", "POST", "/api/export/image", json=payload) is not None
+
+
+async def autosave_session(client, rec: Recorder, work: Workload) -> bool:
+    project = work.next_project()
+    async with work.locks[project]:
+        ops = [
+            {"op": "replace", "path": "/elements/0/bounds/x", "value": work.rnd.randint(100, 400)},
+            {"op": "replace", "path": "/elements/0/text", "value": work.copy(work.rnd, work.rnd.randint(2, 6))},
+        ]
+        body = {"base_version": work.versions[project], "ops": ops}
+        res = await rec.call(client, "PATCH /projects/{id}", "PATCH", f"/api/projects/{project}", json=body)
+        if res is None:
+            return False
+        data = res.json()
+        if "version" not in data:
+            return False
+        work.versions[project] = data["version"]
+        return True
+
+
+async def batch_session(client, rec: Recorder, work: Workload) -> bool:
+    payload = work.suggest_payload("SQUARE")
+    headers = {"X-AIRC-Priority": "batch"}
+    return await rec.call(client, "POST /export/batch", "POST", "/api/export/batch", json=payload, headers=headers) is not None
+
+
+SESSION_FNS = {"editor": editor_session, "autosave": autosave_session, "batch": batch_session}
+
+
+async def setup(client, rnd: random.Random, projects: int) -> Workload:
+    """Uploads synthetic packshots (waiting for ingestion) and seeds the autosave projects."""
+    sys.path.insert(0, str(REPO_ROOT))
+    from scripts.generate_demo_assets import PACKSHOT_SIZES, synthetic_canvas, synthetic_packshot
+
+    from io import BytesIO
+
+    files = []
+    for label in ("256", "1k", "2k"):
+        buf = BytesIO()
+        synthetic_packshot(PACKSHOT_SIZES[label], random.Random(f"load:{label}")).save(buf, format="PNG")
+        files.append(("files", (f"load_{label}.png", buf.getvalue(), "image/png")))
+    res = await client.post("/api/uploads/assets", files=files)
+    res.raise_for_status()
+    urls = res.json()["files"]
+    for url in urls:
+        (await client.get(f"/api/uploads/assets/{url.rsplit('/', 1)[-1]}/meta")).raise_for_status()
+
+    names = [f"loadtest-{i}" for i in range(projects)]
+    for name in names:
+        canvas = synthetic_canvas(random.Random(name), "SQUARE", (1080, 1080), 8, urls[:1])
+        (await client.post(f"/api/projects/{name}", json=canvas)).raise_for_status()
+    work = Workload(rnd, urls[1:], urls[0], names)
+    for name in names:
+        res = await client.get(f"/api/projects/{name}")
+        work.versions[name] = int(res.headers.get("X-Project-Version", "1"))
+    return work
+
+
+async def run_rate(client, work: Workload, rate: float, duration: float, mix: Dict[str, float],
+                   max_inflight: int, drain_s: float, slo_ms: float) -> dict:
+    loop = asyncio.get_running_loop()
+    rec = Recorder()
+    names, weights = list(mix), list(mix.values())
+    tasks = set()
+    offered = dropped = completed = failed = 0
+
+    async def session(name: str) -> None:
+        nonlocal completed, failed
+        ok = await SESSION_FNS[name](client, rec, work)
+        rec.sessions[f"{name}:{'ok' if ok else 'failed'}"] += 1
+        if ok:
+            completed += 1
+        else:
+            failed += 1
+
+    start = loop.time()
+    next_at = start
+    while True:
+        next_at += work.rnd.expovariate(rate)
+        if next_at - start > duration:
+            break
+        await asyncio.sleep(max(0.0, next_at - loop.time()))
+        offered += 1
+        if len(tasks) >= max_inflight:
+            dropped += 1
+            continue
+        task = asyncio.create_task(session(work.rnd.choices(names, weights)[0]))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    backlog = len(tasks)
+    if tasks:
+        await asyncio.wait(set(tasks), timeout=drain_s)
+    unfinished = len(tasks)
+    for task in list(tasks):
+        task.cancel()
+    elapsed = loop.time() - start
+
+    routes = rec.report(elapsed, slo_ms)
+    requests = sum(r["requests"] for r in routes.values())
+    bad = sum(r["errors"] + r["rejected_503"] for r in routes.values())
+    reasons = []
+    if offered and completed + failed < 0.9 * offered:
+        reasons.append("sessions_not_completed")
+    if requests and bad > 0.01 * requests:
+        reasons.append("errors_or_rejections")
+    reasons += [f"p99_over_slo:{label}" for label, r in routes.items() if r["over_slo"]]
+    return {
+        "rate": rate,
+        "elapsed_s": round(elapsed, 2),
+        "sessions": {
+            "offered": offered,
+            "completed": completed,
+            "failed": failed,
+            "dropped": dropped,
+            "backlog_at_end": backlog,
+            "unfinished": unfinished,
+            "throughput_per_s": round(completed / elapsed, 2) if elapsed else 0.0,
+            "by_scenario": dict(rec.sessions),
+        },
+        "requests": requests,
+        "routes": routes,
+        "saturated": bool(reasons),
+        "saturation_reasons": reasons,
+    }
+
+
+def print_step(step: dict) -> None:
+    s = step["sessions"]
+    flag = "SATURATED " + ", ".join(step["saturation_reasons"]) if step["saturated"] else "ok"
+    print(f"\nrate {step['rate']:g}/s: {s['completed']}/{s['offered']} sessions, "
+          f"{s['throughput_per_s']}/s done, backlog {s['backlog_at_end']}  [{flag}]")
+    print(f"  {'route':26s} {'reqs':>6s} {'rps':>7s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'err':>5s} {'503':>5s}")
+    for label, r in step["routes"].items():
+        print(f"  {label:26s} {r['requests']:6d} {r['throughput_rps']:7.2f} {r['p50_ms']:8.1f} "
+              f"{r['p95_ms']:8.1f} {r['p99_ms']:8.1f} {r['errors']:5d} {r['rejected_503']:5d}")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    import httpx
+
+    mix = parse_mix(args.mix)
+    rnd = random.Random(args.seed)
+    timeout = httpx.Timeout(args.timeout)
+    async with AsyncExitStack() as stack:
+        if args.url:
+            client = await stack.enter_async_context(httpx.AsyncClient(base_url=args.url, timeout=timeout))
+        else:
+            from app.main import app
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app)
+            client = await stack.enter_async_context(
+                httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout)
+            )
+        work = await setup(client, rnd, args.projects)
+        steps = []
+        for rate in args.rates:
+            step = await run_rate(client, work, rate, args.duration, mix, args.max_inflight, args.drain, args.slo_ms)
+            print_step(step)
+            steps.append(step)
+    capacity = max((s["rate"] for s in steps if not s["saturated"]), default=None)
+    return {
+        "meta": {
+            "target": args.url or "asgi",
+            "llm": args.llm if not args.url else "server-configured",
+            "mix": mix,
+            "duration_s": args.duration,
+            "seed": args.seed,
+            "slo_ms": args.slo_ms,
+            "cpu_count": os.cpu_count(),
+            "created_at": time.time(),
+        },
+        "steps": steps,
+        "capacity_sessions_per_s": capacity,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Open-loop load test for the AIRC API.")
+    parser.add_argument("--url", help="Drive a running server instead of the in-process app")
+    parser.add_argument("--rates", type=lambda s: [float(r) for r in s.split(",")], default=[1.0, 2.0, 4.0],
+                        help="Session arrival rates per second, one step each")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of arrivals per rate")
+    parser.add_argument("--mix", default="editor=0.6,autosave=0.35,batch=0.05")
+    parser.add_argument("--projects", type=int, default=32, help="Projects seeded for autosave sessions")
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="p99 above this marks a rate as saturated")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="Sessions in flight before new arrivals are dropped")
+    parser.add_argument("--drain", type=float, default=30.0, help="Seconds to let a step's sessions finish")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout")
+    parser.add_argument("--llm", choices=["off", "standin"], default="off", help="In-process mode only")
+    parser.add_argument("--llm-latency", default="lognormal:5.5,0.4", help="Stand-in latency spec (see llm_standin)")
+    parser.add_argument("--data-dir", type=Path, help="Scratch data directory for in-process mode (default: temp dir)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    if not args.url:
+        scratch = args.data_dir or Path(tempfile.mkdtemp(prefix="airc-load-"))
+        os.environ["AIRC_DATA_DIR"] = str(scratch / "data")
+        os.environ["AIRC_STATIC_DIR"] = str(scratch / "static")
+        if args.llm == "standin":
+            from app.services.llm_standin import StandinConfig, start_standin
+
+            server, url = start_standin(StandinConfig(latency=args.llm_latency, seed=args.seed))
+            os.environ["AIRC_LLM_ENDPOINT"] = url
+            os.environ["AIRC_LLM_ENABLED"] = "1"
+        else:
+            os.environ["AIRC_LLM_ENABLED"] = "0"
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    cap = report["capacity_sessions_per_s"]
+    print(f"\ncapacity: {cap:g} sessions/s" if cap is not None else "\ncapacity: saturated at every rate")
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# Keep uploads, caches and project stores written by tests out of the repo tree.
+# Must run before app.config is imported.
+_tmp = tempfile.mkdtemp(prefix="airc-tests-")
+os.environ.setdefault("AIRC_DATA_DIR", os.path.join(_tmp, "data"))
+os.environ.setdefault("AIRC_STATIC_DIR", os.path.join(_tmp, "static"))
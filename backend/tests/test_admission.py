@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import admission
+from app.services.admission import BATCH, INTERACTIVE, Overloaded, WorkloadGate
+
+
+def _hold(gate, priority, order, started, release):
+    def run():
+        with gate.acquire(priority):
+            order.append(priority)
+            started.set()
+            release.wait(5)
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+
+def test_gate_queue_limits_and_deadline():
+    gate = WorkloadGate("t", budget=1, max_queue=1, deadline_s=0.1)
+    release = threading.Event()
+    started = threading.Event()
+    holder = _hold(gate, INTERACTIVE, [], started, release)
+    started.wait(5)
+
+    with pytest.raises(Overloaded) as exc:
+        with gate.acquire():
+            pass
+    assert exc.value.reason == "deadline" and exc.value.retry_after >= 1
+
+    # One waiter fills the queue; the next caller is turned away at once
+    def wait_briefly():
+        try:
+            with gate.acquire(deadline_s=0.5):
+                pass
+        except Overloaded:
+            pass
+
+    waiter = threading.Thread(target=wait_briefly)
+    waiter.start()
+    time.sleep(0.05)
+    with pytest.raises(Overloaded) as exc:
+        with gate.acquire():
+            pass
+    assert exc.value.reason == "queue_full"
+    waiter.join()
+    release.set()
+    holder.join()
+    stats = gate.stats()
+    assert stats["rejected_deadline"] == 2 and stats["rejected_queue_full"] == 1 and stats["in_use"] == 0
+
+
+def test_interactive_waiters_go_first():
+    gate = WorkloadGate("t", budget=1, max_queue=8, deadline_s=5)
+    order = []
+    release = threading.Event()
+    holder = _hold(gate, INTERACTIVE, order, threading.Event(), release)
+    time.sleep(0.05)
+    done = threading.Event()
+    done.set()
+    batch = _hold(gate, BATCH, order, threading.Event(), done)
+    time.sleep(0.05)
+    interactive = _hold(gate, INTERACTIVE, order, threading.Event(), done)
+    time.sleep(0.05)
+    release.set()
+    for t in (holder, batch, interactive):
+        t.join()
+    assert order == [INTERACTIVE, INTERACTIVE, BATCH]
+
+
+def test_overloaded_render_returns_503(monkeypatch):
+    gate = WorkloadGate("render", budget=1, max_queue=0)
+    monkeypatch.setitem(admission._gates, "render", gate)
+    canvas = {"format": "SQUARE", "width": 100, "height": 100, "elements": []}
+    with gate.acquire():
+        r = TestClient(app).post("/api/export/image", json={"canvas": canvas})
+    assert r.status_code == 503
+    assert int(r.headers["Retry-After"]) >= 1
+    assert r.json()["workload"] == "render"
+
+
+def test_ocr_reads_uploaded_assets_within_the_ocr_budget(monkeypatch):
+    from PIL import Image
+
+    from app.config import ASSETS_DIR
+    from app.models.schemas import Canvas
+    from app.services import compliance_engine
+
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (40, 30), (12, 34, 56)).save(ASSETS_DIR / "ocr-label.png")
+    read = []
+    monkeypatch.setattr(compliance_engine, "ocr_available", lambda: True)
+    monkeypatch.setattr(compliance_engine, "ocr_text_from_bytes", lambda data: read.append(len(data)) or "WIN a FREE trip")
+    canvas = Canvas.model_validate({"format": "SQUARE", "width": 1080, "height": 1080, "elements": [
+        {"id": "p1", "type": "packshot", "src": "/static/assets/ocr-label.png",
+         "bounds": {"x": 300, "y": 300, "width": 200, "height": 200}},
+    ]})
+
+    # The /static/assets/ URL resolves to the upload, which is recognised once
+    for _ in range(2):
+        codes = [i.code for i in compliance_engine.check_compliance(canvas)]
+        assert "BANNED_COPY_OCR" in codes
+    assert len(read) == 1
+    assert "BANNED_COPY_OCR" not in [i.code for i in compliance_engine.check_compliance(canvas, ocr=False)]
+
+    Image.new("RGB", (40, 30), (65, 43, 21)).save(ASSETS_DIR / "ocr-label.png")
+    gate = WorkloadGate("ocr", budget=1, max_queue=0)
+    monkeypatch.setitem(admission._gates, "ocr", gate)
+    with gate.acquire(), pytest.raises(Overloaded):
+        compliance_engine.check_compliance(canvas)
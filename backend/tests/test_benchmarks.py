@@ -0,0 +1,53 @@
+import random
+import sys
+
+from app.models.schemas import Canvas
+from benchmarks.bench_pipelines import REPO_ROOT, compare
+
+sys.path.insert(0, str(REPO_ROOT))
+from scripts.generate_demo_assets import synthetic_canvas  # noqa: E402
+
+
+def test_synthetic_canvases_are_seeded_and_valid():
+    make = lambda seed: synthetic_canvas(random.Random(seed), "SQUARE", (1080, 1080), 50, ["/static/assets/a.png"], banned_ratio=0.2)
+    assert make(1) == make(1)
+    assert make(1) != make(2)
+    canvas = Canvas.model_validate(make(1))
+    assert len(canvas.elements) == 50
+    assert {el.type for el in canvas.elements} >= {"text", "value_tile", "image", "packshot"}
+
+
+def test_compare_flags_regressions_past_threshold():
+    base = {"a": {"median_ms": 10.0}, "b": {"median_ms": 10.0}, "c": {"median_ms": 0.1}, "gone": {"median_ms": 1.0}}
+    cur = {"a": {"median_ms": 11.0}, "b": {"median_ms": 13.0}, "c": {"median_ms": 0.5}, "new": {"median_ms": 1.0}}
+    rows = {r["case"]: r for r in compare(cur, base, threshold=0.2, min_delta_ms=1.0)}
+    assert set(rows) == {"a", "b", "c"}
+    assert [name for name, r in rows.items() if r["regression"]] == ["b"]  # c is 5x slower but under 1 ms
+
+
+def test_loadtest_step_reports_percentiles_per_route():
+    import asyncio
+
+    import httpx
+    import pytest
+
+    from app.main import app
+    from benchmarks.loadtest import parse_mix, percentile, run_rate, setup
+
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 0.5) == 3.0
+    with pytest.raises(ValueError):
+        parse_mix("editor=1,browse=1")
+
+    async def step():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            work = await setup(client, random.Random(0), projects=2)
+            return await run_rate(client, work, rate=20, duration=0.5, mix=parse_mix("autosave=1"),
+                                  max_inflight=100, drain_s=10, slo_ms=5000)
+
+    result = asyncio.run(step())
+    route = result["routes"]["PATCH /projects/{id}"]
+    assert result["sessions"]["completed"] == result["sessions"]["offered"] > 0
+    assert route["requests"] == result["sessions"]["offered"] and route["errors"] == 0
+    assert 0 < route["p50_ms"] <= route["p99_ms"]
+    assert not result["saturated"]
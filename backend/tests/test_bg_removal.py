@@ -0,0 +1,34 @@
+from PIL import Image, ImageDraw
+
+from app.services.bg_removal import background_alpha
+
+
+def test_enclosed_white_label_survives_background_removal():
+    img = Image.new("RGBA", (300, 200), (250, 250, 250, 255))
+    d = ImageDraw.Draw(img)
+    d.rectangle([60, 40, 240, 160], fill=(20, 60, 160, 255))  # product
+    d.rectangle([100, 80, 200, 120], fill=(255, 255, 255, 255))  # white label inside it
+
+    alpha = background_alpha(img, feather=0)
+
+    assert alpha.getpixel((5, 5)) == 0  # backdrop removed
+    assert alpha.getpixel((70, 50)) == 255  # product kept
+    assert alpha.getpixel((150, 100)) == 255  # label kept, unlike a global white threshold
+
+
+def test_tiled_result_matches_untiled(monkeypatch):
+    from app.services import bg_removal
+
+    img = Image.new("RGBA", (400, 260), (245, 245, 240, 255))
+    d = ImageDraw.Draw(img)
+    d.ellipse([50, 30, 330, 230], fill=(180, 40, 40, 255))
+    d.rectangle([120, 100, 260, 150], fill=(250, 250, 250, 255))
+    d.rectangle([340, 0, 360, 259], fill=(30, 30, 30, 255))  # splits the backdrop in two
+
+    monkeypatch.setattr(bg_removal, "TILE_SIZE", 10_000)
+    whole = background_alpha(img, feather=1.5)
+    monkeypatch.setattr(bg_removal, "TILE_SIZE", 64)
+    tiled = background_alpha(img, feather=1.5)
+
+    assert whole.getpixel((5, 5)) == 0 and whole.getpixel((390, 130)) == 0 and whole.getpixel((190, 125)) == 255
+    assert tiled.tobytes() == whole.tobytes()
@@ -0,0 +1,63 @@
+import io
+import json
+import random
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import bulk_copy
+from app.services.bulk_copy import generate_bulk_copy, read_products
+
+client = TestClient(app)
+
+
+def _fake_batch(products):
+    time.sleep(random.random() / 100)  # batches finish out of order
+    return [
+        {"headline": f"{name} - win big", "subhead": "Fresh today", "value_text": "FREE delivery" if name.endswith("3") else "Tasty"}
+        for name, _ in products
+    ]
+
+
+def test_results_come_back_in_input_order_and_screened(monkeypatch):
+    monkeypatch.setattr(bulk_copy, "generate_ad_copy_batch", _fake_batch)
+    products = [{"product_name": f"p{i}", "topic": "food"} for i in range(40)]
+    results = list(generate_bulk_copy(iter(products), batch_size=3, concurrency=4))
+
+    assert [r["index"] for r in results] == list(range(40))
+    assert [r["product_name"] for r in results] == [p["product_name"] for p in products]
+    assert all("win" not in r["headline"].lower() for r in results)
+    assert results[3]["rewritten"] == ["headline", "value_text"] and "free" not in results[3]["value_text"].lower()
+    assert results[0]["rewritten"] == ["headline"] and results[0]["value_text"] == "Tasty"
+    assert all(r["still_banned"] == [] for r in results)
+
+
+def test_rewrites_that_still_match_are_flagged():
+    screened = bulk_copy.screen_copy({"headline": "Win big", "subhead": "Only 1.99 today", "value_text": "Tasty"})
+    assert screened["rewritten"] == ["headline"]
+    assert screened["still_banned"] == ["subhead"]
+    assert bulk_copy.banned_copy_pattern().search(screened["subhead"])
+
+
+def test_start_resumes_and_bad_rows_are_reported_in_place(monkeypatch):
+    monkeypatch.setattr(bulk_copy, "generate_ad_copy_batch", _fake_batch)
+    lines = '{"product_name": "a"}\n{not json\n[1, 2]\n{"name": 5}\n{"name": "b", "topic": "drinks"}\n{"topic": "x"}\n{"name": "c"}\n'
+    results = list(generate_bulk_copy(read_products(io.StringIO(lines), "jsonl"), batch_size=2, concurrency=2))
+    assert [(r["index"], r.get("product_name"), r.get("error", "")[:7]) for r in results] == [
+        (0, "a", ""), (1, None, "line 2:"), (2, None, "line 3:"), (3, None, "line 4:"), (4, "b", ""), (5, "c", ""),
+    ]
+    assert "expected a JSON object" in results[2]["error"]
+
+    resumed = list(generate_bulk_copy(read_products(io.StringIO(lines), "jsonl"), start=4, batch_size=2))
+    assert resumed == results[4:]
+
+
+def test_bulk_endpoint_streams_errors_without_breaking(monkeypatch):
+    monkeypatch.setattr(bulk_copy, "generate_ad_copy_batch", _fake_batch)
+    body = '{"name": "Bread"}\n{"name": "Milk",\n{"name": "Eggs", "topic": ""}\n'
+    res = client.post("/api/copy/bulk?start=1", files={"file": ("products.jsonl", body.encode(), "application/x-ndjson")})
+    assert res.status_code == 200
+    records = [json.loads(line) for line in res.text.splitlines()]
+    assert [r["index"] for r in records] == [1, 2]
+    assert "error" in records[0] and records[1]["product_name"] == "Eggs" and records[1]["topic"] == "general"
@@ -0,0 +1,95 @@
+import pytest
+
+from app.models.schemas import Format
+from app.services import campaign
+from app.services.campaign import CampaignCheckpoint, read_products, run_campaign
+
+
+def test_read_products_csv_and_jsonl():
+    products = read_products("id,headline,packshots,formats\nA,Hello,a.png; b.png,SQUARE|LANDSCAPE\n,World,,\n")
+    assert [p.id for p in products] == ["A", "2"]
+    assert products[0].packshots == ["a.png", "b.png"]
+    assert products[0].formats == [Format.SQUARE, Format.LANDSCAPE]
+    assert products[1].formats is None and products[1].packshots == []
+
+    products = read_products('{"id": "x", "headline": "Hi", "packshots": ["p.png"]}\n\n{"headline": "Yo"}\n', "jsonl")
+    assert [p.id for p in products] == ["x", "2"]
+    with pytest.raises(ValueError, match="duplicate id"):
+        read_products("id,headline\nA,one\nA,two\n")
+
+
+def test_interrupted_campaign_resumes_without_redoing_finished_items(tmp_path, monkeypatch):
+    products = read_products("id,headline,value_text\nbread,Fresh bread,Only 1.00\nmilk,Whole milk,\n")
+    checkpoint = CampaignCheckpoint(tmp_path / "campaigns.sqlite3")
+    render = campaign._STAGE_FUNCS["render"]
+    rendered = []
+
+    def flaky_render(item, options):
+        rendered.append(item.key)
+        if item.key == "milk:LANDSCAPE" and rendered.count(item.key) == 1:
+            raise OSError("disk full")
+        render(item, options)
+
+    monkeypatch.setitem(campaign._STAGE_FUNCS, "render", flaky_render)
+    formats = [Format.SQUARE, Format.LANDSCAPE]
+    first = run_campaign(products, formats=formats, checkpoint=checkpoint, workers={"render": 2})
+    assert (first["total"], first["done"], first["failed"]) == (4, 3, 1)
+    failed = [r for r in first["results"] if r["status"] == "failed"]
+    assert failed == [{"product": "milk", "format": "LANDSCAPE", "status": "failed", "error": "render: OSError: disk full"}]
+    assert first["stages"]["render"]["items"] == 4 and first["stages"]["render"]["errors"] == 1
+    assert set(first["stages"]) == {"layout", "compliance", "autofix", "render"}
+
+    second = run_campaign(products, formats=formats, checkpoint=checkpoint)
+    assert second["run_id"] == first["run_id"]
+    assert (second["resumed"], second["processed"], second["done"]) == (3, 1, 4)
+    assert sorted(rendered) == sorted(["bread:SQUARE", "bread:LANDSCAPE", "milk:SQUARE", "milk:LANDSCAPE", "milk:LANDSCAPE"])
+    assert all(r["url"].startswith("/static/exports/") for r in second["results"])
+    assert checkpoint.run(first["run_id"])["done"] == 4
+
+
+def test_worker_counts_are_capped_and_a_failing_checkpoint_stops_the_stages(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    monkeypatch.setattr(campaign, "MAX_STAGE_WORKERS", 2)
+    monkeypatch.setitem(campaign._STAGE_FUNCS, "render", lambda item, options: setattr(item, "result", {}))
+    products = read_products("id,headline\n" + "".join(f"p{i},Item {i}\n" for i in range(30)))
+    checkpoint = CampaignCheckpoint(tmp_path / "campaigns.sqlite3")
+    record = checkpoint.record
+    calls = []
+
+    def failing_record(*args):
+        calls.append(args)
+        if len(calls) == 3:
+            raise OSError("database is locked")
+        record(*args)
+
+    monkeypatch.setattr(checkpoint, "record", failing_record)
+    with pytest.raises(OSError, match="locked"):
+        run_campaign(products, formats=[Format.SQUARE], checkpoint=checkpoint, workers={"layout": 500, "render": 9})
+
+    deadline = time.monotonic() + 5
+    while any(t.name.startswith("campaign-") for t in threading.enumerate()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not any(t.name.startswith("campaign-") for t in threading.enumerate())
+    assert len(calls) == 3
+
+    report = run_campaign(products[:2], formats=[Format.SQUARE], checkpoint=CampaignCheckpoint(tmp_path / "b.sqlite3"),
+                          workers={"layout": 500})
+    assert report["stages"]["layout"]["workers"] == 2
+
+
+def test_campaign_without_llm_never_calls_it(tmp_path, monkeypatch):
+    from app.services import compliance_engine, layout_engine
+
+    calls = []
+    monkeypatch.setenv("AIRC_LLM_ENABLED", "1")
+    monkeypatch.setattr(compliance_engine, "suggest_compliant_rewrite", lambda text: calls.append(text) or "Tasty")
+    monkeypatch.setattr(layout_engine, "generate_layout_json", lambda *a: calls.append(a))
+    monkeypatch.setitem(campaign._STAGE_FUNCS, "render", lambda item, options: setattr(item, "result", {}))
+    products = read_products("id,headline,value_text\nx,Win a FREE hamper,Only 1.00\n")
+
+    report = run_campaign(products, formats=[Format.SQUARE], checkpoint=CampaignCheckpoint(tmp_path / "c.sqlite3"))
+    assert report["done"] == 1 and calls == []
+    run_campaign(products, formats=[Format.SQUARE], checkpoint=CampaignCheckpoint(tmp_path / "d.sqlite3"), use_llm=True)
+    assert calls
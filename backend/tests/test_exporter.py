@@ -0,0 +1,68 @@
+from PIL import Image
+
+from app.models.schemas import Canvas, Format, ImageElement, Rect, RGBA
+from app.services.exporter import fit_geometry, render_canvas
+from app.services.ingest import ingest_asset
+
+
+def test_fit_geometry_modes():
+    # 200x100 content into a 100x100 box
+    box, size, offset = fit_geometry((0, 0, 200, 100), (100, 100), "contain", "center")
+    assert size == (100, 50) and offset == (0, 25)
+    _, _, offset = fit_geometry((0, 0, 200, 100), (100, 100), "contain", "bottom")
+    assert offset == (0, 50)
+    box, size, offset = fit_geometry((0, 0, 200, 100), (100, 100), "cover", "left")
+    assert size == (100, 100) and box == (0, 0, 100, 100)
+    box, size, _ = fit_geometry((10, 10, 50, 30), (100, 100), "stretch")
+    assert box == (10, 10, 50, 30) and size == (100, 100)
+
+
+def _packshot(path):
+    # Red 100x50 product on a white backdrop with generous padding
+    img = Image.new("RGB", (400, 300), (255, 255, 255))
+    img.paste((200, 0, 0), (150, 125, 250, 175))
+    img.save(path)
+    return path
+
+
+def _canvas(src, **fit):
+    el = ImageElement(id="p", type="packshot", src=str(src), bounds=Rect(x=0, y=0, width=200, height=200), **fit)
+    return Canvas(format=Format.SQUARE, width=200, height=200, background_color=RGBA(r=0, g=0, b=255, a=1), elements=[el])
+
+
+def test_render_contains_trimmed_packshot(tmp_path):
+    src = _packshot(tmp_path / "shot.png")
+    record = ingest_asset(src)
+    assert record["trim_bbox"][0] <= 150 and record["trim_bbox"][2] >= 250
+
+    out = Image.open(render_canvas(_canvas(src))).convert("RGB")
+    # Trimmed product (2:1) fills the width; blue background shows above and below
+    assert out.getpixel((100, 100))[0] > 150
+    assert out.getpixel((5, 100))[0] > 150
+    assert out.getpixel((100, 5)) == (0, 0, 255)
+
+    stretched = Image.open(render_canvas(_canvas(src, keep_aspect=False))).convert("RGB")
+    assert stretched.getpixel((100, 5))[0] > 150
+
+
+def test_render_before_ingestion_frames_like_the_record(tmp_path):
+    from PIL import ImageChops, ImageOps
+
+    from app.services.exporter import compose_canvas
+    from app.services.ingest import get_record, submit_ingest, trim_box
+
+    # Large enough that the trim box is measured on a reduced level
+    img = Image.new("RGB", (2400, 1800), (250, 250, 250))
+    img.paste((200, 0, 0), (900, 750, 1500, 1050))
+    src = tmp_path / "big.jpg"
+    img.save(src, quality=95)
+
+    assert get_record(src) is None
+    early = compose_canvas(_canvas(src))
+    record = submit_ingest(src).result()
+    with Image.open(src) as pic:
+        assert trim_box(ImageOps.exif_transpose(pic).convert("RGBA")) == record["trim_bbox"]
+    late = compose_canvas(_canvas(src))
+    # Same framing (only resampling noise differs): 2:1 product, background above and below
+    assert max(hi for _, hi in ImageChops.difference(early, late).getextrema()[:3]) < 40
+    assert early.getpixel((100, 30))[:3] == late.getpixel((100, 30))[:3] == (0, 0, 255)
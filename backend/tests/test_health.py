@@ -8,3 +8,23 @@ def test_health():
     assert res.status_code == 200
     data = res.json()
     assert data.get("status") == "ok"
+
+def test_import_defers_heavy_libraries():
+    import subprocess
+    import sys
+    code = "import sys, app.main; print(sorted(m for m in ('numpy', 'PIL.Image', 'pytesseract') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+def test_warmup_steps_are_timed_and_reported():
+    from app.services import startup
+    from app.services.exporter import _open_font
+
+    timings = startup.warmup(["imports", "fonts", "rules", "assets"])
+    assert {"warmup.imports", "warmup.fonts", "warmup.rules", "warmup.assets", "warmup"} <= set(timings)
+    assert _open_font.cache_info().currsize >= len(startup.WARM_FONT_SIZES)
+
+    data = client.get("/api/health/startup").json()
+    assert data["state"] == "done" and data["ready"]
+    assert "import" in data["timings_ms"] and "warmup.fonts" in data["timings_ms"]
+    assert 'airc_startup_seconds{phase="warmup.fonts"}' in client.get("/metrics").text
@@ -0,0 +1,93 @@
+import io
+import json
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.config import ASSETS_DIR
+from app.main import app
+from app.services import ingest
+from app.services.ingest import RECORD_VERSION, derived_dir, ensure_record, get_record, nearest_mip, submit_ingest
+
+client = TestClient(app)
+
+
+def _asset(name, size=(1000, 600), color=(30, 140, 60)):
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    path = ASSETS_DIR / name
+    Image.new("RGB", size, color).save(path)
+    return path
+
+
+def test_nearest_mip_picks_the_smallest_covering_level_and_falls_back():
+    src = _asset("mips.png")
+    # Not ingested yet: the original is used and ingestion is queued
+    assert nearest_mip(src, 200, 100) == (src, None)
+    record = ensure_record(src, wait=True)
+    assert [(m["width"], m["height"]) for m in record["mips"]] == [(1000, 600), (500, 300), (250, 150), (125, 75)]
+
+    path, level = nearest_mip(src, 200, 100)
+    assert (level["width"], level["height"]) == (250, 150) and path.name == level["file"]
+    assert nearest_mip(src, 2000, 2000)[1]["level"] == 0  # nothing covers it: the master
+    assert nearest_mip(src, 10, 10)[1]["level"] == 3
+
+    # A level evicted from disk falls back to the original (or waits for the rebuild)
+    path.unlink()
+    assert nearest_mip(src, 200, 100) == (src, None)
+    path, level = nearest_mip(src, 200, 100, wait=True)
+    assert level["width"] == 250 and path.exists()
+
+
+def test_concurrent_ingest_requests_share_one_job(monkeypatch):
+    src = _asset("coalesce.png", color=(200, 10, 10))
+    calls = []
+    real = ingest.ingest_asset
+
+    def slow_ingest(path, sha256=None):
+        calls.append(path)
+        time.sleep(0.1)
+        return real(path, sha256)
+
+    monkeypatch.setattr(ingest, "ingest_asset", slow_ingest)
+    futures = []
+    threads = [threading.Thread(target=lambda: futures.append(submit_ingest(src))) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({id(f) for f in futures}) == 1
+    assert futures[0].result()["width"] == 1000
+    assert len(calls) == 1
+    # Finished: the next request is a new job
+    submit_ingest(src).result()
+    assert len(calls) == 2
+
+
+def test_records_of_an_older_version_are_reingested():
+    src = _asset("versioned.png", color=(10, 10, 200))
+    record = ensure_record(src, wait=True)
+    meta = derived_dir(record["sha256"]) / "meta.json"
+    meta.write_text(json.dumps({**record, "version": RECORD_VERSION - 1, "trim_bbox": None}), encoding="utf-8")
+    with ingest._lock:
+        ingest._records.clear()
+
+    assert get_record(src) is None
+    fresh = ensure_record(src, wait=True)
+    assert fresh["version"] == RECORD_VERSION and fresh["trim_bbox"] is not None
+    assert json.loads(meta.read_text(encoding="utf-8"))["version"] == RECORD_VERSION
+
+
+def test_meta_route_waits_for_the_record():
+    buf = io.BytesIO()
+    Image.new("RGBA", (300, 200), (0, 0, 0, 0)).save(buf, format="PNG")
+    url = client.post("/api/uploads/assets", files=[("files", ("meta.png", buf.getvalue(), "image/png"))]).json()["files"][0]
+    name = url.rsplit("/", 1)[-1]
+
+    meta = client.get(f"/api/uploads/assets/{name}/meta").json()
+    assert (meta["width"], meta["height"], meta["has_alpha"]) == (300, 200, True)
+    assert meta["version"] == RECORD_VERSION and meta["mips"][0]["file"] == "master.png"
+    assert client.get("/api/uploads/assets/missing.png/meta").json() == {"error": "not_found"}
+    assert "sha256" not in client.get("/api/uploads/assets/..%2Fprojects.sqlite3/meta").json()
@@ -0,0 +1,72 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.jobs import JobQueue, JobStore
+
+client = TestClient(app)
+
+CANVAS = {
+    "format": "SQUARE",
+    "width": 1080,
+    "height": 1080,
+    "elements": [
+        {"id": "h", "type": "text", "text": "Win a free holiday", "font_size": 60,
+         "bounds": {"x": 200, "y": 200, "width": 680, "height": 100}},
+    ],
+}
+
+
+def _wait(job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_compliance_job_runs_in_worker_process():
+    r = client.post("/api/jobs", json={"kind": "compliance_check", "payload": {"canvas": CANVAS}})
+    job_id = r.json()["id"]
+    assert _wait(job_id)["status"] == "done"
+
+    result = client.get(f"/api/jobs/{job_id}/result").json()["result"]
+    assert result["passed"] is False
+    assert any("COPY" in i["code"] for i in result["issues"])
+
+    # A finished job's stream is a single done event
+    with client.stream("GET", f"/api/jobs/{job_id}/events") as resp:
+        body = "".join(resp.iter_text())
+    assert body.startswith("event: done")
+    assert json.loads(body.split("data: ", 1)[1])["status"] == "done"
+
+
+def test_job_submit_errors():
+    assert client.post("/api/jobs", json={"kind": "nope"}).json()["error"] == "unknown_kind"
+    assert client.post("/api/jobs", json={"kind": "export_image", "payload": {}}).json()["error"] == "invalid_payload"
+    assert client.get("/api/jobs/missing/result").json() == {"error": "not_found"}
+
+
+def test_claims_are_atomic_and_only_lost_jobs_are_recovered(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    job_id = store.create("compliance_check", {"canvas": CANVAS})
+    assert store.claim(job_id, "worker-a")
+    assert not store.claim(job_id, "worker-b")  # dispatched twice, runs once
+
+    lost_id = store.create("compliance_check", {"canvas": CANVAS})
+    assert store.claim(lost_id, "worker-c")
+    store._execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time() - 3600, lost_id))
+
+    # A process starting up fails the job whose worker stopped heartbeating, not the live one
+    JobQueue(store, workers=1, executor="thread").shutdown()
+    assert store.get(job_id)["status"] == "running"
+    assert store.get(lost_id)["status"] == "failed"
+
+    store.finish(job_id, "worker-b", {"stale": True})  # not the owner: ignored
+    assert store.get(job_id)["status"] == "running"
+    store.finish(job_id, "worker-a", {"ok": True})
+    assert store.get(job_id, with_result=True)["result"] == {"ok": True}
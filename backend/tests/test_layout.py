@@ -0,0 +1,82 @@
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def _events(body: str):
+    out = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def test_suggest_stream_emits_algorithmic_candidates(monkeypatch):
+    monkeypatch.setenv("AIRC_LLM_ENABLED", "0")
+    payload = {"format": "SQUARE", "headline": "Fresh bakes", "subhead": "Every morning"}
+    with client.stream("POST", "/api/layout/suggest/stream", json=payload) as res:
+        assert res.status_code == 200
+        assert res.headers["content-type"].startswith("text/event-stream")
+        events = _events(res.read().decode())
+
+    candidates = [data for name, data in events if name == "candidate"]
+    assert len(candidates) == 2
+    assert all(c["source"] == "algorithmic" for c in candidates)
+    assert candidates[0]["canvas"]["format"] == "SQUARE"
+    assert events[-1] == ("done", {"count": 2, "llm": "unavailable"})
+
+
+def test_suggest_validated_candidates_are_ranked(monkeypatch):
+    monkeypatch.setenv("AIRC_LLM_ENABLED", "0")
+    payload = {"format": "LANDSCAPE", "headline": "Win a FREE hamper", "validate_candidates": True}
+    res = client.post("/api/layout/suggest", json=payload)
+    assert res.status_code == 200
+    candidates = res.json()["candidates"]
+    assert len(candidates) == 2
+
+    reports = [c["metadata"]["compliance"] for c in candidates]
+    assert all(r["autofixed"] for r in reports)
+    assert [len(r["residual"]) for r in reports] == sorted(len(r["residual"]) for r in reports)
+    headline = next(e for e in candidates[0]["elements"] if e["id"] == "headline")
+    assert "free" not in headline["text"].lower()
+
+
+def test_validation_never_asks_the_llm_for_rewrites(monkeypatch):
+    from app.models.schemas import Format
+    from app.services import compliance_engine
+    from app.services.layout_engine import algorithmic_layouts, rank_candidates
+
+    calls = []
+    monkeypatch.setattr(compliance_engine, "suggest_compliant_rewrite", lambda text: calls.append(text) or "Tasty")
+    candidates = algorithmic_layouts(Format.SQUARE, "Win a FREE hamper", None, None, None, [])
+    ranked = rank_candidates(candidates)
+    assert calls == [] and all(c.metadata["compliance"]["autofixed"] for c in ranked)
+
+    # The interactive check still asks for a suggestion
+    issues = compliance_engine.check_compliance(candidates[0], ocr=False)
+    assert calls and next(i for i in issues if i.code == "BANNED_COPY").suggestion == "Tasty"
+
+
+def test_suggest_revalidates_with_etag(monkeypatch):
+    monkeypatch.setenv("AIRC_LLM_ENABLED", "0")
+    payload = {"format": "SQUARE", "headline": "Fresh bakes", "subhead": "Every morning"}
+    first = client.get("/api/layout/suggest", params=payload)
+    assert first.status_code == 200
+    assert len(first.json()["candidates"]) == 2
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+
+    again = client.get("/api/layout/suggest", params=payload, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    other = client.get("/api/layout/suggest", params={**payload, "headline": "Hot cross buns"}, headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["etag"] != etag
+
+    # POST is never answered with 304, whatever the client sends
+    posted = client.post("/api/layout/suggest", json=payload, headers={"If-None-Match": etag})
+    assert posted.status_code == 200 and posted.json() == first.json()
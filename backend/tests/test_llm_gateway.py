@@ -0,0 +1,129 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from app.services.llm_gateway import LLMGateway
+from app.services.shared_cache import SharedCache
+
+
+class _FakeModel:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def generate_content(self, parts):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        usage = SimpleNamespace(prompt_token_count=7, candidates_token_count=3)
+        return SimpleNamespace(text=f"echo:{parts[-1]}", usage_metadata=usage)
+
+
+def _gateway(tmp_path, monkeypatch, model):
+    monkeypatch.setenv("AIRC_LLM_ENABLED", "1")
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    gw = LLMGateway(cache=SharedCache(tmp_path))
+    monkeypatch.setattr(gw, "_model", lambda name: model)
+    return gw
+
+
+def test_gateway_caches_responses(tmp_path, monkeypatch):
+    model = _FakeModel()
+    gw = _gateway(tmp_path, monkeypatch, model)
+
+    assert gw.generate("hello") == "echo:hello"
+    assert gw.generate("hello") == "echo:hello"
+    assert model.calls == 1
+
+    # persisted: a fresh gateway on the same file does not call the model
+    gw2 = _gateway(tmp_path, monkeypatch, model)
+    assert gw2.generate("hello") == "echo:hello"
+    assert model.calls == 1
+
+    stats = gw.stats()
+    assert stats["cache_hits"] == 1 and stats["cache_misses"] == 1
+    assert stats["prompt_tokens"] == 7 and stats["output_tokens"] == 3
+
+
+def test_gateway_coalesces_concurrent_identical_prompts(tmp_path, monkeypatch):
+    monkeypatch.setenv("AIRC_LLM_CACHE_TTL", "0")
+    model = _FakeModel(delay=0.2)
+    gw = _gateway(tmp_path, monkeypatch, model)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gw.generate("same"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == ["echo:same"] * 5
+    assert model.calls == 1
+    assert gw.stats()["coalesced"] == 4
+
+
+def test_old_response_cache_is_moved_into_the_shared_cache(tmp_path):
+    from app.services.llm_gateway import CACHE_NAMESPACE, migrate_legacy_cache
+    from app.utils.sqlite import connect
+
+    old = tmp_path / "llm_cache.sqlite3"
+    conn = connect(old)
+    conn.execute("CREATE TABLE llm_cache (key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL, created_at REAL NOT NULL)")
+    conn.execute("INSERT INTO llm_cache VALUES ('fresh', 'm', 'kept', ?), ('stale', 'm', 'gone', 0)", (time.time(),))
+    conn.close()
+
+    cache = SharedCache(tmp_path / "shared")
+    assert migrate_legacy_cache(cache, old) == 1
+    assert cache.get(CACHE_NAMESPACE, "fresh") == b"kept" and cache.get(CACHE_NAMESPACE, "stale") is None
+    assert not list(tmp_path.glob("llm_cache.sqlite3*"))
+    assert migrate_legacy_cache(cache, old) == 0
+
+
+def test_async_clients_are_per_loop_and_closed_on_shutdown(tmp_path):
+    import asyncio
+    import gc
+
+    gw = LLMGateway(cache=SharedCache(tmp_path))
+
+    async def open_client():
+        client = gw._ahttp_client()
+        assert gw._ahttp_client() is client
+        return client
+
+    first = asyncio.run(open_client())
+    gc.collect()
+    assert len(gw._ahttp) == 0  # went with its loop, even if a new loop reuses its id
+    assert asyncio.run(open_client()) is not first
+
+    async def serve_and_stop():
+        client = gw._ahttp_client()
+        await gw.aclose()
+        return client
+
+    assert asyncio.run(serve_and_stop()).is_closed
+    assert len(gw._ahttp) == 0
+
+
+def test_async_generate_keeps_cache_work_off_the_event_loop(tmp_path, monkeypatch):
+    import asyncio
+
+    class _AsyncModel(_FakeModel):
+        async def generate_content_async(self, parts):
+            return self.generate_content(parts)
+
+    gw = _gateway(tmp_path, monkeypatch, _AsyncModel())
+    threads = []
+    for name in ("_cached", "_store"):
+        real = getattr(gw, name)
+        monkeypatch.setattr(gw, name, lambda *a, real=real: threads.append(threading.get_ident()) or real(*a))
+
+    async def run():
+        loop_thread = threading.get_ident()
+        first = await gw.agenerate("hello")
+        second = await gw.agenerate("hello")
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(run())
+    assert first == second == "echo:hello"
+    assert len(threads) == 3 and loop_thread not in threads
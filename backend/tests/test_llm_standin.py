@@ -0,0 +1,43 @@
+import json
+
+from app.services.llm_gateway import LLMGateway, prompt_key
+from app.services.llm_standin import StandinConfig, start_standin
+from app.services.shared_cache import SharedCache
+from app.services import llm_service
+
+
+def test_copy_generation_against_standin(tmp_path, monkeypatch):
+    record_file = tmp_path / "rec.jsonl"
+    server, url = start_standin(StandinConfig(latency="fixed:5"))
+    try:
+        monkeypatch.setenv("AIRC_LLM_ENDPOINT", url)
+        monkeypatch.setenv("AIRC_LLM_RECORD", str(record_file))
+        monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+        monkeypatch.setattr("app.services.llm_gateway._gateway", LLMGateway(cache=SharedCache(tmp_path)))
+
+        copy = llm_service.generate_ad_copy("Oat Crunch", "breakfast")
+        assert copy["headline"] == "Meet Oat Crunch"
+    finally:
+        server.shutdown()
+
+    rows = [json.loads(line) for line in record_file.read_text().splitlines()]
+    assert len(rows) == 1 and "Oat Crunch" in rows[0]["prompt"]
+
+
+def test_standin_replays_recordings_and_injects_errors(tmp_path, monkeypatch):
+    key = prompt_key("gemini-1.5-flash", ["hello"])
+    config = StandinConfig(recordings={key: {"key": key, "text": "recorded!"}}, synthetic=False)
+    server, url = start_standin(config)
+    try:
+        monkeypatch.setenv("AIRC_LLM_ENDPOINT", url)
+        monkeypatch.setenv("AIRC_LLM_CACHE_TTL", "0")
+        gw = LLMGateway(cache=SharedCache(tmp_path))
+
+        assert gw.generate("hello") == "recorded!"
+        assert gw.generate("never recorded") is None
+
+        config.error_rate = 1.0
+        assert gw.generate("hello") is None
+        assert gw.stats()["errors"] == 2
+    finally:
+        server.shutdown()
@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import metrics
+
+client = TestClient(app)
+
+
+def _canvas():
+    return {
+        "format": "SQUARE",
+        "width": 1080,
+        "height": 1080,
+        "elements": [
+            {"id": "headline", "type": "text", "text": "Fresh bakes", "font_size": 48,
+             "bounds": {"x": 120, "y": 200, "width": 800, "height": 120}},
+        ],
+    }
+
+
+def test_histogram_exposition():
+    h = metrics.Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 5.0):
+        h.observe(v, "x")
+    lines = h.lines()
+    assert 't_seconds_bucket{stage="x",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="x",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="x",le="+Inf"} 3' in lines
+    assert 't_seconds_count{stage="x"} 3' in lines
+
+
+def test_metrics_endpoint_reports_routes_and_stages():
+    before = metrics.STAGE_SECONDS.snapshot("encode") or {"count": 0}
+    assert client.post("/api/export/image", json={"canvas": _canvas()}).status_code == 200
+    assert client.post("/api/compliance/check", json={"canvas": _canvas()}).status_code == 200
+    assert metrics.STAGE_SECONDS.snapshot("encode")["count"] == before["count"] + 1
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = res.text
+    assert 'airc_http_request_duration_seconds_count{method="POST",route="/export/image",status="200"}' in body
+    for stage in ("font_load", "text_draw", "encode", "regex_scan"):
+        assert f'airc_stage_duration_seconds_count{{stage="{stage}"}}' in body
+    assert 'airc_admission_in_use{workload="render"} 0' in body
@@ -0,0 +1,118 @@
+import time
+from collections import Counter
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import profiling
+
+
+def _pathological_canvas():
+    deadline = time.perf_counter() + 0.15
+    n = 0
+    while time.perf_counter() < deadline:
+        n += sum(i * i for i in range(200))
+    return n
+
+
+def _wait_for(profile_id, suffix):
+    for _ in range(100):
+        path = profiling.profile_path(profile_id, suffix)
+        if path is not None:
+            return path
+        time.sleep(0.02)
+    raise AssertionError(f"profile {profile_id} not written")
+
+
+def test_header_profiles_the_endpoint_thread(monkeypatch):
+    monkeypatch.setenv("AIRC_PROFILING", "1")
+    monkeypatch.setenv("AIRC_ADMIN_TOKEN", "s3cret")
+    monkeypatch.setenv("AIRC_PROFILE_INTERVAL_MS", "1")
+    demo = FastAPI()
+    assert profiling.install(demo)
+
+    @demo.get("/slow")
+    def slow():
+        return {"n": _pathological_canvas()}
+
+    client = TestClient(demo)
+    assert profiling.PROFILE_ID_HEADER.lower() not in client.get("/slow").headers
+    assert profiling.PROFILE_ID_HEADER.lower() not in client.get("/slow", headers={profiling.PROFILE_HEADER: "1"}).headers
+
+    res = client.get("/slow", headers={profiling.PROFILE_HEADER: "s3cret"})
+    profile_id = res.headers[profiling.PROFILE_ID_HEADER]
+    _wait_for(profile_id, ".json")
+    folded = _wait_for(profile_id, ".folded").read_text()
+    # Stacks start at the endpoint (running on the threadpool) and reach the hot function
+    assert all(line.startswith("test_header_profiles_the_endpoint_thread.<locals>.slow") for line in folded.splitlines())
+    assert "_pathological_canvas" in folded
+
+    admin = TestClient(app)
+    assert admin.get("/api/admin/profiles").status_code == 403
+    admin.headers[profiling.ADMIN_TOKEN_HEADER] = "s3cret"
+    listed = admin.get("/api/admin/profiles").json()["profiles"]
+    assert profile_id in [p["id"] for p in listed]
+    record = admin.get(f"/api/admin/profiles/{profile_id}").json()
+    assert record["status"] == 200 and record["route"] == "/slow" and record["samples"] > 10
+    assert admin.get(f"/api/admin/profiles/{profile_id}/folded").text == folded
+
+
+def _spin_a():
+    return _pathological_canvas()
+
+
+def _spin_b():
+    return _pathological_canvas()
+
+
+def test_concurrent_requests_get_their_own_samples_up_to_the_cap(monkeypatch):
+    import threading
+
+    monkeypatch.setenv("AIRC_PROFILING", "1")
+    monkeypatch.setenv("AIRC_ADMIN_TOKEN", "s3cret")
+    monkeypatch.setenv("AIRC_PROFILE_INTERVAL_MS", "1")
+    monkeypatch.setenv("AIRC_PROFILE_MAX_CONCURRENT", "2")
+    demo = FastAPI()
+    assert profiling.install(demo)
+    started = threading.Barrier(3)
+
+    @demo.get("/work/{name}")
+    def work(name: str):
+        started.wait(5)
+        return {"n": (_spin_a if name == "a" else _spin_b)()}
+
+    ids = {}
+
+    def call(name):
+        res = TestClient(demo).get(f"/work/{name}", headers={profiling.PROFILE_HEADER: "s3cret"})
+        ids[name] = res.headers.get(profiling.PROFILE_ID_HEADER)
+
+    threads = [threading.Thread(target=call, args=(n,)) for n in ("a", "b", "c")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    # Only two samplers at once; each profile holds only its own request's stacks
+    assert sum(v is not None for v in ids.values()) == 2
+    for name, other in (("a", "_spin_b"), ("b", "_spin_a")):
+        if ids[name] is not None:
+            folded = _wait_for(ids[name], ".folded").read_text()
+            assert f"_spin_{name}" in folded and other not in folded
+
+
+def test_disabled_installs_nothing(monkeypatch):
+    monkeypatch.delenv("AIRC_PROFILING", raising=False)
+    monkeypatch.delenv("AIRC_PROFILE_SAMPLE_RATE", raising=False)
+    demo = FastAPI()
+    assert not profiling.install(demo)
+    assert demo.user_middleware == []
+
+
+def test_keeps_newest_profiles(tmp_path, monkeypatch):
+    monkeypatch.setenv("AIRC_PROFILE_KEEP", "2")
+    for i in range(4):
+        profiling.save_profile(f"p{i}", {}, Counter({("a", "b"): 1}), directory=tmp_path)
+        time.sleep(0.01)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["p2.folded", "p2.json", "p3.folded", "p3.json"]
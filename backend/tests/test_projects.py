@@ -0,0 +1,197 @@
+import json
+from io import BytesIO
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.models.schemas import Canvas
+from app.services import project_store
+from app.services.project_store import ProjectStore, VersionConflict, migrate_json_dir
+
+client = TestClient(app)
+
+
+def _canvas(fmt="SQUARE", **metadata):
+    return {"format": fmt, "width": 1080, "height": 1080, "elements": [], "metadata": metadata}
+
+
+def test_listing_pages_and_filters(tmp_path):
+    store = ProjectStore(tmp_path / "projects.sqlite3")
+    for i in range(7):
+        fmt = "SQUARE" if i % 2 else "LANDSCAPE"
+        store.save(f"p{i}", Canvas.model_validate(_canvas(fmt, campaign="spring" if i < 3 else "summer")), updated_at=100 + i)
+
+    page = store.list(limit=3)
+    assert [p["id"] for p in page["projects"]] == ["p6", "p5", "p4"]
+    seen = [p["id"] for p in page["projects"]]
+    while page["next_cursor"]:
+        page = store.list(limit=3, cursor=page["next_cursor"])
+        seen += [p["id"] for p in page["projects"]]
+    assert seen == [f"p{i}" for i in range(6, -1, -1)]
+
+    assert [p["id"] for p in store.list(format="SQUARE")["projects"]] == ["p5", "p3", "p1"]
+    assert [p["id"] for p in store.list(meta={"campaign": "spring"})["projects"]] == ["p2", "p1", "p0"]
+
+
+def test_migrate_json_files(tmp_path):
+    (tmp_path / "old.json").write_text(json.dumps(_canvas()), encoding="utf-8")
+    (tmp_path / "broken.json").write_text("{}", encoding="utf-8")
+    store = ProjectStore(tmp_path / "projects.sqlite3")
+    result = migrate_json_dir(store, tmp_path)
+    assert result["imported"] == 1 and [f["file"] for f in result["failed"]] == ["broken.json"]
+    assert store.get("old")["format"] == "SQUARE"
+    assert migrate_json_dir(store, tmp_path)["skipped"] == 1
+
+
+def test_project_routes():
+    assert client.post("/api/projects/a", json=_canvas()).json() == {"id": "a", "version": 1}
+    assert client.get("/api/projects/a").json()["format"] == "SQUARE"
+    assert client.post("/api/projects/a/duplicate", params={"new_id": "b"}).json() == {"id": "b"}
+    assert client.post("/api/projects/a/rename", params={"new_id": "b"}).json() == {"error": "destination_exists"}
+    assert client.post("/api/projects/a/rename", params={"new_id": "c"}).json() == {"id": "c"}
+    assert client.get("/api/projects/a").json() == {"error": "not_found"}
+    ids = {p["id"] for p in client.get("/api/projects", params={"q": "c"}).json()["projects"]}
+    assert ids == {"c"}
+    assert client.delete("/api/projects/b").json()["success"] is True
+
+
+def test_project_load_is_conditional():
+    client.post("/api/projects/etag", json=_canvas())
+    first = client.get("/api/projects/etag")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    assert etag.startswith('W/"')
+    unchanged = client.get("/api/projects/etag", headers={"If-None-Match": f'{etag.removeprefix("W/")}, "other"'})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["x-project-version"] == "1"
+
+    client.patch("/api/projects/etag", json={"base_version": 1, "ops": [{"op": "replace", "path": "/width", "value": 1000}]})
+    changed = client.get("/api/projects/etag", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["width"] == 1000
+    assert changed.headers["etag"] != etag
+    client.delete("/api/projects/etag")
+
+
+def test_patches_snapshots_and_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(project_store, "SNAPSHOT_EVERY", 3)
+    store = ProjectStore(tmp_path / "projects.sqlite3")
+    store.save("p", Canvas.model_validate(_canvas()))
+    for v in range(1, 8):
+        assert store.patch("p", v, [{"op": "replace", "path": "/width", "value": 1000 + v}])["version"] == v + 1
+
+    history = store.versions("p")
+    assert [h["version"] for h in history] == list(range(8, 0, -1))
+    assert [h["kind"] for h in history if h["kind"] == "snapshot"] == ["snapshot"] * 3  # versions 1, 4, 7
+    # Patches hold just the edit
+    assert max(h["size"] for h in history if h["kind"] == "patch") < 80
+
+    for v in range(1, 9):
+        assert store.get_version("p", v)["width"] == (1080 if v == 1 else 999 + v)
+    # A fresh instance (no cache) rebuilds the head from snapshot + patches
+    assert ProjectStore(store.path).get_with_version("p")[0] == 8
+    assert ProjectStore(store.path).get("p")["width"] == 1007
+
+    try:
+        store.patch("p", 3, [{"op": "replace", "path": "/width", "value": 1}])
+        raise AssertionError("stale base_version accepted")
+    except VersionConflict as e:
+        assert e.current_version == 8
+
+    assert store.revert("p", 1)["version"] == 9
+    assert store.get("p")["width"] == 1080
+
+
+def test_old_versions_are_pruned_down_to_a_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(project_store, "SNAPSHOT_EVERY", 3)
+    monkeypatch.setattr(project_store, "KEEP_VERSIONS", 4)
+    store = ProjectStore(tmp_path / "projects.sqlite3")
+    store.save("p", Canvas.model_validate(_canvas(logo="/static/assets/old.png")))
+    store.save("p", Canvas.model_validate(_canvas()))
+    for v in range(2, 11):
+        store.patch("p", v, [{"op": "replace", "path": "/width", "value": 1000 + v}])
+
+    # Snapshots at 1, 4, 7, 10: the last four versions (8-11) are rebuilt from 7
+    assert [h["version"] for h in store.versions("p")] == [11, 10, 9, 8, 7]
+    assert ProjectStore(store.path).get_version("p", 8)["width"] == 1007
+    assert store.get_version("p", 2) is None
+    assert "old.png" not in store.asset_references("/static/assets/")
+
+    assert store.prune(keep=2) == 3
+    assert [h["version"] for h in store.versions("p")] == [11, 10]
+    assert store.get_version("p", 10)["width"] == 1009
+
+
+def test_head_cache_notices_a_project_recreated_by_another_process(tmp_path):
+    path = tmp_path / "projects.sqlite3"
+    here, there = ProjectStore(path), ProjectStore(path)
+    here.save("p", Canvas.model_validate(_canvas(owner="a")))
+    assert here.get("p")["metadata"] == {"owner": "a"}
+
+    # Another worker deletes and recreates it: same id, same version number
+    there.delete("p")
+    there.save("p", Canvas.model_validate(_canvas("LANDSCAPE", owner="b")))
+    assert here.get_with_version("p") == (1, there.get("p"))
+
+    # Deltas are made against the real head, not the stale cached one
+    here.patch("p", 1, [{"op": "replace", "path": "/metadata/owner", "value": "c"}])
+    assert ProjectStore(path).get("p")["format"] == "LANDSCAPE"
+    assert ProjectStore(path).get_version("p", 2)["metadata"] == {"owner": "c"}
+
+
+def test_patch_route_conflict():
+    client.post("/api/projects/patched", json=_canvas())
+    r = client.patch("/api/projects/patched", json={"base_version": 1, "ops": [{"op": "replace", "path": "/height", "value": 1920}]})
+    assert r.json() == {"id": "patched", "version": 2}
+    r = client.patch("/api/projects/patched", json={"base_version": 1, "ops": []})
+    assert r.status_code == 409 and r.json()["current_version"] == 2
+    r = client.patch("/api/projects/patched", json={"base_version": 2, "ops": [{"op": "remove", "path": "/format"}]})
+    assert r.json()["error"] == "invalid_canvas"
+    assert client.get("/api/projects/patched").headers["X-Project-Version"] == "2"
+
+
+def test_thumbnail_rendered_on_save_and_cached():
+    canvas = _canvas()
+    canvas["elements"] = [{"id": "t", "type": "text", "text": "Hello", "font_size": 80,
+                           "bounds": {"x": 100, "y": 100, "width": 880, "height": 200}}]
+    client.post("/api/projects/thumbed", json=canvas)
+    row = next(p for p in client.get("/api/projects", params={"q": "thumbed"}).json()["projects"])
+    url = row["thumbnail_url"]
+    assert url.startswith("/api/projects/thumbnails/")
+
+    r = client.get(url)
+    assert r.status_code == 200 and r.headers["content-type"] == "image/jpeg"
+    assert "immutable" in r.headers["cache-control"]
+    assert max(Image.open(BytesIO(r.content)).size) == 320
+
+    # An edit gets a new content hash, hence a new URL
+    client.patch("/api/projects/thumbed", json={"base_version": 1, "ops": [{"op": "replace", "path": "/width", "value": 1200}]})
+    row = client.get("/api/projects", params={"q": "thumbed"}).json()["projects"][0]
+    assert row["thumbnail_url"] != url
+    assert client.get("/api/projects/thumbnails/0000.jpg").status_code == 404
+
+
+def test_thumbnail_waits_for_ingest_and_is_never_written_incomplete():
+    from app.config import ASSETS_DIR
+    from app.services.ingest import get_record
+    from app.services.thumbnails import render_thumbnail, thumbnail_path
+
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (400, 400), (10, 120, 200)).save(ASSETS_DIR / "thumb_src.png")
+    image = {"id": "i", "type": "packshot", "src": "/static/assets/thumb_src.png", "fit": "stretch",
+             "bounds": {"x": 0, "y": 0, "width": 1080, "height": 1080}}
+    canvas = {**_canvas(), "elements": [image]}
+    assert get_record(ASSETS_DIR / "thumb_src.png") is None
+
+    path = render_thumbnail(canvas)
+    assert get_record(ASSETS_DIR / "thumb_src.png") is not None
+    r, g, b = Image.open(path).convert("RGB").getpixel((160, 160))
+    assert abs(r - 10) < 8 and abs(g - 120) < 8 and abs(b - 200) < 8
+
+    missing = {**_canvas(), "elements": [{**image, "src": "/static/assets/gone.png"}]}
+    client.post("/api/projects/thumb-missing", json=missing)
+    url = client.get("/api/projects", params={"q": "thumb-missing"}).json()["projects"][0]["thumbnail_url"]
+    r = client.get(url)
+    assert r.status_code == 404 and r.json()["error"] == "thumbnail_unavailable"
+    assert not thumbnail_path(url.rsplit("/", 1)[1][:-len(".jpg")]).exists()
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from PIL import Image
+
+from app.services import prompt_assets
+from app.services.asset_store import file_digest
+from app.services.llm_gateway import image_digest, prompt_key
+from app.services.prompt_assets import PROMPT_IMAGE_MAX, prompt_image
+
+
+def _photo(path, size):
+    img = Image.new("RGB", size, (240, 240, 240))
+    img.paste((20, 90, 200), (size[0] // 4, size[1] // 4, size[0] * 3 // 4, size[1] * 3 // 4))
+    img.save(path, quality=90)
+    return path
+
+
+def test_prompt_image_is_capped_and_built_once(tmp_path, monkeypatch):
+    src = _photo(tmp_path / "large.jpg", (3000, 1500))
+    builds = []
+    build = prompt_assets._build_jpeg
+    monkeypatch.setattr(prompt_assets, "_build_jpeg", lambda path: builds.append(path) or build(path))
+
+    first = prompt_image(src)
+    assert first.format == "JPEG" and first.size == (PROMPT_IMAGE_MAX, PROMPT_IMAGE_MAX // 2)
+    second = prompt_image(src)
+    assert second.size == first.size and second.tobytes() == first.tobytes()
+    assert len(builds) == 1  # the second call was served from the shared cache
+
+    small = prompt_image(_photo(tmp_path / "small.jpg", (300, 200)))
+    assert small.size == (300, 200)  # never upscaled
+    assert prompt_image(tmp_path / "missing.jpg") is None
+
+
+def test_prompt_key_uses_the_precomputed_hash(tmp_path):
+    src = _photo(tmp_path / "shot.jpg", (1200, 900))
+    img = prompt_image(src)
+    assert img.info["airc_sha256"] == f"{file_digest(src)}_{PROMPT_IMAGE_MAX}"
+    assert image_digest(img) == img.info["airc_sha256"]
+
+    # Only the hash counts: pixels are not re-hashed for the cache key
+    stand_in = SimpleNamespace(info={"airc_sha256": img.info["airc_sha256"]})
+    assert prompt_key("m", ["describe", img]) == prompt_key("m", ["describe", stand_in])
+    other = prompt_image(_photo(tmp_path / "other.jpg", (1200, 901)))
+    assert prompt_key("m", ["describe", img]) != prompt_key("m", ["describe", other])
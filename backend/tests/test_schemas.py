@@ -0,0 +1,40 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models.compact import to_compact
+from app.models.schemas import Canvas, ImageElement, TextElement
+from app.services.compliance_engine import check_compliance
+
+
+def _canvas(*elements):
+    return {"format": "SQUARE", "width": 1080, "height": 1080, "elements": list(elements)}
+
+
+def _bounds(x=200, y=200):
+    return {"x": x, "y": y, "width": 100, "height": 100}
+
+
+def test_elements_dispatch_on_type():
+    canvas = Canvas.model_validate(_canvas(
+        {"id": "t", "type": "value_tile", "text": "2 for 1", "font_size": 40, "bounds": _bounds()},
+        {"id": "p", "type": "packshot", "src": "x.png", "bounds": _bounds()},
+    ))
+    assert [type(e) for e in canvas.elements] == [TextElement, ImageElement]
+
+    with pytest.raises(ValidationError):
+        Canvas.model_validate(_canvas({"id": "s", "type": "shape", "bounds": _bounds()}))
+    # A text element missing its text is an error, not a bare BaseElement
+    with pytest.raises(ValidationError):
+        Canvas.model_validate(_canvas({"id": "t", "type": "text", "font_size": 40, "bounds": _bounds()}))
+
+
+def test_compact_view_matches_model():
+    canvas = Canvas.model_validate(_canvas(
+        {"id": "in", "type": "text", "text": "Hi", "font_size": 60, "bounds": _bounds()},
+        {"id": "out", "type": "logo", "src": "x.png", "bounds": _bounds(x=10)},
+    ))
+    compact = to_compact(canvas)
+    assert [r.id for r in compact.texts] == ["in"] and [r.id for r in compact.images] == ["out"]
+    assert compact.texts[0].color == (0, 0, 0)
+    assert list(compact.outside(150, 150, 930, 930)) == [1]
+    assert [i.code for i in check_compliance(canvas, ocr=False)] == ["SAFE_ZONE"]
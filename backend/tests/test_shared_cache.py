@@ -0,0 +1,96 @@
+import subprocess
+import sys
+
+from PIL import Image
+
+from app.services import shared_cache
+from app.services.shared_cache import SharedCache
+
+
+def test_small_values_inline_large_values_mapped(tmp_path):
+    cache = SharedCache(tmp_path, budget_bytes=1_000_000, inline_max=1024, shares={"ns": 1.0})
+    assert cache.put("ns", "small", b"abc")
+    assert cache.put("ns", "big", bytes(range(256)) * 100, meta={"size": [10, 20]})
+
+    assert cache.get("ns", "small") == b"abc"
+    view, meta = cache.view("ns", "big")
+    assert view.readonly and len(view) == 25600 and meta == {"size": [10, 20]}
+    assert len(list((tmp_path / "blobs").iterdir())) == 1
+    assert cache.get("ns", "missing") is None
+
+    cache.put("ns", "big", b"replaced" * 200)
+    assert cache.get("ns", "big") == b"replaced" * 200
+    assert bytes(view[:3]) == b"\x00\x01\x02"  # an existing mapping outlives the replacement
+    assert len(list((tmp_path / "blobs").iterdir())) == 1
+
+
+def test_budget_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_cache, "TOUCH_INTERVAL_S", 0)
+    cache = SharedCache(tmp_path, budget_bytes=40_000, inline_max=1024, shares={"ns": 1.0})
+    for i in range(4):
+        cache.put("ns", str(i), bytes(9_000))
+    cache.get("ns", "0")  # now the most recently used
+    cache.put("ns", "4", bytes(9_000))
+
+    assert cache.get("ns", "1") is None
+    assert all(cache.get("ns", k) is not None for k in ("0", "2", "3", "4"))
+    assert cache.stats()["bytes"] <= 40_000
+    assert not cache.put("ns", "huge", bytes(20_000))  # over a quarter of the budget
+
+
+def test_expired_entries_are_dropped_through_an_index(tmp_path):
+    cache = SharedCache(tmp_path, budget_bytes=1_000_000, shares={"ns": 1.0})
+    cache.put("ns", "old", b"x", ttl=-1)
+    cache.put("ns", "new", b"y")
+    assert cache.get("ns", "new") == b"y"
+    assert cache._db().execute("SELECT COUNT(*) FROM entries WHERE key = 'old'").fetchone()[0] == 0
+    plan = cache._db().execute("EXPLAIN QUERY PLAN DELETE FROM entries WHERE expires_at <= 0").fetchall()
+    assert "entries_expiry" in plan[0][3]
+
+
+def test_each_namespace_evicts_only_within_its_own_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_cache, "TOUCH_INTERVAL_S", 0)
+    cache = SharedCache(tmp_path, budget_bytes=100_000, inline_max=1024,
+                        shares={"pixels": 0.6, "llm_response": 0.2, "*": 0.2})
+    for i in range(5):
+        cache.put("llm_response", str(i), bytes(3_000))
+    cache.put("other", "a", bytes(4_000))
+    for i in range(40):
+        cache.put("pixels", str(i), bytes(12_000))
+
+    assert all(cache.get("llm_response", str(i)) is not None for i in range(5))
+    assert cache.get("other", "a") is not None
+    stats = cache.stats()
+    assert stats["namespaces"]["pixels"]["bytes"] <= 60_000 and stats["namespaces"]["pixels"]["budget_bytes"] == 60_000
+    assert stats["bytes"] <= 100_000
+    assert shared_cache.EVICTIONS.value("pixels") > 0
+
+    pixels = stats["namespaces"]["pixels"]
+    for i in range(10):
+        cache.put("llm_response", f"new{i}", bytes(3_000))
+    assert cache.get("llm_response", "0") is None and cache.get("llm_response", "new9") is not None
+    assert cache.stats()["namespaces"]["pixels"] == pixels
+
+
+def test_entries_are_shared_between_processes(tmp_path):
+    code = (
+        "import sys; from pathlib import Path; from app.services.shared_cache import SharedCache; "
+        "SharedCache(Path(sys.argv[1])).put_json('ns', 'k', {'from': 'child'}, ttl=60)"
+    )
+    subprocess.run([sys.executable, "-c", code, str(tmp_path)], check=True)
+    assert SharedCache(tmp_path).get_json("ns", "k") == {"from": "child"}
+
+
+def test_decoded_levels_are_mapped_from_the_cache(tmp_path):
+    from app.config import ASSETS_DIR
+    from app.services.ingest import ensure_record, open_level
+
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    src = ASSETS_DIR / "level_cache.png"
+    Image.new("RGBA", (300, 200), (10, 120, 200, 255)).save(src)
+    record = ensure_record(src, wait=True)
+
+    first = open_level(record, record["mips"][1])
+    second = open_level(record, record["mips"][1])
+    assert second.size == (150, 100) and second.readonly
+    assert second.tobytes() == first.tobytes()
@@ -0,0 +1,101 @@
+import os
+import time
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.config import ASSETS_DIR
+from app.main import app
+from app.models.schemas import Canvas
+from app.services import project_store, storage_manager
+from app.services.bg_removal import remove_background_cached
+from app.services.project_store import ProjectStore
+from app.services.storage_manager import StorageManager
+
+client = TestClient(app)
+
+
+def _artifact(path, size=1000, age=3600):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(bytes(size))
+    old = time.time() - age
+    os.utime(path, (old, old))
+
+
+def test_sweep_evicts_unreferenced_lru_down_to_budget(tmp_path, monkeypatch):
+    roots = {kind: tmp_path / kind for kind in storage_manager.KINDS}
+    monkeypatch.setattr(storage_manager, "_root", roots.__getitem__)
+    store = ProjectStore(tmp_path / "projects.sqlite3")
+    monkeypatch.setattr(project_store, "get_store", lambda: store)
+    store.save("p", Canvas.model_validate({
+        "format": "SQUARE", "width": 1080, "height": 1080,
+        "elements": [{"id": "a", "type": "packshot", "src": "/static/assets/bgremoved_keep.png",
+                      "bounds": {"x": 0, "y": 0, "width": 10, "height": 10}}],
+    }))
+
+    _artifact(roots["export"] / "export_SQUARE_old.png", age=7200)
+    _artifact(roots["export"] / "export_SQUARE_used.png")
+    _artifact(roots["bgremoved"] / "bgremoved_keep.png", age=7200)
+    _artifact(roots["bgremoved"] / "bgremoved_drop.png")
+    _artifact(roots["thumbnail"] / "fresh.jpg", age=0)
+    (roots["bgremoved"] / "upload.png").write_bytes(bytes(5000))  # uploads are not managed
+
+    manager = StorageManager(tmp_path / "storage.sqlite3", budget_bytes=2500, min_age_s=600)
+    manager.touch("export", "export_SQUARE_used.png")
+    summary = manager.sweep()
+
+    assert summary["bytes_before"] == 5000 and summary["evicted"] == 2
+    assert sorted(p.name for p in roots["export"].iterdir()) == ["export_SQUARE_used.png"]
+    assert sorted(p.name for p in roots["bgremoved"].iterdir()) == ["bgremoved_keep.png", "upload.png"]
+    assert (roots["thumbnail"] / "fresh.jpg").exists()
+    assert manager.stats()["kinds"]["bgremoved"] == {"files": 1, "bytes": 1000}
+    assert storage_manager.EVICTIONS.value("export") >= 1
+
+
+def test_touch_never_writes_the_index_on_the_calling_thread(tmp_path, monkeypatch):
+    import threading
+
+    monkeypatch.setattr(storage_manager, "_thread", None)
+    monkeypatch.setattr(storage_manager, "FLUSH_INTERVAL_S", 0)
+    monkeypatch.setattr(storage_manager, "_root", lambda kind: tmp_path)
+    _artifact(tmp_path / "export_SQUARE_a.png")
+    manager = StorageManager(tmp_path / "storage.sqlite3")
+    flushed = []
+    real = manager.flush
+    monkeypatch.setattr(manager, "flush", lambda: flushed.append(threading.get_ident()) or real())
+
+    manager.touch("export", "export_SQUARE_a.png")
+    deadline = time.monotonic() + 5
+    while (not flushed or manager._flushing) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert flushed and threading.get_ident() not in flushed
+    row = manager._db().execute("SELECT name FROM artifacts").fetchall()
+    assert [r["name"] for r in row] == ["export_SQUARE_a.png"]
+
+
+def test_evicted_background_removal_output_is_recreated_on_request(tmp_path, monkeypatch):
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    img = Image.new("RGB", (64, 64), (255, 255, 255))
+    img.paste((200, 30, 30), (16, 16, 48, 48))
+    img.save(ASSETS_DIR / "restore_src.png")
+    out = ASSETS_DIR / "bgremoved_restore_src.png"
+    out.unlink(missing_ok=True)
+
+    # Never produced: a well-formed name alone does not make new work.
+    assert client.get("/static/assets/bgremoved_restore_src.png").status_code == 404
+    assert client.get("/static/assets/bgremoved_restore_src_t77.png").status_code == 404
+    assert not out.exists() and not (ASSETS_DIR / "bgremoved_restore_src_t77.png").exists()
+
+    remove_background_cached(ASSETS_DIR / "restore_src.png", out)
+    scan = storage_manager._scan
+    monkeypatch.setattr(storage_manager, "_scan", lambda kind: (e for e in scan(kind) if e[0] == out.name))
+    manager = StorageManager(tmp_path / "storage.sqlite3", budget_bytes=1, min_age_s=0)
+    monkeypatch.setattr(storage_manager, "_manager", manager)
+    assert manager.sweep()["evicted"] == 1 and not out.exists()
+    assert manager.restorable("bgremoved", out.name)
+
+    res = client.get("/static/assets/bgremoved_restore_src.png")
+    assert res.status_code == 200 and out.exists()
+    assert Image.open(out).getpixel((0, 0))[3] == 0
+    assert not manager.restorable("bgremoved", out.name)
+    assert client.get("/static/assets/bgremoved_missing_src.png").status_code == 404
@@ -0,0 +1,71 @@
+import io
+import random
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.config import ASSETS_DIR
+from app.services.asset_store import INCOMING_DIR
+
+client = TestClient(app)
+
+
+def _png(color, size=(64, 48)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_identical_uploads_are_stored_once():
+    data = _png((200, 10, 10))
+    res = client.post("/api/uploads/assets", files=[
+        ("files", ("a.png", data, "image/png")),
+        ("files", ("copy of a.png", data, "image/png")),
+        ("files", ("b.png", _png((10, 200, 10)), "image/png")),
+    ])
+    assert res.status_code == 200
+    urls = res.json()["files"]
+    assert urls[0] == urls[1] != urls[2]
+    name = urls[0].rsplit("/", 1)[-1]
+    assert (ASSETS_DIR / name).read_bytes() == data
+    assert client.get(urls[0]).content == data
+    assert not list(ASSETS_DIR.glob(".incoming-*")) and not list(INCOMING_DIR.iterdir())
+
+
+def test_undecodable_upload_is_rejected():
+    res = client.post("/api/uploads/assets", files=[("files", ("notes.png", b"not an image" * 100, "image/png"))])
+    assert res.status_code == 415
+    assert not list(ASSETS_DIR.glob(".incoming-*")) and not list(INCOMING_DIR.iterdir())
+
+
+def test_truncated_body_with_a_valid_header_is_rejected():
+    for fmt in ("PNG", "JPEG"):
+        buf = io.BytesIO()
+        Image.frombytes("RGB", (200, 150), random.Random(1).randbytes(90_000)).save(buf, format=fmt)
+        before = sorted(p.name for p in ASSETS_DIR.iterdir())
+        res = client.post("/api/uploads/assets", files=[("files", ("cut.img", buf.getvalue()[:-500], "image/png"))])
+        assert res.status_code == 415 and "truncated" in res.json()["detail"]
+        assert sorted(p.name for p in ASSETS_DIR.iterdir()) == before and not list(INCOMING_DIR.iterdir())
+
+
+def test_partial_upload_is_never_in_the_served_directory(monkeypatch):
+    from app.services import asset_store
+
+    seen = []
+
+    class SlowStream(io.BytesIO):
+        def read(self, n=-1):
+            # Mid-upload: the staged file exists, but only outside ASSETS_DIR
+            seen.append((sorted(p.name for p in ASSETS_DIR.iterdir()), list(INCOMING_DIR.iterdir())))
+            return super().read(n)
+
+    monkeypatch.setattr(asset_store, "CHUNK_SIZE", 1024)
+    buf = io.BytesIO()
+    Image.frombytes("RGB", (200, 150), random.Random(0).randbytes(90_000)).save(buf, format="PNG")
+    data = buf.getvalue()
+    before = sorted(p.name for p in ASSETS_DIR.iterdir())
+    asset = asset_store.store_stream(SlowStream(data), "slow.png")
+    assert len(seen) > 3 and all(names == before and len(staged) == 1 for names, staged in seen)
+    assert asset.path.parent == ASSETS_DIR and asset.path.read_bytes() == data
+    assert not list(INCOMING_DIR.iterdir())
@@ -362,6 +362,14 @@ export default function App(){
             <ul style={{maxHeight:'200px', overflowY:'auto', paddingLeft:'1em'}}>
               {projects.map(p => (
                 <li key={p.id} style={{marginBottom:'4px'}}>
+                  {p.thumbnail_url && (
+                    <img
+                      src={`${import.meta.env.VITE_API_BASE_URL?.replace(/\/api\/?$/, '') || 'http://localhost:8000'}${p.thumbnail_url}`}
+                      alt=""
+                      loading="lazy"
+                      style={{width:'48px', height:'48px', objectFit:'contain', verticalAlign:'middle', marginRight:'6px'}}
+                    />
+                  )}
                   <a href="#" onClick={(e)=>{e.preventDefault(); onLoadProject(p.id)}}>{p.id}</a>
                   {p.updated_at && (
                     <span style={{fontSize:'0.7em', color:'#888', marginLeft:'8px'}}>
@@ -15,9 +15,24 @@ export const uploadAssets = async (files) => {
   return data.files
 }
 
+// Last candidates per request; GET /layout/suggest answers 304 while they are unchanged.
+// (Other GET responses such as loadProject are revalidated by the browser cache itself.)
+const suggestCache = new Map()
+
 export const suggestLayouts = async (payload) => {
-  const { data } = await api.post('/layout/suggest', payload)
-  return data.candidates
+  const key = JSON.stringify(payload)
+  const cached = suggestCache.get(key)
+  const res = await api.get('/layout/suggest', {
+    params: payload,
+    // packshots=a&packshots=b, as FastAPI reads list query parameters
+    paramsSerializer: { indexes: null },
+    headers: cached ? { 'If-None-Match': cached.etag } : {},
+    validateStatus: (s) => (s >= 200 && s < 300) || s === 304,
+  })
+  if (res.status === 304 && cached) return cached.candidates
+  suggestCache.clear()
+  if (res.headers.etag) suggestCache.set(key, { etag: res.headers.etag, candidates: res.data.candidates })
+  return res.data.candidates
 }
 
 export const checkCompliance = async (canvas) => {
@@ -50,6 +65,16 @@ export const saveProject = async (id, canvas) => {
   return data
 }
 
+export const patchProject = async (id, baseVersion, ops) => {
+  const { data } = await api.patch(`/projects/${id}`, { base_version: baseVersion, ops })
+  return data
+}
+
+export const listProjectVersions = async (id) => {
+  const { data } = await api.get(`/projects/${id}/versions`)
+  return data.versions
+}
+
 export const deleteProject = async (id) => {
   const { data } = await api.delete(`/projects/${id}`)
   return data
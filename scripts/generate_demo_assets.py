@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import argparse
+import random
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from PIL import Image, ImageDraw, ImageFont
 
 
@@ -101,7 +104,116 @@ def make_docs_images() -> None:
     frames[0].save(out, save_all=True, append_images=frames[1:], duration=900, loop=0)
 
 
+# Synthetic benchmark workloads (backend/benchmarks/bench_pipelines.py).
+# Everything below is driven by a seeded random.Random, so a seed always
+# produces the same images and canvases.
+
+PACKSHOT_SIZES: Dict[str, Tuple[int, int]] = {
+    "256": (256, 256),
+    "1k": (1024, 1024),
+    "2k": (2048, 2048),
+    "4k": (3840, 2160),
+    "8k": (7680, 4320),
+}
+
+_WORDS = (
+    "fresh crisp golden crunchy creamy rich smooth zesty bold bright everyday family sharing "
+    "morning breakfast snack treat bakery dairy garden orchard harvest recipe classic new "
+    "taste flavour range pack bundle favourite seasonal handmade simple quality"
+).split()
+_BANNED = ["free", "win", "competition", "guarantee", "eco"]
+
+
+def synthetic_copy(rnd: random.Random, words: int, banned: bool = False) -> str:
+    """Retail-style copy of `words` words; with `banned`, one banned term is mixed in."""
+    out = [rnd.choice(_WORDS) for _ in range(words)]
+    if banned and out:
+        out[rnd.randrange(len(out))] = rnd.choice(_BANNED)
+    text = " ".join(out)
+    return text[:1].upper() + text[1:]
+
+
+def synthetic_packshot(size: Tuple[int, int], rnd: random.Random) -> Image.Image:
+    """A product shot: a label-printed box on a flat backdrop with padding (exercises trimming)."""
+    w, h = size
+    backdrop = tuple(rnd.randint(235, 255) for _ in range(3))
+    img = Image.new("RGB", size, backdrop)
+    d = ImageDraw.Draw(img)
+    pad_x, pad_y = int(w * rnd.uniform(0.12, 0.25)), int(h * rnd.uniform(0.08, 0.2))
+    body = tuple(rnd.randint(20, 220) for _ in range(3))
+    d.rounded_rectangle([pad_x, pad_y, w - pad_x, h - pad_y], radius=max(2, min(w, h) // 20), fill=body)
+    # Label band plus stripes, so encoders see real detail rather than flat colour
+    band_top = pad_y + (h - 2 * pad_y) // 3
+    d.rectangle([pad_x, band_top, w - pad_x, band_top + (h - 2 * pad_y) // 4], fill=(255, 255, 255))
+    stripes = rnd.randint(6, 16)
+    for i in range(stripes):
+        x = pad_x + (w - 2 * pad_x) * i // stripes
+        d.line([x, pad_y, x + (w - 2 * pad_x) // stripes // 2, h - pad_y], fill=tuple(rnd.randint(0, 255) for _ in range(3)), width=max(1, w // 400))
+    d.text((pad_x + w // 40, band_top + h // 40), synthetic_copy(rnd, 3).upper(), fill=(20, 20, 20), font=_font(max(10, h // 16)))
+    return img
+
+
+def make_benchmark_packshots(out_dir: Path, seed: int = 0, sizes: Optional[List[str]] = None) -> Dict[str, str]:
+    """Writes one PNG packshot per size label into `out_dir` (kept if already there). Returns {label: file name}."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for label in sizes or list(PACKSHOT_SIZES):
+        name = f"bench_packshot_{label}_s{seed}.png"
+        path = out_dir / name
+        if not path.exists():
+            rnd = random.Random(f"{seed}:{label}")
+            tmp = out_dir / f".{name}.tmp"
+            synthetic_packshot(PACKSHOT_SIZES[label], rnd).save(tmp, format="PNG")
+            tmp.replace(path)
+        files[label] = name
+    return files
+
+
+def synthetic_canvas(
+    rnd: random.Random,
+    fmt: str,
+    size: Tuple[int, int],
+    elements: int,
+    image_srcs: List[str],
+    words: int = 3,
+    banned_ratio: float = 0.0,
+) -> dict:
+    """
+    A canvas payload with `elements` elements: mostly text of `words`
+    words (a share of it with banned copy), images cycling through
+    `image_srcs`, scattered so some break the safe zone.
+    """
+    w, h = size
+    out = []
+    for i in range(elements):
+        bw, bh = rnd.randint(w // 12, w // 2), rnd.randint(h // 20, h // 6)
+        bounds = {"x": rnd.randint(0, w - bw), "y": rnd.randint(0, h - bh), "width": bw, "height": bh}
+        if image_srcs and i % 4 == 3:
+            out.append({"id": f"img{i}", "type": "packshot" if i % 8 == 3 else "image", "bounds": bounds, "z": i,
+                        "src": image_srcs[(i // 4) % len(image_srcs)]})
+        else:
+            out.append({
+                "id": ("headline", "subhead", "value")[i] if i < 3 else f"txt{i}",
+                "type": "value_tile" if i == 2 else "text",
+                "bounds": bounds,
+                "z": i,
+                "text": synthetic_copy(rnd, words, banned=rnd.random() < banned_ratio),
+                "font_size": rnd.choice([14, 20, 28, 40, 64]),
+                "color": {"r": rnd.choice([0, 40, 200, 240]), "g": rnd.randint(0, 255), "b": rnd.randint(0, 255), "a": 1},
+            })
+    return {"format": fmt, "width": w, "height": h, "elements": out, "background_color": {"r": 255, "g": 255, "b": 255, "a": 1}}
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate demo assets and docs media, or synthetic benchmark packshots.")
+    parser.add_argument("--benchmark-dir", type=Path, help="Only write the synthetic benchmark packshots here")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.benchmark_dir:
+        files = make_benchmark_packshots(args.benchmark_dir, args.seed)
+        print(f"Wrote {len(files)} benchmark packshots to: {args.benchmark_dir}")
+        return
+
     make_sample_assets()
     make_docs_images()
     print(f"Wrote demo assets to: {SAMPLE_DIR}")